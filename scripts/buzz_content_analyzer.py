@@ -19,6 +19,7 @@ buzz_content_analyzer.py - 他者バズツイート多次元分析パイプラ
   python -X utf8 buzz_content_analyzer.py --dry-run   # 分類のみ（保存なし）
   python -X utf8 buzz_content_analyzer.py --force      # 本日分を全て再評価
   python -X utf8 buzz_content_analyzer.py --days 7     # 蓄積分析の対象日数
+  python -X utf8 buzz_content_analyzer.py --no-distill # ローカル分類器を使わず全件LLM
 
 コスト: $0.00（Groq無料枠）
 """
@@ -32,7 +33,6 @@ import logging
 from pathlib import Path
 from datetime import datetime, timedelta
 
-import httpx
 from dotenv import load_dotenv
 
 # GROQ_API_KEYを.envから読み込み
@@ -45,22 +45,34 @@ from x_client import (
     notify_discord, save_to_obsidian, today_str, now_str,
     DATA_DIR, OBSIDIAN_BASE,
 )
+from groq_client import GroqClient, compact_text, estimate_tokens, pack_batches
+from llm_batches import classify_in_rounds, stream_json_items
+from eval_store import EvalJournal, EvaluationStore
+from distilled_classifier import split_for_llm, record_audit
+from near_dup import near_duplicate_groups
 
 logger = logging.getLogger(__name__)
 
 # --- 定数 ---
 
-GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
-GROQ_MODEL = "llama-3.3-70b-versatile"
 OBSIDIAN_EVAL = OBSIDIAN_BASE / "evaluations"
-BUZZ_EVAL_PATH = DATA_DIR / "buzz_content_evaluations.json"
 BUZZ_TWEETS_PATH = DATA_DIR / "buzz-tweets-latest.json"
 KEY_PERSONS_PATH = DATA_DIR / "key_persons.json"
 STRATEGY_REF_PATH = Path(r"C:\Users\Tenormusica\x-auto\common\content-strategy-ref.md")
 
-BATCH_SIZE = 5
-BATCH_DELAY = 5.0
-BACKOFF_SCHEDULE = [5, 15, 30, 60]
+# 1リクエストに詰めるツイート数は groq_client.pack_batches がトークン見積もりで決める。
+# 件数の上限（出力JSONの品質を保つため）と、出力JSON 1要素あたりのトークン見積もり
+# RPM/TPMのペース配分は groq_client.py の共有レートリミッタが担当
+MAX_BATCH_SIZE = 20
+OUTPUT_TOKENS_PER_TWEET = 100
+# LLM応答の要素に必須のフィールド（欠けた要素は採用せず再リクエスト。bip_authenticity は null 可なので除く）
+REQUIRED_FIELDS = (
+    "content_type", "originality", "media_contribution", "news_saturation",
+    "ai_citation_value", "virality_factor",
+)
+
+# BUZZ_CLASSIFICATION_PROMPT を変更したら上げる（llm_cache のキーに含まれ、旧結果が無効になる）
+BUZZ_PROMPT_VERSION = "buzz-v1"
 RETENTION_DAYS = 30
 
 # --- LLMプロンプト（他者バズツイート成功要因分析用） ---
@@ -178,147 +190,148 @@ def load_key_persons() -> dict:
     return json.loads(KEY_PERSONS_PATH.read_text(encoding="utf-8"))
 
 
-def load_buzz_evaluations() -> dict:
-    """蓄積データ読み込み"""
-    if BUZZ_EVAL_PATH.exists():
-        return json.loads(BUZZ_EVAL_PATH.read_text(encoding="utf-8"))
-    return {
-        "metadata": {
-            "last_updated": "",
-            "total_evaluated": 0,
-            "date_range": {"oldest": "", "newest": ""},
-            "retention_days": RETENTION_DAYS,
-        },
-        "evaluations": {},
-        "daily_index": {},
-    }
-
-
-def save_buzz_evaluations(data: dict):
-    """蓄積データ保存"""
-    DATA_DIR.mkdir(parents=True, exist_ok=True)
-    BUZZ_EVAL_PATH.write_text(
-        json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8"
-    )
-    print(f"[OK] バズ評価データ保存: {BUZZ_EVAL_PATH}")
+def save_buzz_evaluations(store: EvaluationStore, entries: dict[str, dict]):
+    """新規・更新分の評価だけを評価ストア（SQLite）にupsert"""
+    count = store.upsert(entries)
+    store.last_updated = now_str()
+    print(f"[OK] バズ評価データ保存: {count}件 → {store.path}")
 
 
 # --- Groq LLM 分類 ---
 
-async def classify_buzz_tweets(
-    tweets: list[dict], api_key: str
-) -> list[dict]:
-    """バズツイートをGroq LLMでバッチ分類"""
-    results = []
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        for batch_start in range(0, len(tweets), BATCH_SIZE):
-            batch = tweets[batch_start : batch_start + BATCH_SIZE]
-            batch_results = await _classify_buzz_batch(client, batch, api_key)
-            results.extend(batch_results)
+def _cache_text(t: dict) -> str:
+    """キャッシュキー用の本文（エンゲージメント数は日々変わるので含めない）"""
+    return t.get("text", "")
 
-            if batch_start + BATCH_SIZE < len(tweets):
-                print(f"  [WAIT] {BATCH_DELAY}秒待機（rate limit対策）...")
-                await asyncio.sleep(BATCH_DELAY)
 
-            print(f"  [PROGRESS] {min(batch_start + BATCH_SIZE, len(tweets))}/{len(tweets)} 完了")
+def _tweet_block(i: int, t: dict) -> str:
+    """プロンプト内のツイート1件分（エンゲージメント指標 + URL・空白を詰めた本文）"""
+    return (
+        f"### ツイート {i}\n"
+        f"いいね:{t.get('likes', 0)} / RT:{t.get('retweets', 0)} / "
+        f"引用:{t.get('quotes', 0)} / リプライ:{t.get('replies', 0)}\n"
+        f"{compact_text(t.get('text', ''))}\n\n"
+    )
 
-    return results
 
+def _group_near_duplicates(tweets: list[dict]) -> tuple[list[dict], dict[str, list[dict]]]:
+    """(分類する代表ツイート, {代表のtweet_id: 同じグループの他のツイート}) に分ける。
+    代表はグループ内でエンゲージメントが最も高いツイート"""
+    ranked = sorted(tweets, key=lambda t: t.get("engagement_score", 0), reverse=True)
+    reps = near_duplicate_groups([_cache_text(t) for t in ranked])
+    representatives = []
+    duplicates: dict[str, list[dict]] = {}
+    for i, t in enumerate(ranked):
+        if reps[i] == i:
+            representatives.append(t)
+        else:
+            duplicates.setdefault(ranked[reps[i]]["id"], []).append(t)
+    return representatives, duplicates
 
-async def _classify_buzz_batch(
-    client: httpx.AsyncClient,
+
+def _propagate_duplicates(results: list[dict], duplicates: dict[str, list[dict]]) -> list[dict]:
+    """代表の分類結果を同じグループのツイートに複製し、全員に dup_group_id（代表のtweet_id）を付ける"""
+    expanded = []
+    for r in results:
+        dups = duplicates.get(r.get("tweet_id"))
+        if not dups:
+            expanded.append(r)
+            continue
+        group_id = r["tweet_id"]
+        expanded.append({**r, "dup_group_id": group_id})
+        expanded.extend({**r, "tweet_id": t["id"], "dup_group_id": group_id} for t in dups)
+    return expanded
+
+
+async def classify_buzz_tweets(
     tweets: list[dict],
     api_key: str,
+    use_distilled: bool = True,
+    dry_run: bool = False,
+    journal: EvalJournal | None = None,
 ) -> list[dict]:
-    """1バッチ（最大5ツイート）をGroqで分類"""
-    # プロンプト組み立て（エンゲージメント指標を含む）
-    tweets_block = ""
-    for i, t in enumerate(tweets):
-        # buzz-tweets-latest.jsonにはhas_mediaがないのでテキストからメディア推定
-        tweets_block += (
-            f"### ツイート {i}\n"
-            f"いいね:{t.get('likes', 0)} / RT:{t.get('retweets', 0)} / "
-            f"引用:{t.get('quotes', 0)} / リプライ:{t.get('replies', 0)}\n"
-            f"{t.get('text', '')}\n\n"
+    """バズツイートをGroq LLMでバッチ分類（レートリミッタの許す範囲で並列実行）"""
+    # コピペニュース等のほぼ同一ツイートは代表1件だけを分類し、結果を複製する
+    tweets, duplicates = _group_near_duplicates(tweets)
+    if duplicates:
+        n_dups = sum(len(d) for d in duplicates.values())
+        print(f"  [DEDUP] ほぼ同一のツイート {n_dups}件を {len(duplicates)}グループの代表に集約")
+
+    # 前回途中で止まった実行のチェックポイントがあれば、そのツイートはLLMに送らず復元する
+    resumed = journal.load(t["id"] for t in tweets) if journal is not None else {}
+    if resumed:
+        tweets = [t for t in tweets if t["id"] not in resumed]
+        print(f"  [RESUME] 前回中断した実行から {len(resumed)}件を復元")
+
+    async with GroqClient(api_key) as groq:
+        # 同じ本文の分類結果がキャッシュにあるツイートはAPIに送らない
+        cached_results = []
+        pending = []
+        for t in tweets:
+            cached = groq.cache_get(BUZZ_PROMPT_VERSION, _cache_text(t))
+            if cached is None:
+                pending.append(t)
+            else:
+                cached_results.append(
+                    {**cached, "tweet_id": t["id"], "evaluated_at": datetime.now().isoformat()}
+                )
+        if cached_results:
+            print(f"  [CACHE] {len(cached_results)}件をキャッシュから復元")
+
+        # 蒸留モデルの確信度が高いツイートはローカルで確定（低確信度と監査分だけLLMへ）
+        local_results, audit = [], {}
+        if use_distilled:
+            local_results, pending, audit = split_for_llm("buzz", pending, _cache_text)
+
+        def pack(items: list[dict]) -> list[list[dict]]:
+            return pack_batches(
+                items,
+                lambda t: estimate_tokens(_tweet_block(0, t)),
+                base_tokens=estimate_tokens(BUZZ_CLASSIFICATION_PROMPT),
+                output_tokens_per_item=OUTPUT_TOKENS_PER_TWEET,
+                budget=groq.request_token_budget(),
+                max_items=MAX_BATCH_SIZE,
+            )
+
+        # 応答が途中で切れても届いた分は使い、欠けたツイートだけを再リクエストする
+        llm_results, salvage = await classify_in_rounds(
+            pending, lambda batch: _classify_buzz_batch(groq, batch), pack,
+            on_batch=journal.append if journal is not None else None,
         )
+        if pending:
+            print(f"  [SALVAGE] {salvage.summary()}")
+        print(f"  [GROQ] {groq.summary()}")
+
+    if audit:
+        record_audit("buzz", audit, llm_results, persist=not dry_run)
+    return _propagate_duplicates(
+        list(resumed.values()) + cached_results + local_results + llm_results, duplicates,
+    )
+
 
+async def _classify_buzz_batch(
+    groq: GroqClient,
+    tweets: list[dict],
+) -> dict[int, dict]:
+    """1バッチ（pack_batches で詰めたツイート群）をGroqで分類し、{バッチ内index: 結果} を返す。
+
+    応答はストリーミングで受け取り、完成した要素から採用する（途中で切れた分・不正な要素は含めない）。
+    """
+    tweets_block = "".join(_tweet_block(i, t) for i, t in enumerate(tweets))
     prompt = BUZZ_CLASSIFICATION_PROMPT.format(tweets_block=tweets_block)
 
-    for attempt in range(4):
-        try:
-            response = await client.post(
-                GROQ_API_URL,
-                headers={
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "model": GROQ_MODEL,
-                    "messages": [{"role": "user", "content": prompt}],
-                    "temperature": 0.1,
-                    "max_tokens": 2000,
-                },
-            )
-            response.raise_for_status()
-            result = response.json()
-            content = result["choices"][0]["message"]["content"].strip()
-
-            # JSON抽出
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0].strip()
-
-            parsed = json.loads(content)
-
-            # tweet_id・evaluated_atを付与
-            for item in parsed:
-                idx = item.get("tweet_index", 0)
-                if 0 <= idx < len(tweets):
-                    item["tweet_id"] = tweets[idx]["id"]
-                    item["evaluated_at"] = datetime.now().isoformat()
-            return parsed
-
-        except httpx.HTTPStatusError as e:
-            if e.response.status_code == 429:
-                wait = BACKOFF_SCHEDULE[min(attempt, len(BACKOFF_SCHEDULE) - 1)]
-                retry_after = e.response.headers.get("retry-after")
-                if retry_after:
-                    try:
-                        wait = float(retry_after) + 1
-                    except ValueError:
-                        pass
-                print(f"  [WARN] Rate limited (429), {wait}秒後にリトライ...")
-                await asyncio.sleep(wait)
-                continue
-            logger.error(f"HTTP error ({e.response.status_code}): {e}")
-            break
-
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON parse error: {e}")
-            logger.error(f"Raw content: {content[:200]}")
-            break
-
-        except Exception as e:
-            logger.error(f"Unexpected error: {e}")
-            break
-
-    # 失敗時はデフォルト値
-    print(f"  [WARN] バッチ分類失敗。デフォルト値を使用")
-    return [
-        {
-            "tweet_id": t["id"],
-            "content_type": "other",
-            "originality": 3,
-            "media_contribution": "none",
-            "news_saturation": "n/a",
-            "bip_authenticity": None,
-            "ai_citation_value": 2,
-            "virality_factor": "information_value",
-            "evaluated_at": datetime.now().isoformat(),
-        }
-        for t in tweets
-    ]
+    # 429リトライはGroqClient内で処理
+    got = await stream_json_items(
+        groq, prompt,
+        max_tokens=OUTPUT_TOKENS_PER_TWEET * len(tweets) + 100,
+        n_items=len(tweets),
+        required_fields=REQUIRED_FIELDS,
+    )
+    for idx, item in got.items():
+        groq.cache_put(BUZZ_PROMPT_VERSION, _cache_text(tweets[idx]), dict(item))
+        item["tweet_id"] = tweets[idx]["id"]
+        item["evaluated_at"] = datetime.now().isoformat()
+    return got
 
 
 # --- key_persons照合 ---
@@ -501,30 +514,12 @@ def analyze_key_person_patterns(evals: list[dict]) -> dict:
 
 # --- GC ---
 
-def gc_old_evaluations(data: dict, retention_days: int = RETENTION_DAYS):
+def gc_old_evaluations(store: EvaluationStore, retention_days: int = RETENTION_DAYS):
     """retention_days以前のデータを削除"""
     cutoff = (datetime.now() - timedelta(days=retention_days)).strftime("%Y-%m-%d")
-    dates_to_remove = [d for d in data["daily_index"] if d < cutoff]
-    removed = 0
-    for date in dates_to_remove:
-        for tid in data["daily_index"][date]:
-            data["evaluations"].pop(tid, None)
-            removed += 1
-        del data["daily_index"][date]
-
-    # metadata更新
-    remaining_dates = sorted(data["daily_index"].keys())
-    if remaining_dates:
-        data["metadata"]["date_range"] = {
-            "oldest": remaining_dates[0],
-            "newest": remaining_dates[-1],
-        }
-    else:
-        data["metadata"]["date_range"] = {"oldest": "", "newest": ""}
-    data["metadata"]["total_evaluated"] = len(data["evaluations"])
-
+    removed = store.delete_before(cutoff)
     if removed:
-        print(f"[GC] {len(dates_to_remove)}日分 / {removed}件を削除（{cutoff}以前）")
+        print(f"[GC] {removed}件を削除（{cutoff}以前）")
 
 
 # --- レポート生成 ---
@@ -833,7 +828,15 @@ def update_strategy_ref_buzz_section(
 
 # --- メイン ---
 
-async def async_main(args):
+async def async_main(
+    args,
+    buzz_data: dict | None = None,
+    key_persons: dict | None = None,
+    store: EvaluationStore | None = None,
+):
+    """buzz_data / key_persons / store は daily_pipeline.py から前段の結果を受け取るための引数。
+    省略時は従来どおりファイル・ストアから読む（store を渡した場合は閉じない）。
+    """
     api_key = os.getenv("GROQ_API_KEY")
     if not api_key:
         print("[ERROR] GROQ_API_KEY が環境変数に未設定")
@@ -843,7 +846,8 @@ async def async_main(args):
     print(f"=== バズツイート分析パイプライン ===")
 
     # バズツイート読み込み
-    buzz_data = load_buzz_tweets()
+    if buzz_data is None:
+        buzz_data = load_buzz_tweets()
     tweets = buzz_data.get("tweets", [])
     if not tweets:
         print("[WARN] バズツイートが0件（buzz-tweets-latest.json）。スキップします")
@@ -852,12 +856,15 @@ async def async_main(args):
 
     print(f"[INFO] 本日のバズツイート: {len(tweets)}件")
 
-    # 蓄積データ読み込み
-    eval_data = load_buzz_evaluations()
-    evaluated_ids = set(eval_data["evaluations"].keys())
+    # 蓄積データ（ID一覧のみ。本体は分析対象期間分だけ後で読む）
+    owns_store = store is None
+    if owns_store:
+        store = EvaluationStore("buzz")
 
-    # GC実行
-    gc_old_evaluations(eval_data, RETENTION_DAYS)
+    # GC実行（dry-runではストアを変更しない）
+    if not args.dry_run:
+        gc_old_evaluations(store, RETENTION_DAYS)
+    evaluated_ids = store.ids()
 
     # 未分類ツイート抽出
     if args.force:
@@ -868,16 +875,24 @@ async def async_main(args):
         print(f"[INFO] 未分類: {len(target_tweets)}件（既分類: {len(evaluated_ids)}件）")
 
     # key_persons読み込み
-    key_persons = load_key_persons()
+    if key_persons is None:
+        key_persons = load_key_persons()
     kp_count = len(key_persons.get("persons", {}))
     print(f"[INFO] key_persons: {kp_count}名")
 
     # LLM分類実行
     today_date = today_str()
     new_classifications = []
+    new_entries: dict[str, dict] = {}
     if target_tweets:
         print(f"\n[1/3] Groq LLM 分類中... ({len(target_tweets)}件)")
-        classifications = await classify_buzz_tweets(target_tweets, api_key)
+        # 途中で止まっても次回その続きから再開できるよう、バッチごとにチェックポイントを書く
+        journal = None if args.dry_run else EvalJournal(store)
+        classifications = await classify_buzz_tweets(
+            target_tweets, api_key,
+            use_distilled=not getattr(args, "no_distill", False), dry_run=args.dry_run,
+            journal=journal,
+        )
 
         # key_persons照合
         classifications = enrich_with_key_persons(classifications, target_tweets, key_persons)
@@ -914,25 +929,18 @@ async def async_main(args):
                 "virality_factor": cls.get("virality_factor", "information_value"),
                 "key_person": cls.get("key_person", {"is_key_person": False}),
             }
-            eval_data["evaluations"][tid] = entry
-
-        # daily_index更新
-        if today_date not in eval_data["daily_index"]:
-            eval_data["daily_index"][today_date] = []
-        new_ids = [cls["tweet_id"] for cls in classifications if cls.get("tweet_id")]
-        eval_data["daily_index"][today_date] = list(
-            set(eval_data["daily_index"][today_date] + new_ids)
-        )
-
-        # metadata更新
-        eval_data["metadata"]["last_updated"] = now_str()
-        eval_data["metadata"]["total_evaluated"] = len(eval_data["evaluations"])
-        dates = sorted(eval_data["daily_index"].keys())
-        if dates:
-            eval_data["metadata"]["date_range"] = {"oldest": dates[0], "newest": dates[-1]}
+            if cls.get("dup_group_id"):
+                entry["dup_group_id"] = cls["dup_group_id"]
+            # ローカル分類器で確定した分は再学習から除外できるよう印を残す
+            if cls.get("classifier"):
+                entry["classifier"] = cls["classifier"]
+                entry["classifier_confidence"] = cls.get("classifier_confidence")
+            new_entries[tid] = entry
 
         if not args.dry_run:
-            save_buzz_evaluations(eval_data)
+            save_buzz_evaluations(store, new_entries)
+            removed = journal.compact(new_entries)
+            print(f"[OK] チェックポイント整理: {removed}件削除（残り {journal.count()}件）")
         else:
             print("[DRY-RUN] 評価データ保存スキップ")
             for cls in classifications[:5]:
@@ -946,14 +954,11 @@ async def async_main(args):
     # 蓄積データからの分析（対象日数分）
     print(f"\n[2/3] パターン抽出分析（過去{analysis_days}日分）...")
     cutoff_date = (datetime.now() - timedelta(days=analysis_days)).strftime("%Y-%m-%d")
-    all_evals = [
-        ev for ev in eval_data["evaluations"].values()
-        if ev.get("evaluated_date", "") >= cutoff_date
-    ]
-    today_evals = [
-        ev for ev in eval_data["evaluations"].values()
-        if ev.get("evaluated_date", "") == today_date
-    ]
+    period_evals = {ev["tweet_id"]: ev for ev in store.query(since=cutoff_date)}
+    # dry-runでは未保存の新規分類もメモリ上でマージして分析する
+    period_evals.update(new_entries)
+    all_evals = list(period_evals.values())
+    today_evals = [ev for ev in all_evals if ev.get("evaluated_date", "") == today_date]
     print(f"[INFO] 分析対象: {len(all_evals)}件（本日: {len(today_evals)}件）")
 
     type_analysis = analyze_buzz_by_content_type(all_evals)
@@ -997,7 +1002,9 @@ async def async_main(args):
             print(f"\n... ({len(report)}文字)")
 
     print(f"\n=== 完了 ===")
-    print(f"蓄積: {len(eval_data['evaluations'])}件")
+    print(f"蓄積: {store.count()}件")
+    if owns_store:
+        store.close()
 
 
 def main():
@@ -1005,6 +1012,8 @@ def main():
     parser.add_argument("--dry-run", action="store_true", help="分類のみ（保存・レポートなし）")
     parser.add_argument("--force", action="store_true", help="本日分を全て再評価")
     parser.add_argument("--days", type=int, default=RETENTION_DAYS, help=f"蓄積分析の対象日数（デフォルト: {RETENTION_DAYS}）")
+    parser.add_argument("--no-distill", action="store_true",
+                        help="ローカル分類器（distilled_classifier.py）を使わず全件LLMで分類")
     args = parser.parse_args()
 
     logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
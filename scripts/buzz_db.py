@@ -0,0 +1,264 @@
+"""
+buzz_db.py - ai-buzz-extractor の ai_buzz.db 読み取り用アクセサ
+
+fetch_buzz_db.extract_discourse_signals は `created_at > ? AND category IN (...)` で
+tweets テーブルを2回フルスキャンして全行をPythonに読み込み、
+zeitgeist_detector._fetch_from_sqlite は計算式 `likes + retweets * 2 + quotes * 3` で
+ORDER BY していた（式にはインデックスが効かない）。
+
+ai_buzz.db は ai-buzz-extractor 側の持ち物なので、インデックスを直接追加せず
+x-auto 側のシャドウDB（data/ai_buzz_shadow_<hash>.db）に必要な列だけをコピーする。
+  - engagement = likes + retweets * 2 + quotes * 3 を生成列として持つ
+  - (category, created_at, likes) / (lang, created_at, engagement) のカバリングインデックス
+  - 元DB（とWALファイル）の mtime/サイズが変わったときだけ差分同期する
+    （元DBを読み取り専用でATTACHし、前回コピーした最新の created_at から
+     RESYNC_OVERLAP_DAYS 日遡った分だけを INSERT OR REPLACE。遡る分はコレクタが
+     いいね数を更新した直近のツイートを取り直すため。保持期間より古い行は範囲DELETEで落とす）
+  - シャドウが持っていない古い期間を要求されたときだけ全件を作り直す
+以降の読み取りはすべてシャドウ側のインデックスで完結する。
+
+クエリはすべてパラメータ化し、行は fetchmany で少しずつ返す。
+
+使い方:
+    with BuzzDB(DB_PATH) as db:
+        for row in db.iter_by_categories(cutoff, RELEVANT_CATEGORIES):
+            ...
+"""
+
+import hashlib
+import logging
+import sqlite3
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Iterator, Optional, Sequence
+
+from paths import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+# --- 定数 ---
+
+# シャドウDBに保持する期間（日）。これより古い期間を要求されたら、その期間で再同期する
+SHADOW_RETENTION_DAYS = 35
+
+# 差分同期で前回の最新 created_at から遡って取り直す日数（エンゲージメントの更新を反映するため）
+RESYNC_OVERLAP_DAYS = 2
+
+# fetchmany 1回あたりの行数
+FETCH_BATCH = 500
+
+# 元DBからコピーする列（両スクリプトが参照する列のみ）
+_COLUMNS = (
+    "id", "created_at", "username", "text", "likes", "retweets",
+    "quotes", "replies", "url", "lang", "category",
+)
+
+# zeitgeist_detector._calc_engagement と同じ重み
+ENGAGEMENT_SQL = "likes + retweets * 2 + quotes * 3"
+
+
+def shadow_path_for(source: Path) -> Path:
+    """元DBごとに別のシャドウDBを使う（スクリプトによって参照パスが異なるため）"""
+    digest = hashlib.sha1(str(source).encode("utf-8")).hexdigest()[:8]
+    return DATA_DIR / f"{source.stem}_shadow_{digest}.db"
+
+
+def _source_signature(source: Path) -> str:
+    """元DBとWALファイルの (mtime, サイズ)。WALモードではチェックポイントまで本体が変わらない"""
+    parts = []
+    for p in (source, source.with_name(source.name + "-wal")):
+        if p.exists():
+            st = p.stat()
+            parts.append(f"{p.name}:{st.st_mtime_ns}:{st.st_size}")
+    return "|".join(parts)
+
+
+def _days_before(date_str: str, days: int) -> str:
+    """YYYY-MM-DD の days 日前（created_at との文字列比較用）。解釈できなければ空文字（全期間）"""
+    try:
+        day = datetime.strptime(date_str, "%Y-%m-%d")
+    except ValueError:
+        return ""
+    return (day - timedelta(days=days)).strftime("%Y-%m-%d")
+
+
+class BuzzDB:
+    """ai_buzz.db の tweets テーブルをシャドウDB経由で読む"""
+
+    def __init__(self, source: Path, shadow: Optional[Path] = None):
+        self.source = source
+        self.shadow = shadow or shadow_path_for(source)
+
+        self.shadow.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.shadow), timeout=30.0)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+
+    def _create_schema(self) -> None:
+        self._conn.executescript(
+            f"""
+            CREATE TABLE IF NOT EXISTS tweets (
+                id PRIMARY KEY,
+                created_at TEXT,
+                username TEXT,
+                text TEXT,
+                likes INTEGER NOT NULL DEFAULT 0,
+                retweets INTEGER NOT NULL DEFAULT 0,
+                quotes INTEGER NOT NULL DEFAULT 0,
+                replies INTEGER NOT NULL DEFAULT 0,
+                url TEXT,
+                lang TEXT,
+                category TEXT,
+                engagement INTEGER GENERATED ALWAYS AS ({ENGAGEMENT_SQL}) VIRTUAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_tweets_category_created
+                ON tweets(category, created_at, likes);
+            CREATE INDEX IF NOT EXISTS idx_tweets_lang_created
+                ON tweets(lang, created_at, engagement);
+            CREATE INDEX IF NOT EXISTS idx_tweets_created
+                ON tweets(created_at);
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            """
+        )
+        self._conn.commit()
+
+    # --- 同期 ---
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def sync(self, since: str) -> None:
+        """元DBが変わっていれば差分同期し、since がシャドウの保持範囲より古ければ作り直す。
+
+        since は created_at と文字列比較できる形式（YYYY-MM-DD... / ISO 8601）。
+        """
+        signature = _source_signature(self.source)
+        synced_since = self._get_meta("synced_since")
+        watermark = self._get_meta("watermark")
+        default_since = _days_before(
+            datetime.now(timezone.utc).strftime("%Y-%m-%d"), SHADOW_RETENTION_DAYS
+        )
+
+        if synced_since is None or watermark is None or since < synced_since:
+            rebuild = True
+            copy_from = min(since[:10], default_since)
+            keep_since = copy_from
+        elif self._get_meta("source_signature") == signature:
+            return
+        else:
+            rebuild = False
+            copy_from = _days_before(watermark[:10], RESYNC_OVERLAP_DAYS)
+            keep_since = max(synced_since, default_since)
+
+        cols = ", ".join(_COLUMNS)
+        self._conn.execute(
+            "ATTACH DATABASE ? AS src", (f"{self.source.resolve().as_uri()}?mode=ro",)
+        )
+        try:
+            with self._conn:
+                if rebuild:
+                    self._conn.execute("DELETE FROM tweets")
+                else:
+                    self._conn.execute("DELETE FROM tweets WHERE created_at < ?", (keep_since,))
+                copied = self._conn.execute(
+                    f"INSERT OR REPLACE INTO tweets ({cols}) "
+                    f"SELECT {cols} FROM src.tweets WHERE created_at >= ?",
+                    (max(copy_from, keep_since),),
+                ).rowcount
+                newest = self._conn.execute("SELECT MAX(created_at) FROM tweets").fetchone()[0]
+                self._conn.executemany(
+                    "INSERT INTO meta (key, value) VALUES (?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                    [
+                        ("source_signature", signature),
+                        ("synced_since", keep_since),
+                        ("watermark", newest or keep_since),
+                    ],
+                )
+        finally:
+            self._conn.execute("DETACH DATABASE src")
+        if rebuild:
+            self._conn.execute("ANALYZE")
+            count = self._conn.execute("SELECT COUNT(*) FROM tweets").fetchone()[0]
+            logger.info(f"{self.source.name} をシャドウDBに同期: {count}件（{keep_since}以降）")
+        else:
+            logger.info(f"{self.source.name} をシャドウDBに差分同期: {copied}件（{copy_from}以降）")
+
+    # --- 読み込み ---
+
+    def iter_rows(self, sql: str, params: Sequence = ()) -> Iterator[sqlite3.Row]:
+        """パラメータ化クエリの結果を FETCH_BATCH 行ずつ読みながら返す"""
+        cur = self._conn.execute(sql, params)
+        try:
+            while True:
+                rows = cur.fetchmany(FETCH_BATCH)
+                if not rows:
+                    return
+                yield from rows
+        finally:
+            cur.close()
+
+    def category_stats(self, since: str, categories: Sequence[str]) -> list[sqlite3.Row]:
+        """カテゴリ別の (category, cnt, avg_likes)。件数の多い順"""
+        self.sync(since)
+        placeholders = ",".join("?" * len(categories))
+        return list(self.iter_rows(
+            f"""
+            SELECT category, COUNT(*) AS cnt, AVG(likes) AS avg_likes
+            FROM tweets
+            WHERE category IN ({placeholders}) AND created_at > ?
+            GROUP BY category ORDER BY cnt DESC
+            """,
+            [*categories, since],
+        ))
+
+    def iter_by_categories(
+        self, since: str, categories: Sequence[str]
+    ) -> Iterator[sqlite3.Row]:
+        """指定カテゴリの since より新しいツイートを いいね数の多い順に返す"""
+        self.sync(since)
+        placeholders = ",".join("?" * len(categories))
+        return self.iter_rows(
+            f"""
+            SELECT text, username, likes, category, created_at, url
+            FROM tweets
+            WHERE category IN ({placeholders}) AND created_at > ?
+            ORDER BY likes DESC
+            """,
+            [*categories, since],
+        )
+
+    def top_engagement(self, since: str, lang: str, limit: int) -> list[dict]:
+        """since 以降の指定言語ツイートをエンゲージメント順に上位 limit 件"""
+        self.sync(since)
+        return [
+            dict(row)
+            for row in self.iter_rows(
+                """
+                SELECT id, created_at, username, text, likes, retweets, quotes, replies,
+                       url, lang, category
+                FROM tweets
+                WHERE lang = ? AND created_at >= ?
+                ORDER BY engagement DESC
+                LIMIT ?
+                """,
+                (lang, since, limit),
+            )
+        ]
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def __enter__(self) -> "BuzzDB":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
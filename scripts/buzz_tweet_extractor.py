@@ -11,6 +11,14 @@ min_faves:500の広めクエリで補完する。
 実行スケジュール: 毎日 06:30 JST（zeitgeist_detector 07:00の前）
 コスト: $0.00/日（twscrape = 非公式API）
 
+差分取得:
+  クエリごとに前回の検索時刻（ウォーターマーク）を保存し、次回以降は
+  「前回検索時刻 - WATERMARK_OVERLAP_HOURS」より新しいツイートだけをページングする
+  （min_faves到達が遅れたツイートを拾うため少し重ねて遡る）。
+  窓内の候補ツイートは buzz-candidates.json に保持し、今回の検索で再取得されなかった
+  上位候補は tweet_details（TweetDetail枠。検索枠は消費しない）でエンゲージメントを更新する。
+  --full で従来どおり検索期間全体を再検索する。
+
 出力:
 - x-auto/scripts/data/buzz-tweets-latest.json
 - Obsidian日次レポート
@@ -33,7 +41,13 @@ try:
 except ImportError:
     print("[WARNING] twscrape_patch not found - JSON parsing may fail")
 
-from twscrape import API, AccountsPool
+
+sys.path.insert(0, str(Path(__file__).parent))
+from twscrape_search import (
+    SearchExecutor, SearchJob, check_rate_limit, snowflake_from_datetime,
+)
+from topk import merge_top_k
+from tweet_corpus import add_search_results
 
 # === 設定 ===
 
@@ -44,6 +58,10 @@ ACCOUNTS_DB = Path(r"C:\Users\Tenormusica\Documents\ai-buzz-extractor-dev\accoun
 OUTPUT_DIR = Path(__file__).parent / "data"
 OUTPUT_JSON = OUTPUT_DIR / "buzz-tweets-latest.json"
 
+# 差分取得の状態（クエリ別ウォーターマーク / 検索期間内の候補ツイート）
+WATERMARKS_JSON = OUTPUT_DIR / "buzz-watermarks.json"
+CANDIDATES_JSON = OUTPUT_DIR / "buzz-candidates.json"
+
 # Obsidianレポート出力先
 OBSIDIAN_DIR = Path(r"D:\antigravity_projects\VaultD\Projects\Monetization\Intelligence\x-analytics\buzz-tweets")
 
@@ -65,8 +83,18 @@ QUERY_LIMIT = 50
 # 最終出力件数
 MAX_OUTPUT = 100
 
-# クエリ間待機秒数（レート制限対策）
-QUERY_DELAY = 2
+# 次回に持ち越す候補プールの上限（エンゲージメント上位から）。検索期間内の候補は通常これより少ない
+CANDIDATE_POOL_SIZE = MAX_OUTPUT * 5
+
+# 同一アカウントでの連続検索の最小間隔（秒）。クエリはアカウント数だけ並列実行される
+ACCOUNT_PACE_SECONDS = 2
+
+# 差分取得時、前回検索時刻からさらに遡る時間（後からmin_favesに到達したツイート対策）
+WATERMARK_OVERLAP_HOURS = 6
+
+# 今回の検索で再取得されなかった候補のうち、エンゲージメントを再取得する上位件数と間隔
+REFRESH_LIMIT = 50
+REFRESH_INTERVAL_HOURS = 2
 
 # JST timezone
 JST = timezone(timedelta(hours=9))
@@ -78,43 +106,6 @@ def log(msg: str, level: str = "INFO"):
     print(f"[{timestamp}] [{level}] {msg}")
 
 
-def check_rate_limit() -> tuple[bool, Optional[str]]:
-    """accounts.dbからtwscrapeのレート制限状態を事前確認"""
-    import sqlite3
-    conn = None
-    try:
-        conn = sqlite3.connect(str(ACCOUNTS_DB))
-        cursor = conn.cursor()
-        cursor.execute("SELECT locks FROM accounts LIMIT 1")
-        row = cursor.fetchone()
-
-        if not row or not row[0]:
-            return True, None
-
-        locks = json.loads(row[0])
-        search_lock = locks.get("SearchTimeline")
-
-        if not search_lock:
-            return True, None
-
-        # locks はUTCで保存 → aware datetimeに変換してJST比較
-        lock_time_utc = datetime.strptime(search_lock, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
-        lock_time_jst = lock_time_utc.astimezone(JST)
-        now = datetime.now(JST)
-
-        if now >= lock_time_jst:
-            return True, None
-        else:
-            return False, lock_time_jst.strftime("%H:%M:%S")
-
-    except Exception as e:
-        log(f"accounts.db読み込みエラー: {e}", "WARNING")
-        return True, None  # エラー時は続行を試みる
-    finally:
-        if conn:
-            conn.close()
-
-
 def calculate_engagement(tweet) -> int:
     """エンゲージメントスコア計算（バズ度重視）
     Score = 引用RT×5 + リプライ×4 + RT×2 + いいね×1
@@ -131,93 +122,192 @@ def calculate_engagement(tweet) -> int:
     return quotes * 5 + replies * 4 + retweets * 2 + likes * 1
 
 
-async def fetch_buzz_tweets(dry_run: bool = False, query_limit: int = QUERY_LIMIT) -> Dict:
-    """全クエリでバズツイートを収集し、重複排除してエンゲージメント順でソート"""
+def _load_state(path: Path) -> Dict:
+    """差分取得の状態ファイルを読み込み（なければ空）"""
+    if not path.exists():
+        return {}
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError) as e:
+        log(f"{path.name} 読み込みエラー（全期間検索にフォールバック）: {e}", "WARNING")
+        return {}
+
+
+def _save_state(path: Path, data: Dict):
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+def _parse_iso(value: str) -> Optional[datetime]:
+    try:
+        dt = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def _stop_id_for(q: Dict, watermark: Optional[Dict], window_start: datetime) -> Optional[int]:
+    """ウォーターマークから打ち切りIDを決める。使えない場合はNone（検索期間全体を検索）"""
+    if not watermark or watermark.get("query") != q["query"]:
+        return None
+    searched_at = _parse_iso(watermark.get("searched_at", ""))
+    if searched_at is None or searched_at < window_start:
+        return None
+    stop_dt = max(window_start, searched_at - timedelta(hours=WATERMARK_OVERLAP_HOURS))
+    return snowflake_from_datetime(stop_dt)
+
+
+async def fetch_buzz_tweets(
+    dry_run: bool = False, query_limit: int = QUERY_LIMIT, full: bool = False
+) -> Dict:
+    """全クエリでバズツイートを収集し、重複排除してエンゲージメント順でソート
+
+    full=False ではウォーターマーク以降の新着だけを検索し、前回までの候補とマージする。
+    """
 
     # レート制限チェック
-    available, next_time = check_rate_limit()
+    available, next_time = check_rate_limit(ACCOUNTS_DB)
     if not available:
         log(f"twscrapeレート制限中（解除予定: {next_time}）- スキップ", "WARNING")
         return {"tweets": [], "skipped": True, "reason": f"rate_limited until {next_time}"}
 
-    api = API(str(ACCOUNTS_DB))
+    executor = SearchExecutor(ACCOUNTS_DB, pace_seconds=ACCOUNT_PACE_SECONDS)
 
     # 検索期間: 昨日00:00〜今日23:59
-    today = datetime.now(JST).date()
+    now = datetime.now(JST)
+    today = now.date()
     yesterday = today - timedelta(days=1)
     since_str = yesterday.strftime("%Y-%m-%d")
     until_str = (today + timedelta(days=1)).strftime("%Y-%m-%d")
+    window_start = datetime(yesterday.year, yesterday.month, yesterday.day, tzinfo=JST)
+
+    # 前回までの状態（dry-runでは読み書きしない）
+    watermarks = {} if (full or dry_run) else _load_state(WATERMARKS_JSON)
+    candidates = {} if dry_run else _load_state(CANDIDATES_JSON)
+    refreshed_at: Dict[str, str] = candidates.get("refreshed_at", {})
+
+    # 検索期間外に出た候補は捨てる
+    pool: Dict[int, Dict] = {}  # 前回までの候補 tweet_id -> tweet_data
+    for t in candidates.get("tweets", {}).values():
+        created = _parse_iso(t.get("created_at", ""))
+        if created is not None and created >= window_start:
+            pool[int(t["id"])] = t
+    searched: List[Dict] = []  # 今回の検索結果（重複排除は merge_top_k でまとめて行う）
 
-    all_tweets: Dict[int, Dict] = {}  # tweet_id -> tweet_data（重複排除用）
     query_stats = []
     total_fetched = 0
 
+    # 全クエリを組み立て（dry-runでは検索しない）
+    jobs = []
     for i, q in enumerate(SEARCH_QUERIES):
-        label = q["label"]
-        base_query = q["query"]
-        full_query = f"{base_query} -filter:retweets since:{since_str} until:{until_str}"
-
-        log(f"[{i+1}/{len(SEARCH_QUERIES)}] {label}: {full_query}")
+        stop_id = _stop_id_for(q, watermarks.get(q["label"]), window_start)
+        full_query = f"{q['query']} -filter:retweets since:{since_str} until:{until_str}"
+        if stop_id is not None:
+            full_query += f" since_id:{stop_id}"
+        mode = "差分" if stop_id is not None else "全期間"
+        log(f"[{i+1}/{len(SEARCH_QUERIES)}] {q['label']} ({mode}): {full_query}")
+        jobs.append(SearchJob(label=q["label"], query=full_query, limit=query_limit, stop_at_id=stop_id))
+
+    if dry_run:
+        log(f"  (dry-run) 検索スキップ")
+        query_stats = [{"label": j.label, "fetched": 0, "errors": 0} for j in jobs]
+        search_results = []
+    else:
+        # 空きアカウント数だけ並列検索（結果は投入順）
+        search_results = await executor.run(jobs)
+        corpus_added = add_search_results(search_results, source="buzz")
+        log(f"  ローカルコーパスに{corpus_added}件追加")
+
+    searched_ids = set()
+    searched_at = now.isoformat()
+
+    # 投入順に積むので、重複排除の結果は直列実行時と同じ
+    for q, job, r in zip(SEARCH_QUERIES, jobs, search_results):
+        label = r.label
+        if r.skipped:
+            reason = "全アカウントがレート制限で停止" if r.rate_limited else "空きアカウントなし"
+            log(f"  {label}: {reason} - スキップ", "WARNING")
+            continue
 
         fetched = 0
         errors = 0
-
-        if dry_run:
-            log(f"  (dry-run) スキップ")
-            query_stats.append({"label": label, "fetched": 0, "errors": 0})
-            continue
-
-        try:
-            async for tweet in api.search(full_query, limit=query_limit):
-                try:
-                    tweet_id = tweet.id
-                    if tweet_id in all_tweets:
-                        # 重複: エンゲージメントが高い方を保持（カウントしない）
-                        existing_eng = all_tweets[tweet_id]["engagement_score"]
-                        new_eng = calculate_engagement(tweet)
-                        if new_eng > existing_eng:
-                            all_tweets[tweet_id] = _tweet_to_dict(tweet, label, new_eng)
-                        continue
-
-                    eng = calculate_engagement(tweet)
-                    all_tweets[tweet_id] = _tweet_to_dict(tweet, label, eng)
-                    fetched += 1
-
-                except Exception as e:
-                    errors += 1
-                    log(f"  ツイート処理エラー: {e}", "WARNING")
-
-        except Exception as e:
-            error_msg = str(e)
-            if "429" in error_msg or "rate" in error_msg.lower():
-                log(f"  レート制限検出 - 残りクエリスキップ", "WARNING")
-                query_stats.append({"label": label, "fetched": fetched, "errors": errors + 1})
-                break
-            else:
-                log(f"  検索エラー: {e}", "ERROR")
+        for tweet in r.tweets:
+            try:
+                searched.append(_tweet_to_dict(tweet, label, calculate_engagement(tweet)))
+                searched_ids.add(tweet.id)
+                fetched += 1
+            except Exception as e:
                 errors += 1
+                log(f"  ツイート処理エラー: {e}", "WARNING")
+
+        if r.rate_limited:
+            log(f"  {label}: レート制限検出 - このアカウントのスロットを停止", "WARNING")
+            errors += 1
+        elif r.error:
+            log(f"  {label}: 検索エラー: {r.error}", "ERROR")
+            errors += 1
+
+        # ウォーターマーク更新: 取りこぼしがない場合のみ進める
+        # （打ち切りIDに到達した / 上限未満で尽きた / 全期間検索を完走した）
+        completed = not r.error and (
+            r.reached_stop or len(r.tweets) < job.limit or job.stop_at_id is None
+        )
+        # 打ち切りは検索時刻から決める（min_faves到達が遅れたツイートを拾うため、
+        # 前回の最新IDではなく WATERMARK_OVERLAP_HOURS 遡った時刻のIDで止める）
+        if completed:
+            watermarks[label] = {"query": q["query"], "searched_at": searched_at}
 
         total_fetched += fetched
-        log(f"  取得: {fetched}件 (エラー: {errors})")
+        log(f"  {label}: 取得 {fetched}件 (エラー: {errors}, {r.elapsed:.1f}s)")
         query_stats.append({"label": label, "fetched": fetched, "errors": errors})
 
-        # クエリ間待機
-        if i < len(SEARCH_QUERIES) - 1:
-            await asyncio.sleep(QUERY_DELAY)
-
-    # エンゲージメント順ソート → 上位MAX_OUTPUT件
-    sorted_tweets = sorted(
-        all_tweets.values(),
-        key=lambda t: t["engagement_score"],
-        reverse=True
-    )[:MAX_OUTPUT]
+    # 今回の検索で再取得されなかった上位候補のエンゲージメントを更新（検索枠は消費しない）
+    refreshed: Dict[int, Dict] = {}
+    if not dry_run:
+        refresh_cutoff = now - timedelta(hours=REFRESH_INTERVAL_HOURS)
+        stale = [
+            tid for tid, t in sorted(
+                pool.items(), key=lambda kv: kv[1]["engagement_score"], reverse=True
+            )
+            if tid not in searched_ids
+            and (_parse_iso(refreshed_at.get(str(tid), "")) or window_start) < refresh_cutoff
+        ][:REFRESH_LIMIT]
+        if stale:
+            found = await executor.lookup_tweets(stale)
+            for tid, tweet in found.items():
+                label = pool[tid]["query_source"]
+                refreshed[tid] = _tweet_to_dict(tweet, label, calculate_engagement(tweet))
+                refreshed_at[str(tid)] = searched_at
+            log(f"エンゲージメント再取得: {len(found)}/{len(stale)}件（候補プール {len(pool)}件）")
+        for tid in searched_ids:
+            refreshed_at[str(tid)] = searched_at
+
+    # 今回の検索結果・再取得分・前回までの候補をID（なければURL）で重複排除し、
+    # エンゲージメントが高い方を残す。再取得した候補は前回の値を捨てて新しい値を使う
+    sorted_pool, merge_stats = merge_top_k(
+        [searched, refreshed.values(), (t for tid, t in pool.items() if tid not in refreshed)],
+        CANDIDATE_POOL_SIZE,
+        score=lambda t: t["engagement_score"],
+        key=lambda t: t["id"] or t.get("url"),
+    )
+    sorted_tweets = sorted_pool[:MAX_OUTPUT]
+    log(f"重複排除: {merge_stats}（出力 {len(sorted_tweets)}件）")
+
+    if not dry_run:
+        _save_state(WATERMARKS_JSON, watermarks)
+        pool_out = {t["id"]: t for t in sorted_pool}
+        _save_state(CANDIDATES_JSON, {
+            "updated_at": searched_at,
+            "tweets": pool_out,
+            "refreshed_at": {k: v for k, v in refreshed_at.items() if k in pool_out},
+        })
 
     result = {
         "generated_at": datetime.now(JST).isoformat(),
         "search_period": {"since": since_str, "until": until_str},
         "query_count": len(SEARCH_QUERIES),
         "total_fetched": total_fetched,
-        "after_dedup": len(all_tweets),
+        "after_dedup": merge_stats.unique,
         "exported": len(sorted_tweets),
         "query_stats": query_stats,
         "tweets": sorted_tweets,
@@ -306,12 +396,43 @@ def save_obsidian_report(result: Dict) -> Optional[Path]:
         return None
 
 
+async def run(
+    dry_run: bool = False, query_limit: int = QUERY_LIMIT, full: bool = False
+) -> Dict:
+    """抽出 → JSON保存 → Obsidianレポートまで実行し、抽出結果を返す（daily_pipeline.pyからも利用）
+
+    dry-run では検索しないので出力は空になる。前回のエクスポートを上書きしないよう保存もしない。
+    """
+    result = await fetch_buzz_tweets(dry_run=dry_run, query_limit=query_limit, full=full)
+
+    if result.get("skipped"):
+        log(f"スキップ: {result.get('reason', 'unknown')}", "WARNING")
+        return result
+
+    if dry_run:
+        log("dry-run完了 - ファイル保存をスキップ")
+        return result
+
+    # JSON保存
+    save_json(result)
+
+    # Obsidianレポート
+    save_obsidian_report(result)
+
+    log("=" * 60)
+    log(f"完了 - {result['exported']}件エクスポート")
+    log("=" * 60)
+    return result
+
+
 async def main():
     """メインエントリポイント"""
     import argparse
     parser = argparse.ArgumentParser(description="AI Buzz Tweet Extractor")
     parser.add_argument("--dry-run", action="store_true", help="API呼び出しなしで動作確認")
     parser.add_argument("--limit", type=int, default=QUERY_LIMIT, help="各クエリの取得上限")
+    parser.add_argument("--full", action="store_true",
+                        help="ウォーターマークを無視して検索期間全体を再検索")
     args = parser.parse_args()
 
     query_limit = args.limit
@@ -323,6 +444,7 @@ async def main():
     log(f"  limit/query: {query_limit}")
     log(f"  max output: {MAX_OUTPUT}")
     log(f"  dry-run: {args.dry_run}")
+    log(f"  full: {args.full}")
     log("=" * 60)
 
     # accounts.db存在チェック
@@ -331,22 +453,10 @@ async def main():
         sys.exit(1)
 
     try:
-        result = await fetch_buzz_tweets(dry_run=args.dry_run, query_limit=query_limit)
-
+        result = await run(dry_run=args.dry_run, query_limit=query_limit, full=args.full)
         if result.get("skipped"):
-            log(f"スキップ: {result.get('reason', 'unknown')}", "WARNING")
             sys.exit(0)
 
-        # JSON保存
-        save_json(result)
-
-        # Obsidianレポート
-        save_obsidian_report(result)
-
-        log("=" * 60)
-        log(f"完了 - {result['exported']}件エクスポート")
-        log("=" * 60)
-
     except Exception as e:
         log(f"致命的エラー: {e}", "ERROR")
         log(traceback.format_exc(), "ERROR")
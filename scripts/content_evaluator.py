@@ -17,6 +17,7 @@ daily_metrics.py が蓄積した tweet_details.json を入力として使用。
   python -X utf8 content_evaluator.py            # 未分類ツイートを評価 + レポート生成
   python -X utf8 content_evaluator.py --dry-run  # 分類のみ（レポート・保存なし）
   python -X utf8 content_evaluator.py --force    # 全ツイート再評価
+  python -X utf8 content_evaluator.py --no-distill  # ローカル分類器を使わず全件LLM
 
 コスト: $0.00（Groq無料枠）
 """
@@ -30,7 +31,6 @@ import logging
 from pathlib import Path
 from datetime import datetime
 
-import httpx
 from dotenv import load_dotenv
 
 # GROQ_API_KEYを.envから読み込み（zeitgeist_detector.pyと同じ）
@@ -43,21 +43,30 @@ from x_client import (
     notify_discord, save_to_obsidian, today_str, now_str,
     DATA_DIR, OBSIDIAN_BASE,
 )
+from groq_client import GroqClient, compact_text, estimate_tokens, pack_batches
+from llm_batches import classify_in_rounds, stream_json_items
+from eval_store import EvalJournal, EvaluationStore
+from distilled_classifier import split_for_llm, record_audit
 
 logger = logging.getLogger(__name__)
 
 # --- 定数 ---
 
-GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
-GROQ_MODEL = "llama-3.3-70b-versatile"
 OBSIDIAN_EVAL = OBSIDIAN_BASE / "evaluations"
-EVAL_PATH = DATA_DIR / "content_evaluations.json"
 
-# 1バッチあたりのツイート数（プロンプトサイズ管理）
-BATCH_SIZE = 5
-# バッチ間待機（Groq free tier RPM 30対策: 5秒 → 12 RPM safe）
-BATCH_DELAY = 5.0
-BACKOFF_SCHEDULE = [5, 15, 30, 60]
+# 1リクエストに詰めるツイート数は groq_client.pack_batches がトークン見積もりで決める。
+# 件数の上限（出力JSONの品質を保つため）と、出力JSON 1要素あたりのトークン見積もり
+# RPM/TPMのペース配分は groq_client.py の共有レートリミッタが担当
+MAX_BATCH_SIZE = 20
+OUTPUT_TOKENS_PER_TWEET = 100
+# LLM応答の要素に必須のフィールド（欠けた要素は採用せず再リクエスト。bip_authenticity は null 可なので除く）
+REQUIRED_FIELDS = (
+    "content_type", "originality", "media_contribution", "news_saturation",
+    "ai_citation_value", "reputation_risk",
+)
+
+# CLASSIFICATION_PROMPT を変更したら上げる（llm_cache のキーに含まれ、旧結果が無効になる）
+EVAL_PROMPT_VERSION = "eval-v1"
 
 CLASSIFICATION_PROMPT = """\
 あなたはX(Twitter)コンテンツ戦略の専門アナリストです。
@@ -154,135 +163,110 @@ def load_tweet_details() -> dict:
     return {"tweets": [], "last_updated": ""}
 
 
-def load_evaluations() -> dict:
-    """content_evaluations.json を読み込み"""
-    if EVAL_PATH.exists():
-        return json.loads(EVAL_PATH.read_text(encoding="utf-8"))
-    return {"evaluations": {}, "last_updated": ""}
+def save_evaluations(store: EvaluationStore, entries: dict[str, dict]):
+    """変更分の評価だけを評価ストア（SQLite）にupsert"""
+    count = store.upsert(entries)
+    store.last_updated = now_str()
+    print(f"[OK] 評価データ保存: {count}件 → {store.path}")
 
 
-def save_evaluations(data: dict):
-    """content_evaluations.json を保存"""
-    DATA_DIR.mkdir(parents=True, exist_ok=True)
-    EVAL_PATH.write_text(
-        json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8"
-    )
-    print(f"[OK] 評価データ保存: {EVAL_PATH}")
+# --- Groq LLM 分類 ---
 
+def _media_label(t: dict) -> str:
+    return f"画像: {t.get('media_type', 'なし')}" if t.get("has_media") else "画像: なし"
+
+
+def _tweet_block(i: int, t: dict) -> str:
+    """プロンプト内のツイート1件分（URL・空白を詰めた本文）"""
+    return f"### ツイート {i}（{_media_label(t)}）\n{compact_text(t.get('text', ''))}\n\n"
+
+
+def _cache_text(t: dict) -> str:
+    """キャッシュキー用の本文（画像有無も分類結果に影響するので含める）"""
+    return f"{_media_label(t)}\n{t.get('text', '')}"
 
-# --- Groq LLM 分類 ---
 
 async def classify_tweets(
-    tweets: list[dict], api_key: str
+    tweets: list[dict],
+    api_key: str,
+    use_distilled: bool = True,
+    dry_run: bool = False,
+    journal: EvalJournal | None = None,
 ) -> list[dict]:
-    """ツイート群をGroq LLMでバッチ分類"""
-    results = []
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        for batch_start in range(0, len(tweets), BATCH_SIZE):
-            batch = tweets[batch_start : batch_start + BATCH_SIZE]
-            batch_results = await _classify_batch(client, batch, api_key)
-            results.extend(batch_results)
-
-            # バッチ間待機
-            if batch_start + BATCH_SIZE < len(tweets):
-                print(f"  [WAIT] {BATCH_DELAY}秒待機（rate limit対策）...")
-                await asyncio.sleep(BATCH_DELAY)
+    """ツイート群をGroq LLMでバッチ分類（レートリミッタの許す範囲で並列実行）"""
+    # 前回途中で止まった実行のチェックポイントがあれば、そのツイートはLLMに送らず復元する
+    resumed = journal.load(t["id"] for t in tweets) if journal is not None else {}
+    if resumed:
+        tweets = [t for t in tweets if t["id"] not in resumed]
+        print(f"  [RESUME] 前回中断した実行から {len(resumed)}件を復元")
+
+    async with GroqClient(api_key) as groq:
+        # 同じ本文の分類結果がキャッシュにあるツイートはAPIに送らない
+        cached_results = []
+        pending = []
+        for t in tweets:
+            cached = groq.cache_get(EVAL_PROMPT_VERSION, _cache_text(t))
+            if cached is None:
+                pending.append(t)
+            else:
+                cached_results.append(
+                    {**cached, "tweet_id": t["id"], "evaluated_at": datetime.now().isoformat()}
+                )
+        if cached_results:
+            print(f"  [CACHE] {len(cached_results)}件をキャッシュから復元")
+
+        # 蒸留モデルの確信度が高いツイートはローカルで確定（低確信度と監査分だけLLMへ）
+        local_results, audit = [], {}
+        if use_distilled:
+            local_results, pending, audit = split_for_llm("content", pending, _cache_text)
+
+        def pack(items: list[dict]) -> list[list[dict]]:
+            return pack_batches(
+                items,
+                lambda t: estimate_tokens(_tweet_block(0, t)),
+                base_tokens=estimate_tokens(CLASSIFICATION_PROMPT),
+                output_tokens_per_item=OUTPUT_TOKENS_PER_TWEET,
+                budget=groq.request_token_budget(),
+                max_items=MAX_BATCH_SIZE,
+            )
 
-            print(f"  [PROGRESS] {min(batch_start + BATCH_SIZE, len(tweets))}/{len(tweets)} 完了")
+        # 応答が途中で切れても届いた分は使い、欠けたツイートだけを再リクエストする
+        llm_results, salvage = await classify_in_rounds(
+            pending, lambda batch: _classify_batch(groq, batch), pack,
+            on_batch=journal.append if journal is not None else None,
+        )
+        if pending:
+            print(f"  [SALVAGE] {salvage.summary()}")
+        print(f"  [GROQ] {groq.summary()}")
 
-    return results
+    if audit:
+        record_audit("content", audit, llm_results, persist=not dry_run)
+    return list(resumed.values()) + cached_results + local_results + llm_results
 
 
 async def _classify_batch(
-    client: httpx.AsyncClient,
+    groq: GroqClient,
     tweets: list[dict],
-    api_key: str,
-) -> list[dict]:
-    """1バッチ（最大5ツイート）をGroqで分類"""
-    # プロンプト組み立て
-    tweets_block = ""
-    for i, t in enumerate(tweets):
-        media_info = f"画像: {t.get('media_type', 'なし')}" if t.get("has_media") else "画像: なし"
-        tweets_block += f"### ツイート {i}（{media_info}）\n{t.get('text', '')}\n\n"
+) -> dict[int, dict]:
+    """1バッチ（pack_batches で詰めたツイート群）をGroqで分類し、{バッチ内index: 結果} を返す。
 
+    応答はストリーミングで受け取り、完成した要素から採用する（途中で切れた分・不正な要素は含めない）。
+    """
+    tweets_block = "".join(_tweet_block(i, t) for i, t in enumerate(tweets))
     prompt = CLASSIFICATION_PROMPT.format(tweets_block=tweets_block)
 
-    # Groq API呼び出し（リトライ付き）
-    for attempt in range(4):
-        try:
-            response = await client.post(
-                GROQ_API_URL,
-                headers={
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "model": GROQ_MODEL,
-                    "messages": [{"role": "user", "content": prompt}],
-                    "temperature": 0.1,
-                    "max_tokens": 1500,
-                },
-            )
-            response.raise_for_status()
-            result = response.json()
-            content = result["choices"][0]["message"]["content"].strip()
-
-            # JSON抽出（```json ... ``` 対応）
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0].strip()
-
-            parsed = json.loads(content)
-
-            # tweet_idを付与して返す
-            for item in parsed:
-                idx = item.get("tweet_index", 0)
-                if 0 <= idx < len(tweets):
-                    item["tweet_id"] = tweets[idx]["id"]
-                    item["evaluated_at"] = datetime.now().isoformat()
-            return parsed
-
-        except httpx.HTTPStatusError as e:
-            if e.response.status_code == 429:
-                wait = BACKOFF_SCHEDULE[min(attempt, len(BACKOFF_SCHEDULE) - 1)]
-                retry_after = e.response.headers.get("retry-after")
-                if retry_after:
-                    try:
-                        wait = float(retry_after) + 1
-                    except ValueError:
-                        pass
-                print(f"  [WARN] Rate limited (429), {wait}秒後にリトライ...")
-                await asyncio.sleep(wait)
-                continue
-            logger.error(f"HTTP error ({e.response.status_code}): {e}")
-            break
-
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON parse error: {e}")
-            logger.error(f"Raw content: {content[:200]}")
-            break
-
-        except Exception as e:
-            logger.error(f"Unexpected error: {e}")
-            break
-
-    # 失敗時はデフォルト値
-    print(f"  [WARN] バッチ分類失敗。デフォルト値を使用")
-    return [
-        {
-            "tweet_id": t["id"],
-            "content_type": "other",
-            "originality": 3,
-            "media_contribution": "none" if not t.get("has_media") else "enhancing",
-            "news_saturation": "n/a",
-            "bip_authenticity": None,
-            "ai_citation_value": 2,
-            "reputation_risk": 1,
-            "evaluated_at": datetime.now().isoformat(),
-        }
-        for t in tweets
-    ]
+    # 429リトライはGroqClient内で処理
+    got = await stream_json_items(
+        groq, prompt,
+        max_tokens=OUTPUT_TOKENS_PER_TWEET * len(tweets) + 100,
+        n_items=len(tweets),
+        required_fields=REQUIRED_FIELDS,
+    )
+    for idx, item in got.items():
+        groq.cache_put(EVAL_PROMPT_VERSION, _cache_text(tweets[idx]), dict(item))
+        item["tweet_id"] = tweets[idx]["id"]
+        item["evaluated_at"] = datetime.now().isoformat()
+    return got
 
 
 # --- 分析関数群 ---
@@ -777,7 +761,14 @@ W-Score = Xアルゴリズム重み付きエンゲージメント。高いほど
 
 # --- メイン ---
 
-async def async_main(args):
+async def async_main(
+    args,
+    details: dict | None = None,
+    store: EvaluationStore | None = None,
+):
+    """details / store は daily_pipeline.py から前段の結果を受け取るための引数。
+    省略時は従来どおりファイル・ストアから読む（store を渡した場合は閉じない）。
+    """
     api_key = os.getenv("GROQ_API_KEY")
     if not api_key:
         print("[ERROR] GROQ_API_KEY が環境変数に未設定")
@@ -786,7 +777,8 @@ async def async_main(args):
     print("=== コンテンツ評価分析 ===")
 
     # ツイート詳細読み込み
-    details = load_tweet_details()
+    if details is None:
+        details = load_tweet_details()
     # textフィールドがあるツイートのみ対象（Phase 1拡充後のデータ）
     all_tweets = [t for t in details["tweets"] if t.get("text")]
     print(f"[INFO] text付きツイート: {len(all_tweets)}件 / 全{len(details['tweets'])}件")
@@ -796,9 +788,11 @@ async def async_main(args):
         print("[HINT] daily_metrics.py を実行してデータを蓄積してください")
         return
 
-    # 既存評価読み込み
-    eval_data = load_evaluations()
-    evaluated_ids = set(eval_data["evaluations"].keys())
+    # 既存評価（ID一覧のみ。本体は分析対象分だけ後で読む）
+    owns_store = store is None
+    if owns_store:
+        store = EvaluationStore("content")
+    evaluated_ids = store.ids()
 
     # 未分類ツイート抽出
     if args.force:
@@ -809,21 +803,29 @@ async def async_main(args):
         print(f"[INFO] 未分類: {len(target_tweets)}件（既分類: {len(evaluated_ids)}件）")
 
     # LLM分類実行
+    new_entries: dict[str, dict] = {}
     if target_tweets:
         print(f"\n[1/3] Groq LLM 分類中...")
-        classifications = await classify_tweets(target_tweets, api_key)
+        # 途中で止まっても次回その続きから再開できるよう、バッチごとにチェックポイントを書く
+        journal = None if args.dry_run else EvalJournal(store)
+        classifications = await classify_tweets(
+            target_tweets, api_key,
+            use_distilled=not getattr(args, "no_distill", False), dry_run=args.dry_run,
+            journal=journal,
+        )
 
         # 評価結果をマージ
         for cls in classifications:
             tid = cls.get("tweet_id")
             if tid:
-                eval_data["evaluations"][tid] = {
+                new_entries[tid] = {
                     k: v for k, v in cls.items() if k != "tweet_index"
                 }
-        eval_data["last_updated"] = now_str()
 
         if not args.dry_run:
-            save_evaluations(eval_data)
+            save_evaluations(store, new_entries)
+            removed = journal.compact(new_entries)
+            print(f"[OK] チェックポイント整理: {removed}件削除（残り {journal.count()}件）")
         else:
             print("[DRY-RUN] 評価データ保存スキップ")
             # dry-runでも分類結果を表示
@@ -837,7 +839,9 @@ async def async_main(args):
 
     # 分析実行
     print(f"\n[2/3] 多次元分析...")
-    evals = eval_data["evaluations"]
+    # dry-runでは未保存の新規分類もメモリ上でマージして分析する
+    evals = store.get_many(t["id"] for t in all_tweets)
+    evals.update(new_entries)
     type_analysis = analyze_by_content_type(all_tweets, evals)
     media_analysis = analyze_media_effect(all_tweets, evals)
     orig_analysis = analyze_originality(all_tweets, evals)
@@ -889,25 +893,31 @@ async def async_main(args):
             quant_limit = getattr(args, "quant_limit", 5)
             ai_news_tweets = get_ai_news_tweets(limit=quant_limit)
             if ai_news_tweets:
-                quant_results = await quantify_saturation(
-                    ai_news_tweets, api_key, dry_run=args.dry_run,
+                saved = 0
+
+                def write_back(qr: dict):
+                    """計測が確定したツイートから順にevalデータへ反映"""
+                    nonlocal saved
+                    tid = qr.get("tweet_id")
+                    m = qr.get("measurement")
+                    if args.dry_run or not (tid and m and tid in evals):
+                        return
+                    evals[tid]["saturation_quantitative"] = {
+                        "score": m["saturation_score"],
+                        "level": m["suggested_level"],
+                        "total_count": m["total_count"],
+                        "kp_count": m["key_person_count"],
+                        "confidence": m["confidence"],
+                        "primary_keyword": m.get("primary_keyword", ""),
+                    }
+                    save_evaluations(store, {tid: evals[tid]})
+                    saved += 1
+
+                await quantify_saturation(
+                    ai_news_tweets, api_key, dry_run=args.dry_run, on_result=write_back,
                 )
-                # 計測結果をevalデータに反映
                 if not args.dry_run:
-                    for qr in quant_results:
-                        tid = qr.get("tweet_id")
-                        m = qr.get("measurement")
-                        if tid and m and tid in eval_data["evaluations"]:
-                            eval_data["evaluations"][tid]["saturation_quantitative"] = {
-                                "score": m["saturation_score"],
-                                "level": m["suggested_level"],
-                                "total_count": m["total_count"],
-                                "kp_count": m["key_person_count"],
-                                "confidence": m["confidence"],
-                                "primary_keyword": m.get("primary_keyword", ""),
-                            }
-                    save_evaluations(eval_data)
-                    print(f"[OK] {len(ai_news_tweets)}件の定量計測データを保存")
+                    print(f"[OK] {saved}/{len(ai_news_tweets)}件の定量計測データを保存")
             else:
                 print("[INFO] 定量計測対象のai_newsなし")
         except ImportError as e:
@@ -916,7 +926,9 @@ async def async_main(args):
             print(f"[WARN] 定量計測でエラー: {e}")
 
     print(f"\n=== 完了 ===")
-    print(f"評価済み: {len(evals)}件")
+    print(f"評価済み: {store.count()}件")
+    if owns_store:
+        store.close()
 
 
 def main():
@@ -927,6 +939,8 @@ def main():
                         help="ai_newsのニュース飽和度をtwscrapeで定量計測")
     parser.add_argument("--quant-limit", type=int, default=5,
                         help="定量計測の対象件数（デフォルト: 5）")
+    parser.add_argument("--no-distill", action="store_true",
+                        help="ローカル分類器（distilled_classifier.py）を使わず全件LLMで分類")
     args = parser.parse_args()
 
     logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
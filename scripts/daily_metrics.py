@@ -479,14 +479,11 @@ def _generate_pattern_section(pd: dict) -> str:
 
 # --- メイン ---
 
-def main():
-    parser = argparse.ArgumentParser(description="X ツイートメトリクス日次分析")
-    parser.add_argument("--count", type=int, default=20, help="取得件数（デフォルト: 20）")
-    args = parser.parse_args()
-
+def run(count: int = 20) -> dict:
+    """日次分析を実行し、更新後の tweet_details（content_evaluator.py の入力）を返す"""
     print(f"=== X メトリクス日次分析 ===")
-    print(f"取得件数: {args.count}")
-    print(f"推定コスト: ${args.count * 0.005 + 0.005:.3f}")
+    print(f"取得件数: {count}")
+    print(f"推定コスト: ${count * 0.005 + 0.005:.3f}")
     print()
 
     # X APIクライアント生成
@@ -506,7 +503,7 @@ def main():
 
     # メトリクス取得
     print(f"[2/4] ツイートメトリクス取得...")
-    metrics = fetch_metrics(client, user_id, args.count)
+    metrics = fetch_metrics(client, user_id, count)
     if not metrics:
         print("[ERROR] メトリクス取得失敗")
         sys.exit(1)
@@ -566,6 +563,14 @@ def main():
     print(f"合計インプレッション: {total_imp:,}")
     print(f"平均エンゲージメント率: {avg_eng:.2f}%")
     print(f"フォロワー: {profile['followers']:,}")
+    return details
+
+
+def main():
+    parser = argparse.ArgumentParser(description="X ツイートメトリクス日次分析")
+    parser.add_argument("--count", type=int, default=20, help="取得件数（デフォルト: 20）")
+    args = parser.parse_args()
+    run(args.count)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,227 @@
+"""
+daily_pipeline.py - 朝の日次ジョブを1プロセスで実行するオーケストレータ
+
+これまで buzz_tweet_extractor（06:30）/ zeitgeist_detector（07:00）/ buzz_content_analyzer /
+daily_metrics / content_evaluator / trend_detector を .bat から別プロセスで起動していたため、
+そのたびに tweepy / httpx / twscrape の import と .env 読み込みをやり直し、
+前段が書いたばかりのJSONを次段がまた読み直していた。
+
+このスクリプトは各ジョブをステージとして1つのイベントループ上でDAG実行する。
+  - 前段の結果（buzz-tweets-latest.json の中身 / key_persons / tweet_details /
+    評価ストア）はメモリ上で次段に渡す（各ステージのファイル保存は従来どおり行う）
+  - 依存関係のない枝（X APIのメトリクス取得とバズ分類など）は並行実行する
+  - X API（tweepy）を使う同期ステージはスレッドで実行する
+  - 依存は「順序 + データ受け渡し」のみ。前段が失敗しても後段は実行し、
+    その場合は従来どおりファイル・ストアから読む
+
+DAG:
+  buzz_extract ─┬─> buzz_analyze ──> zeitgeist
+  trend ────────┘      (key_persons)
+  metrics ──────────> content_eval
+
+使い方:
+  python -X utf8 daily_pipeline.py                 # 全ステージ
+  python -X utf8 daily_pipeline.py --dry-run       # 保存なし（metrics はスキップ）
+  python -X utf8 daily_pipeline.py --skip trend    # 指定ステージを除外
+
+出力: ステージ別の所要時間を標準出力と data/pipeline-latest.json に記録
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+import traceback
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Optional
+
+sys.path.insert(0, str(Path(__file__).parent))
+from x_client import DATA_DIR, now_str
+from eval_store import EvaluationStore
+import buzz_content_analyzer
+import buzz_tweet_extractor
+import content_evaluator
+import daily_metrics
+import trend_detector
+import zeitgeist_detector
+
+PIPELINE_LOG_PATH = DATA_DIR / "pipeline-latest.json"
+
+
+@dataclass
+class Stage:
+    """パイプラインの1ステージ。func は前段の出力 {ステージ名: 値} を受け取る"""
+    name: str
+    func: Callable[[dict], Awaitable[Any]]
+    deps: tuple[str, ...] = ()
+
+
+@dataclass
+class StageResult:
+    name: str
+    status: str = "pending"  # ok / failed / skipped
+    started: float = 0.0     # パイプライン開始からの経過秒
+    elapsed: float = 0.0
+    error: Optional[str] = None
+    output: Any = field(default=None, repr=False)
+
+
+async def run_stages(stages: list[Stage], skip: set[str]) -> dict[str, StageResult]:
+    """依存関係に従ってステージを実行する（依存が終わり次第、並行に開始）"""
+    results = {s.name: StageResult(s.name) for s in stages}
+    tasks: dict[str, asyncio.Task] = {}
+    t0 = time.monotonic()
+
+    async def execute(stage: Stage) -> None:
+        # 依存ステージの完了を待つ（失敗・スキップでも待つだけで、出力は None になる）
+        for dep in stage.deps:
+            if dep in tasks:
+                await tasks[dep]
+        result = results[stage.name]
+        if stage.name in skip:
+            result.status = "skipped"
+            print(f"[SKIP] {stage.name}")
+            return
+
+        inputs = {dep: results[dep].output for dep in stage.deps}
+        result.started = time.monotonic() - t0
+        print(f"\n[START] {stage.name} (+{result.started:.1f}s)")
+        try:
+            result.output = await stage.func(inputs)
+            result.status = "ok"
+        except (Exception, SystemExit) as e:
+            # 各スクリプトは致命的エラーで sys.exit() する: パイプライン全体は止めない
+            result.status = "failed"
+            result.error = f"{type(e).__name__}: {e}"
+            print(f"[ERROR] {stage.name}: {result.error}")
+            traceback.print_exc()
+        finally:
+            result.elapsed = time.monotonic() - t0 - result.started
+            print(f"[{result.status.upper()}] {stage.name} ({result.elapsed:.1f}s)")
+
+    for stage in stages:
+        tasks[stage.name] = asyncio.create_task(execute(stage))
+    await asyncio.gather(*tasks.values())
+    return results
+
+
+def build_stages(args, buzz_store: EvaluationStore, content_store: EvaluationStore) -> list[Stage]:
+    """各スクリプトのエントリポイントをステージとして組み立てる"""
+
+    async def buzz_extract(_: dict) -> Optional[dict]:
+        result = await buzz_tweet_extractor.run(dry_run=args.dry_run)
+        # レート制限でスキップした場合・dry-run（検索も保存もしない）は後段がファイルの前回分を使う
+        return None if result.get("skipped") or args.dry_run else result
+
+    async def trend(_: dict) -> Optional[dict]:
+        return await asyncio.to_thread(trend_detector.run, args.threshold, args.dry_run)
+
+    async def buzz_analyze(inputs: dict) -> None:
+        await buzz_content_analyzer.async_main(
+            argparse.Namespace(
+                dry_run=args.dry_run, force=False, days=buzz_content_analyzer.RETENTION_DAYS,
+            ),
+            buzz_data=inputs["buzz_extract"],
+            key_persons=inputs["trend"],
+            store=buzz_store,
+        )
+
+    async def zeitgeist(inputs: dict) -> dict:
+        return await zeitgeist_detector.run(
+            dry_run=args.dry_run,
+            buzz_data=inputs["buzz_extract"],
+            buzz_store=buzz_store,
+        )
+
+    async def metrics(_: dict) -> dict:
+        return await asyncio.to_thread(daily_metrics.run, args.count)
+
+    async def content_eval(inputs: dict) -> None:
+        await content_evaluator.async_main(
+            argparse.Namespace(
+                dry_run=args.dry_run, force=False, quantitative=False, quant_limit=5,
+            ),
+            details=inputs["metrics"],
+            store=content_store,
+        )
+
+    return [
+        Stage("buzz_extract", buzz_extract),
+        Stage("trend", trend),
+        Stage("metrics", metrics),
+        Stage("buzz_analyze", buzz_analyze, deps=("buzz_extract", "trend")),
+        Stage("zeitgeist", zeitgeist, deps=("buzz_extract", "buzz_analyze")),
+        Stage("content_eval", content_eval, deps=("metrics",)),
+    ]
+
+
+def print_timings(results: dict[str, StageResult], total: float) -> None:
+    print("\n=== ステージ別所要時間 ===")
+    for r in sorted(results.values(), key=lambda r: r.started):
+        line = f"  {r.name:<14} {r.status:<8} start +{r.started:6.1f}s  {r.elapsed:7.1f}s"
+        if r.error:
+            line += f"  ({r.error})"
+        print(line)
+    serial = sum(r.elapsed for r in results.values())
+    print(f"  合計: {total:.1f}s（直列換算 {serial:.1f}s）")
+
+
+def save_run_log(results: dict[str, StageResult], total: float, args) -> None:
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    log = {
+        "finished_at": now_str(),
+        "dry_run": args.dry_run,
+        "total_seconds": round(total, 2),
+        "stages": {
+            r.name: {
+                "status": r.status,
+                "started": round(r.started, 2),
+                "elapsed": round(r.elapsed, 2),
+                "error": r.error,
+            }
+            for r in results.values()
+        },
+    }
+    PIPELINE_LOG_PATH.write_text(json.dumps(log, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"[OK] 実行ログ保存: {PIPELINE_LOG_PATH}")
+
+
+async def async_main(args) -> int:
+    skip = set(args.skip)
+    if args.dry_run:
+        # daily_metrics には dry-run がない（X APIの有料呼び出し + 履歴保存）
+        skip.add("metrics")
+
+    print("=== 日次パイプライン ===")
+    t0 = time.monotonic()
+    with EvaluationStore("buzz") as buzz_store, EvaluationStore("content") as content_store:
+        stages = build_stages(args, buzz_store, content_store)
+        unknown = skip - {s.name for s in stages}
+        if unknown:
+            print(f"[ERROR] 不明なステージ: {', '.join(sorted(unknown))}")
+            return 2
+        results = await run_stages(stages, skip)
+    total = time.monotonic() - t0
+
+    print_timings(results, total)
+    save_run_log(results, total, args)
+    return 1 if any(r.status == "failed" for r in results.values()) else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="朝の日次ジョブを1プロセスで実行")
+    parser.add_argument("--dry-run", action="store_true", help="各ステージを保存なしで実行")
+    parser.add_argument("--skip", nargs="*", default=[], help="除外するステージ名")
+    parser.add_argument("--count", type=int, default=20, help="daily_metrics の取得件数")
+    parser.add_argument("--threshold", type=float, default=50, help="trend_detector のヒートスコア閾値")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    sys.exit(asyncio.run(async_main(args)))
+
+
+if __name__ == "__main__":
+    main()
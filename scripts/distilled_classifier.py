@@ -0,0 +1,562 @@
+"""
+distilled_classifier.py - LLMラベルを蒸留したローカル分類器（文字n-gram TF-IDF + ロジスティック回帰）
+
+content_evaluator / buzz_content_analyzer は新しいツイートを毎回すべて Groq
+（llama-3.3-70b-versatile）に送っていた。評価ストア（eval_store.py）には既にLLMが付けた
+ラベルが数千件溜まっている。
+
+このモジュールはそのラベルでCPUだけの軽量な分類器を学習する。
+  - 特徴量: 正規化した本文の文字1-3gram（日本語でも分かち書き不要）。サブリニアTF × IDF、L2正規化
+  - モデル: 評価軸（content_type / originality / ...）ごとの多クラスロジスティック回帰（SGD）
+  - 確信度: ホールドアウト（HOLDOUT_RATE）で温度スケーリングした確率。
+    ツイート単位の確信度は全評価軸の最小値
+  - 振り分け: 確信度が min_confidence 以上ならローカルで確定し、残りだけをLLMに送る
+  - 監査: ローカルで確定したツイートのうち AUDIT_RATE 分はLLMにも送り、評価軸ごとの
+    一致/不一致を distill_audit テーブル（evaluations.db）に記録する（保存されるのはLLMの結果）
+標準ライブラリのみで動く（numpy / scikit-learn 不要）。1件の推論は数ミリ秒。
+
+ローカルで分類した評価エントリには classifier="distilled" と classifier_confidence を付ける。
+再学習ではこれらを除外する（自分の出力で学習しない）。
+
+使い方:
+  python -X utf8 distilled_classifier.py --train                   # content / buzz を再学習
+  python -X utf8 distilled_classifier.py --train --kind buzz --min-confidence 0.9
+  python -X utf8 distilled_classifier.py --report --days 30        # ホールドアウト精度 + LLMとの一致率
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import math
+import random
+import re
+import sqlite3
+import sys
+import unicodedata
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+sys.path.insert(0, str(Path(__file__).parent))
+from eval_store import EVAL_DB_PATH, EvaluationStore
+from paths import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+# --- 定数 ---
+
+MODEL_PATHS = {
+    "content": DATA_DIR / "distilled_content.json",
+    "buzz": DATA_DIR / "distilled_buzz.json",
+}
+TWEET_DETAILS_PATH = DATA_DIR / "tweet_details.json"
+
+# kind → 学習・推論する評価軸（各プロンプトの出力フィールド）
+LABEL_FIELDS = {
+    "content": (
+        "content_type", "originality", "media_contribution", "news_saturation",
+        "bip_authenticity", "ai_citation_value", "reputation_risk",
+    ),
+    "buzz": (
+        "content_type", "originality", "media_contribution", "news_saturation",
+        "bip_authenticity", "ai_citation_value", "virality_factor",
+    ),
+}
+
+NGRAM_MAX = 3
+MIN_DF = 2
+MAX_FEATURES = 30000
+EPOCHS = 6
+LEARNING_RATE = 0.5
+# 学習データの一部を確信度の較正・精度測定用に取り置く（tweet_id のハッシュで決定的に分割）
+HOLDOUT_RATE = 0.2
+MIN_TRAIN_SAMPLES = 200
+DEFAULT_MIN_CONFIDENCE = 0.85
+AUDIT_RATE = 0.1
+_TEMPERATURES = (0.25, 0.5, 0.75, 1.0, 1.25, 1.5, 2.0, 2.5, 3.0, 4.0)
+
+_URL_RE = re.compile(r"https?://\S+")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+# --- 特徴量 ---
+
+def _normalize(text: str) -> str:
+    """NFKC + casefold。URLは1文字のプレースホルダにする（リンク有無だけを特徴量に残す）"""
+    text = unicodedata.normalize("NFKC", text or "").casefold()
+    text = _URL_RE.sub(" § ", text)
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+def _ngram_counts(text: str) -> dict[str, int]:
+    t = _normalize(text)
+    counts: dict[str, int] = {}
+    for n in range(1, NGRAM_MAX + 1):
+        for i in range(len(t) - n + 1):
+            gram = t[i:i + n]
+            if not gram.isspace():
+                counts[gram] = counts.get(gram, 0) + 1
+    return counts
+
+
+def _tfidf(counts: dict[str, int], idf: dict[str, float]) -> dict[str, float]:
+    vec = {g: (1.0 + math.log(tf)) * idf[g] for g, tf in counts.items() if g in idf}
+    norm = math.sqrt(sum(v * v for v in vec.values()))
+    return {g: v / norm for g, v in vec.items()} if norm else vec
+
+
+def _fit_idf(docs: list[dict[str, int]]) -> dict[str, float]:
+    df: dict[str, int] = {}
+    for counts in docs:
+        for g in counts:
+            df[g] = df.get(g, 0) + 1
+    kept = sorted((g for g, d in df.items() if d >= MIN_DF), key=lambda g: -df[g])[:MAX_FEATURES]
+    n = len(docs)
+    return {g: math.log((1 + n) / (1 + df[g])) + 1.0 for g in kept}
+
+
+def _bucket(tweet_id: str, salt: str) -> float:
+    """tweet_id から決まる [0, 1) の値（ホールドアウト・監査の抽出用）"""
+    digest = hashlib.sha1(f"{salt}:{tweet_id}".encode("utf-8")).hexdigest()
+    return int(digest[:8], 16) / 0x100000000
+
+
+# --- 線形モデル ---
+
+def _softmax(scores: list[float]) -> list[float]:
+    m = max(scores)
+    exps = [math.exp(s - m) for s in scores]
+    total = sum(exps)
+    return [e / total for e in exps]
+
+
+def _scores(head: dict, x: dict[str, float]) -> list[float]:
+    scores = list(head["bias"])
+    weights = head["weights"]
+    for g, v in x.items():
+        row = weights.get(g)
+        if row is not None:
+            for c, w in enumerate(row):
+                scores[c] += w * v
+    return scores
+
+
+def _train_head(xs: list[dict[str, float]], ys: list[Any]) -> dict:
+    """多クラスロジスティック回帰をSGDで学習する（ラベルの値そのものをクラスにする）"""
+    classes = sorted(set(ys), key=lambda v: json.dumps(v))
+    index = {json.dumps(v): i for i, v in enumerate(classes)}
+    targets = [index[json.dumps(y)] for y in ys]
+    head = {"classes": classes, "bias": [0.0] * len(classes), "weights": {}, "temperature": 1.0}
+    if len(classes) < 2:
+        return head
+
+    weights = head["weights"]
+    order = list(range(len(xs)))
+    rng = random.Random(0)
+    for epoch in range(EPOCHS):
+        rng.shuffle(order)
+        lr = LEARNING_RATE / (1 + epoch)
+        for i in order:
+            x = xs[i]
+            probs = _softmax(_scores(head, x))
+            probs[targets[i]] -= 1.0
+            grads = [lr * p for p in probs]
+            for c, g in enumerate(grads):
+                head["bias"][c] -= g
+            for g_name, v in x.items():
+                row = weights.get(g_name)
+                if row is None:
+                    row = weights[g_name] = [0.0] * len(classes)
+                for c, g in enumerate(grads):
+                    row[c] -= g * v
+    return head
+
+
+def _calibrate_temperature(head: dict, xs: list[dict[str, float]], ys: list[Any]) -> float:
+    """ホールドアウトの負の対数尤度が最小になる温度を選ぶ"""
+    index = {json.dumps(v): i for i, v in enumerate(head["classes"])}
+    pairs = [(_scores(head, x), index.get(json.dumps(y))) for x, y in zip(xs, ys)]
+    pairs = [(s, t) for s, t in pairs if t is not None]
+    if not pairs:
+        return 1.0
+
+    def nll(temperature: float) -> float:
+        return -sum(
+            math.log(max(_softmax([v / temperature for v in s])[t], 1e-12)) for s, t in pairs
+        )
+
+    return min(_TEMPERATURES, key=nll)
+
+
+# --- 分類器 ---
+
+class DistilledClassifier:
+    """学習済みモデル1種類（content / buzz）分"""
+
+    def __init__(
+        self,
+        kind: str,
+        idf: dict[str, float],
+        heads: dict[str, dict],
+        min_confidence: float = DEFAULT_MIN_CONFIDENCE,
+        metrics: Optional[dict] = None,
+        trained_at: str = "",
+    ):
+        self.kind = kind
+        self.idf = idf
+        self.heads = heads
+        self.min_confidence = min_confidence
+        self.metrics = metrics or {}
+        self.trained_at = trained_at
+
+    @classmethod
+    def load(cls, kind: str, path: Optional[Path] = None) -> Optional["DistilledClassifier"]:
+        """学習済みモデルを読み込む。未学習・破損ならNone"""
+        path = path or MODEL_PATHS[kind]
+        if not path.exists():
+            return None
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"{path.name} の読み込みに失敗（ローカル分類なし）: {e}")
+            return None
+        return cls(
+            kind, data["idf"], data["heads"],
+            data.get("min_confidence", DEFAULT_MIN_CONFIDENCE),
+            data.get("metrics"), data.get("trained_at", ""),
+        )
+
+    def save(self, path: Optional[Path] = None) -> Path:
+        path = path or MODEL_PATHS[self.kind]
+        path.parent.mkdir(parents=True, exist_ok=True)
+        heads = {
+            field: {
+                **head,
+                "bias": [round(b, 5) for b in head["bias"]],
+                "weights": {
+                    g: [round(w, 5) for w in row] for g, row in head["weights"].items()
+                },
+            }
+            for field, head in self.heads.items()
+        }
+        data = {
+            "kind": self.kind,
+            "trained_at": self.trained_at,
+            "min_confidence": self.min_confidence,
+            "metrics": self.metrics,
+            "idf": {g: round(v, 5) for g, v in self.idf.items()},
+            "heads": heads,
+        }
+        path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        return path
+
+    def predict(self, text: str) -> tuple[dict, float]:
+        """(評価軸ごとのラベル, 確信度) を返す。確信度は較正済み確率の全軸最小値"""
+        x = _tfidf(_ngram_counts(text), self.idf)
+        labels: dict[str, Any] = {}
+        confidences: dict[str, float] = {}
+        for field, head in self.heads.items():
+            t = head.get("temperature", 1.0)
+            probs = _softmax([s / t for s in _scores(head, x)])
+            best = max(range(len(probs)), key=probs.__getitem__)
+            labels[field] = head["classes"][best]
+            confidences[field] = probs[best]
+
+        # プロンプトの出力規則（bip以外は null / ai_news以外は "n/a"）に合わせ、確信度の対象から外す
+        if "bip_authenticity" in labels and labels.get("content_type") != "bip":
+            labels["bip_authenticity"] = None
+            confidences.pop("bip_authenticity")
+        if "news_saturation" in labels and labels.get("content_type") != "ai_news":
+            labels["news_saturation"] = "n/a"
+            confidences.pop("news_saturation")
+        return labels, min(confidences.values(), default=0.0)
+
+
+# --- 学習 ---
+
+def content_text(t: dict) -> str:
+    """content_evaluator._cache_text と同じ形式（画像有無も分類結果に影響するので含める）"""
+    media = f"画像: {t.get('media_type', 'なし')}" if t.get("has_media") else "画像: なし"
+    return f"{media}\n{t.get('text', '')}"
+
+
+def load_training_data(kind: str, store: EvaluationStore) -> list[tuple[str, str, dict]]:
+    """LLMが付けたラベルと本文の組 [(tweet_id, text, entry)] を返す（ローカル分類の結果と近似重複の複製は除く）"""
+    if kind == "content":
+        # 自分のツイート評価には本文がないので tweet_details.json と突き合わせる
+        texts = {}
+        if TWEET_DETAILS_PATH.exists():
+            details = json.loads(TWEET_DETAILS_PATH.read_text(encoding="utf-8"))
+            texts = {t["id"]: content_text(t) for t in details.get("tweets", []) if t.get("text")}
+    samples = []
+    for entry in store.query():
+        if entry.get("classifier") == "distilled":
+            continue
+        tid = entry["tweet_id"]
+        # ほぼ同一ツイートの複製（代表のラベルのコピー）は数えない。代表だけを学習・ホールドアウトに使う
+        if entry.get("dup_group_id") and entry["dup_group_id"] != tid:
+            continue
+        if kind == "content":
+            text = texts.get(tid)
+        else:
+            text = entry.get("tweet_data", {}).get("text")
+        if text:
+            samples.append((tid, text, entry))
+    return samples
+
+
+def _fit(kind: str, samples: list[tuple[str, str, dict]]) -> tuple[dict, dict, list]:
+    """(idf, heads, 特徴量ベクトル) を返す"""
+    counts = [_ngram_counts(text) for _, text, _ in samples]
+    idf = _fit_idf(counts)
+    xs = [_tfidf(c, idf) for c in counts]
+    heads = {}
+    for field in LABEL_FIELDS[kind]:
+        rows = [(x, entry[field]) for x, (_, _, entry) in zip(xs, samples) if field in entry]
+        if rows:
+            heads[field] = _train_head([x for x, _ in rows], [y for _, y in rows])
+    return idf, heads, xs
+
+
+def _evaluate(model: DistilledClassifier, samples: list[tuple[str, str, dict]]) -> dict:
+    """ホールドアウトでLLMラベルとの一致率を測る（全件 / 確信度が閾値以上の分）"""
+    fields = list(model.heads)
+    hits_all = {f: 0 for f in fields}
+    hits_confident = {f: 0 for f in fields}
+    totals = {f: 0 for f in fields}
+    confident_totals = {f: 0 for f in fields}
+    confident = 0
+    for _, text, entry in samples:
+        labels, conf = model.predict(text)
+        is_confident = conf >= model.min_confidence
+        confident += is_confident
+        for f in fields:
+            if f not in entry:
+                continue
+            match = labels.get(f) == entry[f]
+            totals[f] += 1
+            hits_all[f] += match
+            if is_confident:
+                confident_totals[f] += 1
+                hits_confident[f] += match
+    return {
+        "holdout": len(samples),
+        "coverage": round(confident / len(samples), 3) if samples else 0.0,
+        "fields": {
+            f: {
+                "accuracy": round(hits_all[f] / totals[f], 3) if totals[f] else None,
+                "accuracy_confident": (
+                    round(hits_confident[f] / confident_totals[f], 3)
+                    if confident_totals[f] else None
+                ),
+            }
+            for f in fields
+        },
+    }
+
+
+def train(
+    kind: str,
+    min_confidence: float = DEFAULT_MIN_CONFIDENCE,
+    store_path: Path = EVAL_DB_PATH,
+) -> Optional[DistilledClassifier]:
+    """評価ストアのLLMラベルで学習し、保存したモデルを返す（データ不足ならNone）"""
+    with EvaluationStore(kind, store_path) as store:
+        samples = load_training_data(kind, store)
+    if len(samples) < MIN_TRAIN_SAMPLES:
+        print(f"[WARN] {kind}: 学習データ {len(samples)}件（{MIN_TRAIN_SAMPLES}件未満）。学習をスキップ")
+        return None
+
+    train_set = [s for s in samples if _bucket(s[0], "holdout") >= HOLDOUT_RATE]
+    holdout = [s for s in samples if _bucket(s[0], "holdout") < HOLDOUT_RATE]
+    print(f"[INFO] {kind}: 学習 {len(train_set)}件 / ホールドアウト {len(holdout)}件")
+
+    # 学習用で fit → ホールドアウトで温度を較正し精度を測る
+    idf, heads, _ = _fit(kind, train_set)
+    holdout_xs = [_tfidf(_ngram_counts(text), idf) for _, text, _ in holdout]
+    temperatures = {}
+    for field, head in heads.items():
+        rows = [(x, entry[field]) for x, (_, _, entry) in zip(holdout_xs, holdout) if field in entry]
+        head["temperature"] = _calibrate_temperature(head, [x for x, _ in rows], [y for _, y in rows])
+        temperatures[field] = head["temperature"]
+    metrics = _evaluate(DistilledClassifier(kind, idf, heads, min_confidence), holdout)
+
+    # 本番用は全件で fit し直し、較正した温度を引き継ぐ
+    idf, heads, _ = _fit(kind, samples)
+    for field, head in heads.items():
+        head["temperature"] = temperatures.get(field, 1.0)
+    metrics["samples"] = len(samples)
+    model = DistilledClassifier(
+        kind, idf, heads, min_confidence, metrics, datetime.now().isoformat(timespec="seconds"),
+    )
+    path = model.save()
+    print(f"[OK] {kind}: モデル保存 → {path}（特徴量 {len(idf)}）")
+    return model
+
+
+# --- 振り分け・監査（content_evaluator / buzz_content_analyzer から使用） ---
+
+def split_for_llm(
+    kind: str,
+    tweets: list[dict],
+    text_of: Callable[[dict], str],
+) -> tuple[list[dict], list[dict], dict[str, dict]]:
+    """tweets を (ローカル確定の分類結果, LLMに送るツイート, 監査用の予測 {tweet_id: labels}) に分ける。
+
+    モデルが未学習なら全件をLLMに送る。監査対象はLLMにも送り、保存にはLLMの結果を使う。
+    """
+    model = DistilledClassifier.load(kind)
+    if model is None or not tweets:
+        return [], tweets, {}
+
+    local_results, to_llm, audit = [], [], {}
+    low_confidence = 0
+    for t in tweets:
+        labels, conf = model.predict(text_of(t))
+        if conf < model.min_confidence:
+            low_confidence += 1
+            to_llm.append(t)
+        elif _bucket(t["id"], "audit") < AUDIT_RATE:
+            audit[t["id"]] = {**labels, "classifier_confidence": round(conf, 3)}
+            to_llm.append(t)
+        else:
+            local_results.append({
+                **labels,
+                "tweet_id": t["id"],
+                "evaluated_at": datetime.now().isoformat(),
+                "classifier": "distilled",
+                "classifier_confidence": round(conf, 3),
+            })
+    print(
+        f"  [DISTILL] ローカル確定 {len(local_results)}件 / LLM送信 {len(to_llm)}件"
+        f"（低確信度 {low_confidence}件 + 監査 {len(audit)}件、閾値 {model.min_confidence}）"
+    )
+    return local_results, to_llm, audit
+
+
+def _audit_conn(path: Path = EVAL_DB_PATH) -> sqlite3.Connection:
+    conn = sqlite3.connect(str(path), timeout=30.0)
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS distill_audit (
+            kind TEXT NOT NULL,
+            tweet_id TEXT NOT NULL,
+            field TEXT NOT NULL,
+            predicted TEXT,
+            llm TEXT,
+            match INTEGER NOT NULL,
+            confidence REAL,
+            audited_date TEXT NOT NULL,
+            PRIMARY KEY (kind, tweet_id, field)
+        )
+        """
+    )
+    return conn
+
+
+def record_audit(
+    kind: str,
+    predictions: dict[str, dict],
+    llm_results: list[dict],
+    persist: bool = True,
+    path: Path = EVAL_DB_PATH,
+) -> None:
+    """監査対象のローカル予測とLLM結果を評価軸ごとに比較し、一致率を表示・記録する"""
+    by_id = {r.get("tweet_id"): r for r in llm_results}
+    rows = []
+    for tid, predicted in predictions.items():
+        llm = by_id.get(tid)
+        if llm is None:
+            continue
+        for field in LABEL_FIELDS[kind]:
+            if field in predicted and field in llm:
+                rows.append((
+                    kind, tid, field,
+                    json.dumps(predicted[field], ensure_ascii=False),
+                    json.dumps(llm[field], ensure_ascii=False),
+                    int(predicted[field] == llm[field]),
+                    predicted.get("classifier_confidence"),
+                    datetime.now().strftime("%Y-%m-%d"),
+                ))
+    if not rows:
+        return
+    agreement = sum(r[5] for r in rows) / len(rows)
+    print(f"  [DISTILL] 監査 {len(predictions)}件: LLMとの一致率 {agreement * 100:.0f}%（評価軸単位）")
+    if not persist:
+        return
+    conn = _audit_conn(path)
+    try:
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO distill_audit VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+    finally:
+        conn.close()
+
+
+def report(kind: str, days: int, path: Path = EVAL_DB_PATH) -> None:
+    """ホールドアウト精度・監査での一致率・直近の振り分け実績を表示"""
+    print(f"=== {kind} ===")
+    model = DistilledClassifier.load(kind)
+    if model is None:
+        print("  モデル未学習（--train で学習）")
+    else:
+        m = model.metrics
+        print(
+            f"  学習: {model.trained_at} / {m.get('samples', 0)}件 / 閾値 {model.min_confidence}"
+            f" / ホールドアウト {m.get('holdout', 0)}件中 {m.get('coverage', 0) * 100:.0f}% をローカル確定"
+        )
+        print(f"  {'評価軸':<20} {'全件':>6} {'確定分':>6}")
+        for field, fm in m.get("fields", {}).items():
+            acc = f"{fm['accuracy'] * 100:.0f}%" if fm["accuracy"] is not None else "-"
+            acc_c = f"{fm['accuracy_confident'] * 100:.0f}%" if fm["accuracy_confident"] is not None else "-"
+            print(f"  {field:<20} {acc:>6} {acc_c:>6}")
+
+    since = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+    conn = _audit_conn(path)
+    try:
+        rows = conn.execute(
+            "SELECT field, COUNT(*), SUM(match) FROM distill_audit "
+            "WHERE kind = ? AND audited_date >= ? GROUP BY field ORDER BY field",
+            (kind, since),
+        ).fetchall()
+    finally:
+        conn.close()
+    if rows:
+        print(f"  監査（過去{days}日、LLMとの一致率）:")
+        for field, n, hits in rows:
+            print(f"    {field:<20} {hits / n * 100:5.0f}%（{n}件）")
+
+    with EvaluationStore(kind, path) as store:
+        recent = store.query(since=since)
+    distilled = sum(1 for ev in recent if ev.get("classifier") == "distilled")
+    if recent:
+        print(f"  過去{days}日の評価 {len(recent)}件中 ローカル確定 {distilled}件（{distilled / len(recent) * 100:.0f}%）")
+
+
+# --- CLI ---
+
+def main():
+    parser = argparse.ArgumentParser(description="LLMラベル蒸留のローカル分類器")
+    parser.add_argument("--train", action="store_true", help="評価ストアのLLMラベルで再学習")
+    parser.add_argument("--report", action="store_true", help="精度（ホールドアウト・監査）を表示")
+    parser.add_argument("--kind", choices=sorted(LABEL_FIELDS), help="対象（省略時は両方）")
+    parser.add_argument("--min-confidence", type=float, default=DEFAULT_MIN_CONFIDENCE,
+                        help=f"--train: ローカル確定の確信度閾値（デフォルト: {DEFAULT_MIN_CONFIDENCE}）")
+    parser.add_argument("--days", type=int, default=30, help="--report: 監査の集計日数")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    kinds = [args.kind] if args.kind else sorted(LABEL_FIELDS)
+
+    if args.train:
+        for kind in kinds:
+            train(kind, args.min_confidence)
+    if args.report or not args.train:
+        for kind in kinds:
+            report(kind, args.days)
+
+
+if __name__ == "__main__":
+    main()
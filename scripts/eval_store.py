@@ -0,0 +1,384 @@
+"""
+eval_store.py - LLM評価データのSQLiteストア
+
+content_evaluations.json / buzz_content_evaluations.json は実行のたびに全件 json.loads され、
+5件しか変わらなくても indent=2 で全件書き直されていた。読み取り側（fetch_buzz_db /
+zeitgeist_detector / weekly_summary / saturation_quantifier）も同じJSONを丸ごと読んでいた。
+
+このモジュールは評価データを1つのSQLiteファイル（WALモード）に保存し、
+  - 書き込みは変更分だけのupsert
+  - 読み込みは evaluated_date / content_type / virality_factor のインデックスで必要分だけ
+にする。評価エントリ自体は従来のJSONと同じdictをそのまま data 列に保存するので、
+呼び出し側のフィールド参照（tweet_data.engagement_score 等）は変わらない。
+
+テーブル:
+  content_evaluations: 自分のツイート評価（content_evaluator.py）
+  buzz_evaluations:    バズツイート評価（buzz_content_analyzer.py）
+
+チェックポイント（EvalJournal）:
+  分類処理はバッチが終わるたびに結果を {テーブル名}_journal に書く。実行が途中で止まっても
+  （例外・Ctrl-C・429の連続）、次回の実行は journal にあるツイートをLLMに送らず復元する。
+  最後に本体テーブルへ保存した分は compact() で journal から消す。
+
+旧JSONからの移行:
+  ストアを初めて開いたとき、テーブルが未移行で旧JSONが存在すれば自動で1回だけ取り込む。
+  旧JSONファイルは削除しない（移行済みフラグを meta テーブルに記録）。
+
+使い方:
+  python -X utf8 eval_store.py --migrate               # 旧JSONを明示的に取り込み
+  python -X utf8 eval_store.py --export buzz --days 7  # 直近7日のバズ評価をJSONで標準出力
+"""
+
+import argparse
+import json
+import logging
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterable, Optional
+
+from paths import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+# --- 定数 ---
+
+EVAL_DB_PATH = DATA_DIR / "evaluations.db"
+
+# kind → (テーブル名, 旧JSONファイル)
+KINDS = {
+    "content": ("content_evaluations", DATA_DIR / "content_evaluations.json"),
+    "buzz": ("buzz_evaluations", DATA_DIR / "buzz_content_evaluations.json"),
+}
+
+# EvalJournal.compact() で、これより古いチェックポイントは本体に保存されていなくても削除する
+JOURNAL_MAX_AGE_DAYS = 3
+
+# SQLiteのバインド変数上限（古いビルドは999）を超えないようにIN句を分割
+_IN_CHUNK = 500
+
+
+def _evaluated_date(entry: dict) -> str:
+    """evaluated_date がないエントリ（content_evaluations）は evaluated_at の日付部分を使う"""
+    return entry.get("evaluated_date") or (entry.get("evaluated_at") or "")[:10]
+
+
+class EvaluationStore:
+    """評価データ1種類（content / buzz）分のアクセサ"""
+
+    def __init__(self, kind: str, path: Path = EVAL_DB_PATH):
+        if kind not in KINDS:
+            raise ValueError(f"unknown evaluation kind: {kind}")
+        self.kind = kind
+        self.table, self.legacy_json = KINDS[kind]
+        self.path = path
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), timeout=30.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+        self._migrate_once()
+
+    def _create_schema(self) -> None:
+        t = self.table
+        self._conn.executescript(
+            f"""
+            CREATE TABLE IF NOT EXISTS {t} (
+                tweet_id TEXT PRIMARY KEY,
+                evaluated_at TEXT NOT NULL DEFAULT '',
+                evaluated_date TEXT NOT NULL DEFAULT '',
+                content_type TEXT,
+                virality_factor TEXT,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_{t}_date ON {t}(evaluated_date);
+            CREATE INDEX IF NOT EXISTS idx_{t}_content_type ON {t}(content_type, evaluated_date);
+            CREATE INDEX IF NOT EXISTS idx_{t}_virality ON {t}(virality_factor, evaluated_date);
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            """
+        )
+        self._conn.commit()
+
+    # --- 旧JSONからの移行 ---
+
+    def _migrate_once(self) -> None:
+        if self.get_meta(f"migrated:{self.table}") is not None:
+            return
+        if self.legacy_json.exists():
+            self.migrate_json(self.legacy_json)
+        self.set_meta(f"migrated:{self.table}", self.legacy_json.name)
+
+    def migrate_json(self, json_path: Path) -> int:
+        """旧形式のJSON（{"evaluations": {tweet_id: entry}}）を取り込み、件数を返す"""
+        try:
+            raw = json.loads(json_path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"{json_path.name} の読み込みに失敗（移行スキップ）: {e}")
+            return 0
+
+        evaluations = raw.get("evaluations", {})
+        # buzz は daily_index 側に evaluated_date の正があるので補完しておく
+        for date, ids in raw.get("daily_index", {}).items():
+            for tid in ids:
+                if tid in evaluations and not evaluations[tid].get("evaluated_date"):
+                    evaluations[tid]["evaluated_date"] = date
+
+        count = self.upsert(evaluations)
+        last_updated = raw.get("last_updated") or raw.get("metadata", {}).get("last_updated")
+        if last_updated:
+            self.set_meta(f"last_updated:{self.table}", last_updated)
+        logger.info(f"{json_path.name} から {count}件を {self.path.name} に移行")
+        return count
+
+    # --- 読み込み ---
+
+    def count(self) -> int:
+        return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def ids(self) -> set[str]:
+        return {row[0] for row in self._conn.execute(f"SELECT tweet_id FROM {self.table}")}
+
+    def get(self, tweet_id: str) -> Optional[dict]:
+        row = self._conn.execute(
+            f"SELECT data FROM {self.table} WHERE tweet_id = ?", (tweet_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_many(self, tweet_ids: Iterable[str]) -> dict[str, dict]:
+        """指定IDの評価をまとめて取得（未評価のIDは含まれない）"""
+        ids = list(dict.fromkeys(tweet_ids))
+        result = {}
+        for i in range(0, len(ids), _IN_CHUNK):
+            chunk = ids[i : i + _IN_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._conn.execute(
+                f"SELECT tweet_id, data FROM {self.table} WHERE tweet_id IN ({placeholders})",
+                chunk,
+            )
+            for tid, data in rows:
+                result[tid] = json.loads(data)
+        return result
+
+    def query(
+        self,
+        *,
+        since: Optional[str] = None,
+        date: Optional[str] = None,
+        content_type: Optional[str] = None,
+        virality_factor: Optional[str] = None,
+        newest_first: bool = False,
+    ) -> list[dict]:
+        """条件に合う評価エントリを返す（since/date は YYYY-MM-DD、evaluated_date基準）"""
+        where, params = [], []
+        if since is not None:
+            where.append("evaluated_date >= ?")
+            params.append(since)
+        if date is not None:
+            where.append("evaluated_date = ?")
+            params.append(date)
+        if content_type is not None:
+            where.append("content_type = ?")
+            params.append(content_type)
+        if virality_factor is not None:
+            where.append("virality_factor = ?")
+            params.append(virality_factor)
+
+        sql = f"SELECT tweet_id, data FROM {self.table}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        if newest_first:
+            sql += " ORDER BY evaluated_at DESC"
+        results = []
+        for tid, data in self._conn.execute(sql, params):
+            entry = json.loads(data)
+            entry.setdefault("tweet_id", tid)
+            results.append(entry)
+        return results
+
+    def date_range(self) -> tuple[str, str]:
+        """(最古, 最新) の evaluated_date。空なら ("", "")"""
+        oldest, newest = self._conn.execute(
+            f"SELECT MIN(evaluated_date), MAX(evaluated_date) FROM {self.table}"
+        ).fetchone()
+        return oldest or "", newest or ""
+
+    # --- 書き込み ---
+
+    def upsert(self, entries: dict[str, dict]) -> int:
+        """{tweet_id: entry} を追加・上書きし、件数を返す"""
+        rows = [
+            (
+                tid,
+                entry.get("evaluated_at") or "",
+                _evaluated_date(entry),
+                entry.get("content_type"),
+                entry.get("virality_factor"),
+                json.dumps(entry, ensure_ascii=False),
+            )
+            for tid, entry in entries.items()
+        ]
+        with self._conn:
+            self._conn.executemany(
+                f"""
+                INSERT INTO {self.table}
+                    (tweet_id, evaluated_at, evaluated_date, content_type, virality_factor, data)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(tweet_id) DO UPDATE SET
+                    evaluated_at = excluded.evaluated_at,
+                    evaluated_date = excluded.evaluated_date,
+                    content_type = excluded.content_type,
+                    virality_factor = excluded.virality_factor,
+                    data = excluded.data
+                """,
+                rows,
+            )
+        return len(rows)
+
+    def delete_before(self, date: str) -> int:
+        """evaluated_date が date より前のエントリを削除し、件数を返す"""
+        with self._conn:
+            cur = self._conn.execute(
+                f"DELETE FROM {self.table} WHERE evaluated_date < ?", (date,)
+            )
+        return cur.rowcount
+
+    # --- メタデータ ---
+
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        with self._conn:
+            self._conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, value),
+            )
+
+    @property
+    def last_updated(self) -> str:
+        return self.get_meta(f"last_updated:{self.table}") or ""
+
+    @last_updated.setter
+    def last_updated(self, value: str) -> None:
+        self.set_meta(f"last_updated:{self.table}", value)
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def __enter__(self) -> "EvaluationStore":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+class EvalJournal:
+    """分類結果のバッチ単位チェックポイント。EvaluationStore と同じDBの {table}_journal テーブル"""
+
+    def __init__(self, store: EvaluationStore):
+        self.store = store
+        self.table = f"{store.table}_journal"
+        self._conn = store._conn
+        self._conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {self.table} (
+                tweet_id TEXT PRIMARY KEY,
+                result TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def append(self, results: list[dict]) -> None:
+        """1バッチ分の分類結果（tweet_id 付き）を書き込み、コミットする"""
+        now = datetime.now().isoformat()
+        with self._conn:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (tweet_id, result, created_at) VALUES (?, ?, ?)",
+                [
+                    (r["tweet_id"], json.dumps(r, ensure_ascii=False), now)
+                    for r in results if r.get("tweet_id")
+                ],
+            )
+
+    def load(self, tweet_ids: Iterable[str]) -> dict[str, dict]:
+        """指定IDのうちチェックポイントがある分の分類結果"""
+        ids = list(dict.fromkeys(tweet_ids))
+        found = {}
+        for i in range(0, len(ids), _IN_CHUNK):
+            chunk = ids[i : i + _IN_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            for tid, result in self._conn.execute(
+                f"SELECT tweet_id, result FROM {self.table} WHERE tweet_id IN ({placeholders})",
+                chunk,
+            ):
+                found[tid] = json.loads(result)
+        return found
+
+    def count(self) -> int:
+        return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def compact(self, saved_ids: Iterable[str]) -> int:
+        """本体テーブルに保存済みの分と期限切れの分を journal から削除し、件数を返す"""
+        ids = list(saved_ids)
+        cutoff = (datetime.now() - timedelta(days=JOURNAL_MAX_AGE_DAYS)).isoformat()
+        removed = 0
+        with self._conn:
+            for i in range(0, len(ids), _IN_CHUNK):
+                chunk = ids[i : i + _IN_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                removed += self._conn.execute(
+                    f"DELETE FROM {self.table} WHERE tweet_id IN ({placeholders})", chunk
+                ).rowcount
+            removed += self._conn.execute(
+                f"DELETE FROM {self.table} WHERE created_at < ?", (cutoff,)
+            ).rowcount
+        return removed
+
+
+# --- CLI ---
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM評価データ SQLiteストア")
+    parser.add_argument("--migrate", action="store_true",
+                        help="旧JSON（content/buzz）を再取り込み（既存エントリは上書き）")
+    parser.add_argument("--export", choices=sorted(KINDS),
+                        help="評価データをJSONで標準出力（旧JSONと同じ evaluations 形式）")
+    parser.add_argument("--days", type=int, default=None,
+                        help="--export の対象日数（省略時は全件）")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+
+    if args.migrate:
+        for kind in KINDS:
+            with EvaluationStore(kind) as store:
+                if store.legacy_json.exists():
+                    store.migrate_json(store.legacy_json)
+                print(f"[OK] {store.table}: {store.count()}件", file=sys.stderr)
+
+    if args.export:
+        since = None
+        if args.days is not None:
+            since = (datetime.now() - timedelta(days=args.days)).strftime("%Y-%m-%d")
+        with EvaluationStore(args.export) as store:
+            evaluations = {ev["tweet_id"]: ev for ev in store.query(since=since)}
+            output = {"last_updated": store.last_updated, "evaluations": evaluations}
+        print(json.dumps(output, ensure_ascii=False, indent=2))
+
+    if not args.migrate and not args.export:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
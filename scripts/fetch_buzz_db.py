@@ -20,8 +20,12 @@ from pathlib import Path
 from datetime import datetime, timedelta
 from collections import Counter
 
+sys.path.insert(0, str(Path(__file__).parent))
+from buzz_db import BuzzDB
+from eval_store import EvaluationStore
+from keyword_matcher import KeywordMatcher
+
 DB_PATH = Path(r"C:\Users\Tenormusica\Documents\ai-buzz-extractor\ai_buzz.db")
-BUZZ_EVALS_JSON = Path(__file__).parent / "data" / "buzz_content_evaluations.json"
 OUTPUT_DIR = Path(__file__).parent / "data"
 
 # discourse-freshness に関連するカテゴリ
@@ -78,84 +82,53 @@ def parse_args():
     return days, output_mode
 
 
-def keyword_match(text, keywords):
-    """テキストにキーワードが含まれるかチェック"""
-    text_lower = text.lower()
-    for kw in keywords:
-        if kw.lower() in text_lower:
-            return True
-    return False
+# DISCOURSE_KEYWORDS から1回だけ組み立てる（全領域を1パスで判定）
+DISCOURSE_MATCHER = KeywordMatcher(DISCOURSE_KEYWORDS)
 
 
-def extract_discourse_signals(conn, days):
-    """discourse-freshness関連のシグナルを抽出"""
-    cutoff = (datetime.utcnow() - timedelta(days=days)).isoformat()
+def _row_to_dict(t):
+    return {
+        "text": t["text"][:200],
+        "username": t["username"],
+        "likes": t["likes"],
+        "category": t["category"],
+        "created_at": t["created_at"],
+        "url": t["url"],
+    }
 
-    cursor = conn.cursor()
+
+def extract_discourse_signals(db, days):
+    """discourse-freshness関連のシグナルを抽出（db は buzz_db.BuzzDB）"""
+    cutoff = (datetime.utcnow() - timedelta(days=days)).isoformat()
 
     # カテゴリ別集計
-    cursor.execute("""
-        SELECT category, COUNT(*) as cnt, AVG(likes) as avg_likes
-        FROM tweets
-        WHERE created_at > ? AND category IN ({})
-        GROUP BY category ORDER BY cnt DESC
-    """.format(",".join("?" * len(RELEVANT_CATEGORIES))),
-        [cutoff] + RELEVANT_CATEGORIES
-    )
     category_stats = [
-        {"category": r[0], "count": r[1], "avg_likes": round(r[2], 1)}
-        for r in cursor.fetchall()
+        {"category": r["category"], "count": r["cnt"], "avg_likes": round(r["avg_likes"], 1)}
+        for r in db.category_stats(cutoff, RELEVANT_CATEGORIES)
     ]
 
-    # 全関連ツイート取得
-    cursor.execute("""
-        SELECT text, username, likes, category, created_at, url
-        FROM tweets
-        WHERE created_at > ? AND category IN ({})
-        ORDER BY likes DESC
-    """.format(",".join("?" * len(RELEVANT_CATEGORIES))),
-        [cutoff] + RELEVANT_CATEGORIES
-    )
-    all_tweets = cursor.fetchall()
-
-    # discourse領域別にマッチするツイートを分類
-    discourse_signals = {}
-    for area, keywords in DISCOURSE_KEYWORDS.items():
-        matched = []
-        for t in all_tweets:
-            text = t[0]
-            if keyword_match(text, keywords):
-                matched.append({
-                    "text": text[:200],
-                    "username": t[1],
-                    "likes": t[2],
-                    "category": t[3],
-                    "created_at": t[4],
-                    "url": t[5],
-                })
-        # 上位10件に絞る
-        discourse_signals[area] = {
-            "total_matches": len(matched),
-            "top_tweets": matched[:10],
-        }
-
-    # 全体のエンゲージメント上位（カテゴリ横断）
-    top_overall = [
-        {
-            "text": t[0][:200],
-            "username": t[1],
-            "likes": t[2],
-            "category": t[3],
-            "created_at": t[4],
-            "url": t[5],
-        }
-        for t in all_tweets[:20]
-    ]
+    # 関連ツイートをいいね順に1回だけ走査し、discourse領域別に分類
+    # （上位件数だけ保持し、全件はメモリに載せない）
+    discourse_signals = {
+        area: {"total_matches": 0, "top_tweets": []} for area in DISCOURSE_KEYWORDS
+    }
+    top_overall = []
+    total = 0
+    for t in db.iter_by_categories(cutoff, RELEVANT_CATEGORIES):
+        total += 1
+        if len(top_overall) < 20:
+            top_overall.append(_row_to_dict(t))
+        for area in DISCOURSE_MATCHER.match(t["text"]):
+            signal = discourse_signals[area]
+            signal["total_matches"] += 1
+            # 上位10件に絞る
+            if len(signal["top_tweets"]) < 10:
+                signal["top_tweets"].append(_row_to_dict(t))
 
     return {
         "period_days": days,
         "cutoff_date": cutoff[:10],
-        "total_relevant_tweets": len(all_tweets),
+        "total_relevant_tweets": total,
         "category_stats": category_stats,
         "discourse_signals": discourse_signals,
         "top_engagement": top_overall,
@@ -164,24 +137,21 @@ def extract_discourse_signals(conn, days):
 
 def extract_buzz_eval_signals(days):
     """
-    buzz_content_evaluations.json からdiscourse領域別の定量シグナルを抽出する。
+    評価ストア（buzz_content_analyzer.pyの蓄積）からdiscourse領域別の定量シグナルを抽出する。
     LLM分類済みの7軸データ（content_type, virality_factor, originality等）を活用して、
     DBのキーワードマッチより高精度な傾向を提供する。
     """
-    if not BUZZ_EVALS_JSON.exists():
-        return None
+    cutoff = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
 
     try:
-        raw = json.loads(BUZZ_EVALS_JSON.read_text(encoding="utf-8"))
-    except Exception:
+        with EvaluationStore("buzz") as store:
+            evaluations = store.query(since=cutoff)
+    except sqlite3.Error:
         return None
 
-    evaluations = raw.get("evaluations", {})
     if not evaluations:
         return None
 
-    cutoff = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
-
     # discourse領域別にツイートを分類
     discourse_signals = {area: [] for area in DISCOURSE_KEYWORDS}
     # content_type別・virality_factor別の集計
@@ -189,10 +159,7 @@ def extract_buzz_eval_signals(days):
     vf_stats = Counter()
     total = 0
 
-    for eval_data in evaluations.values():
-        if eval_data.get("evaluated_date", "") < cutoff:
-            continue
-
+    for eval_data in evaluations:
         total += 1
         text = eval_data.get("tweet_data", {}).get("text", "")
         ct = eval_data.get("content_type", "unknown")
@@ -205,17 +172,16 @@ def extract_buzz_eval_signals(days):
         vf_stats[vf] += 1
 
         # discourse領域へのマッピング（キーワードマッチ）
-        for area, keywords in DISCOURSE_KEYWORDS.items():
-            if keyword_match(text, keywords):
-                discourse_signals[area].append({
-                    "text": text[:200],
-                    "username": eval_data.get("tweet_data", {}).get("username", ""),
-                    "engagement_score": eng,
-                    "content_type": ct,
-                    "originality": orig,
-                    "ai_citation_value": acv,
-                    "virality_factor": vf,
-                })
+        for area in DISCOURSE_MATCHER.match(text):
+            discourse_signals[area].append({
+                "text": text[:200],
+                "username": eval_data.get("tweet_data", {}).get("username", ""),
+                "engagement_score": eng,
+                "content_type": ct,
+                "originality": orig,
+                "ai_citation_value": acv,
+                "virality_factor": vf,
+            })
 
     if total == 0:
         return None
@@ -261,16 +227,15 @@ def main():
 
     # ソース1: ai-buzz-extractor DB
     if DB_PATH.exists():
-        conn = sqlite3.connect(str(DB_PATH))
-        db_signals = extract_discourse_signals(conn, days)
+        with BuzzDB(DB_PATH) as db:
+            db_signals = extract_discourse_signals(db, days)
         db_signals["db_path"] = str(DB_PATH)
-        conn.close()
         result["db_signals"] = db_signals
     else:
         print(f"DB not found: {DB_PATH}", file=sys.stderr)
         result["db_signals"] = None
 
-    # ソース2: buzz_content_evaluations.json（LLM分類済みバズデータ）
+    # ソース2: 評価ストアのバズ評価（LLM分類済みバズデータ）
     buzz_eval_signals = extract_buzz_eval_signals(days)
     if buzz_eval_signals:
         result["buzz_eval_signals"] = buzz_eval_signals
@@ -0,0 +1,518 @@
+"""
+groq_client.py - Groq API 共通非同期クライアント
+
+content_evaluator.py / buzz_content_analyzer.py / zeitgeist_detector.py /
+saturation_quantifier.py が個別に持っていた「POST + 429バックオフ」ループを集約する。
+
+固定sleep（BATCH_DELAY=5.0 / delay=2.5）でペースを作る代わりに、
+  - RPM / TPM のトークンバケット（x-ratelimit-* レスポンスヘッダーで残量を補正）
+  - 同時実行数の適応制御（成功で+1、429で半減するAIMD）
+でGroqの実クォータ上限までリクエストを流す。
+
+同一プロセス・同一モデルのクライアントはレートリミッタを共有するため、
+複数の分類処理を同じイベントループで動かしてもクォータを食い合わない。
+
+ツイート単位の分類結果は llm_cache.py の永続キャッシュを cache_get / cache_put で参照する。
+キャッシュキーはモデル名・プロンプトバージョン・正規化本文なので、呼び出し元は
+プロンプトを変更したら自分の *_PROMPT_VERSION を上げること。
+
+複数ツイートを1プロンプトにまとめる分類処理は、件数固定ではなく pack_batches() で
+トークン見積もり（compact_text で URL・空白を詰めた本文 + 出力分）が request_token_budget()
+に収まるだけ詰める。
+
+使い方:
+    async with GroqClient(api_key) as groq:
+        cached = groq.cache_get(PROMPT_VERSION, text)
+        content = await groq.complete(prompt, max_tokens=1500)
+        async for delta in groq.stream(prompt, max_tokens=1500):   # ストリーミング版
+            ...
+        groq.cache_put(PROMPT_VERSION, text, result)
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from typing import Any, AsyncIterator, Callable, Optional, TypeVar
+
+import httpx
+
+from llm_cache import LLMCache
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# --- 定数 ---
+
+GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
+GROQ_MODEL = "llama-3.3-70b-versatile"
+
+# Groq free tier（llama-3.3-70b-versatile）の既定クォータ。
+# TPMはレスポンスヘッダー（x-ratelimit-limit-tokens）を受信したら実値で上書きされる。
+# NOTE: x-ratelimit-limit-requests は RPD（1日あたり）なのでRPMの補正には使わない
+DEFAULT_RPM = 30
+DEFAULT_TPM = 12000
+
+# 同時実行数（in-flightリクエスト数）の初期値と上限
+INITIAL_CONCURRENCY = 2
+MAX_CONCURRENCY = 8
+
+# 1リクエスト（入力+出力）に詰め込むトークン数の上限。
+# コンテキスト長（llama-3.3-70b-versatile は128k）と、1リクエストでTPMを使い切らないための割合の小さい方
+CONTEXT_TOKENS = 131072
+REQUEST_TPM_SHARE = 0.5
+
+# 429リトライ時の段階的バックオフ（秒）。Retry-Afterヘッダーがない場合に使用
+BACKOFF_SCHEDULE = [5, 15, 30, 60]
+MAX_ATTEMPTS = 4
+
+_URL_RE = re.compile(r"https?://\S+")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# "2m59.56s" / "7.66s" / "450ms" 形式のリセット時間
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def estimate_tokens(text: str) -> int:
+    """テキストのトークン数を概算する（ASCII 約4文字=1トークン、非ASCII 約1文字=1トークン）"""
+    ascii_chars = sum(1 for c in text if c.isascii())
+    return ascii_chars // 4 + (len(text) - ascii_chars) + 1
+
+
+def compact_text(text: str) -> str:
+    """プロンプト用に本文を詰める（URLは [URL] に置き換え、空白・改行の連続を1つにまとめる）"""
+    return _WHITESPACE_RE.sub(" ", _URL_RE.sub("[URL]", text or "")).strip()
+
+
+def pack_batches(
+    items: list[T],
+    item_tokens: Callable[[T], int],
+    *,
+    base_tokens: int,
+    output_tokens_per_item: int,
+    budget: int,
+    max_items: int,
+) -> list[list[T]]:
+    """items を入力順のまま、1リクエストのトークン見積もりが budget に収まるように詰める。
+
+    見積もり = base_tokens（プロンプトの固定部分）+ Σ(item_tokens + output_tokens_per_item)。
+    1件だけで budget を超える要素は単独のバッチにする。
+    """
+    batches: list[list[T]] = []
+    current: list[T] = []
+    used = base_tokens
+    for item in items:
+        cost = item_tokens(item) + output_tokens_per_item
+        if current and (used + cost > budget or len(current) >= max_items):
+            batches.append(current)
+            current, used = [], base_tokens
+        current.append(item)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def batch_summary(batches: list[list]) -> str:
+    """実行ログ用の1行表示（リクエストあたりの件数）"""
+    if not batches:
+        return "0件"
+    total = sum(len(b) for b in batches)
+    return (
+        f"{total}件を{len(batches)}リクエストに分割"
+        f"（平均 {total / len(batches):.1f}件/リクエスト、最大 {max(len(b) for b in batches)}件）"
+    )
+
+
+def _parse_duration(value: Optional[str]) -> Optional[float]:
+    """x-ratelimit-reset-* / retry-after の値を秒数に変換。解釈できなければNone"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_RE.findall(value)
+    if not parts:
+        return None
+    return sum(float(num) * _DURATION_UNITS[unit] for num, unit in parts)
+
+
+def _parse_number(value: Optional[str]) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+# --- レート制御 ---
+
+class _TokenBucket:
+    """1分あたりcapacity個まで連続補充されるトークンバケット"""
+
+    def __init__(self, capacity: float):
+        self.capacity = float(capacity)
+        self.level = float(capacity)
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        self.level = min(self.capacity, self.level + elapsed * self.capacity / 60.0)
+
+    def wait_time(self, amount: float) -> float:
+        """amount個を取り出せるまでの待機秒数（0なら即時）"""
+        self._refill()
+        # バケット容量を超える要求は容量いっぱいで頭打ち（永久待ち防止）
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) * 60.0 / self.capacity
+
+    def consume(self, amount: float) -> None:
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+    def refund(self, amount: float) -> None:
+        """見積もりと実消費の差分を戻す（amountが負なら追加消費）"""
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+    def sync(self, limit: Optional[float], remaining: Optional[float]) -> None:
+        """レスポンスヘッダーの実値でバケットを補正する"""
+        if limit and limit > 0:
+            self.capacity = limit
+        if remaining is not None:
+            self._refill()
+            self.level = min(self.level, remaining)
+
+
+class RateLimiter:
+    """RPM/TPMトークンバケット + AIMD同時実行制御。プロセス内でモデルごとに共有される"""
+
+    def __init__(
+        self,
+        rpm: float = DEFAULT_RPM,
+        tpm: float = DEFAULT_TPM,
+        max_concurrency: int = MAX_CONCURRENCY,
+    ):
+        self.requests = _TokenBucket(rpm)
+        self.tokens = _TokenBucket(tpm)
+        self.max_concurrency = max_concurrency
+        self.concurrency = min(INITIAL_CONCURRENCY, max_concurrency)
+        self.in_flight = 0
+        # 429や日次上限到達時に全リクエストを止める時刻（monotonic秒）
+        self._blocked_until = 0.0
+        self._cond = asyncio.Condition()
+        self.loop = asyncio.get_running_loop()
+
+    async def acquire(self, est_tokens: int) -> None:
+        """同時実行枠・RPM・TPMがすべて空くまで待ってから1リクエスト分を確保する"""
+        async with self._cond:
+            while True:
+                if self.in_flight >= self.concurrency:
+                    await self._cond.wait()
+                    continue
+                wait = max(
+                    self._blocked_until - time.monotonic(),
+                    self.requests.wait_time(1),
+                    self.tokens.wait_time(est_tokens),
+                )
+                if wait <= 0:
+                    self.requests.consume(1)
+                    self.tokens.consume(est_tokens)
+                    self.in_flight += 1
+                    return
+                try:
+                    await asyncio.wait_for(self._cond.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def release(
+        self,
+        est_tokens: int,
+        *,
+        success: bool = False,
+        retry_after: Optional[float] = None,
+        headers: Optional[httpx.Headers] = None,
+        tokens_used: Optional[int] = None,
+    ) -> None:
+        """確保した枠を返却し、レスポンス結果で並列度とバケットを更新する"""
+        async with self._cond:
+            self.in_flight -= 1
+            if tokens_used is not None:
+                self.tokens.refund(est_tokens - tokens_used)
+            if headers is not None:
+                self._sync_headers(headers)
+            if retry_after is not None:
+                # 429: 並列度を半減し、指定時間は全リクエストを止める
+                self.concurrency = max(1, self.concurrency // 2)
+                self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+            elif success:
+                self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+            self._cond.notify_all()
+
+    def _sync_headers(self, headers: httpx.Headers) -> None:
+        self.tokens.sync(
+            _parse_number(headers.get("x-ratelimit-limit-tokens")),
+            _parse_number(headers.get("x-ratelimit-remaining-tokens")),
+        )
+        # 日次リクエスト上限（RPD）を使い切ったらリセットまで停止
+        remaining_requests = _parse_number(headers.get("x-ratelimit-remaining-requests"))
+        if remaining_requests is not None and remaining_requests < 1:
+            reset = _parse_duration(headers.get("x-ratelimit-reset-requests"))
+            if reset:
+                self._blocked_until = max(self._blocked_until, time.monotonic() + reset)
+
+
+_LIMITERS: dict[str, RateLimiter] = {}
+
+
+def get_rate_limiter(model: str = GROQ_MODEL) -> RateLimiter:
+    """モデル単位の共有レートリミッタを返す（イベントループが変わったら作り直す）"""
+    limiter = _LIMITERS.get(model)
+    if limiter is None or limiter.loop is not asyncio.get_running_loop():
+        limiter = RateLimiter()
+        _LIMITERS[model] = limiter
+    return limiter
+
+
+def _retry_wait(response: httpx.Response, attempt: int) -> float:
+    """429時の待機秒数。Retry-Afterヘッダー優先、なければ段階的バックオフ"""
+    retry_after = _parse_duration(response.headers.get("retry-after"))
+    if retry_after is not None:
+        return retry_after + 1  # 1秒マージン
+    return float(BACKOFF_SCHEDULE[min(attempt, len(BACKOFF_SCHEDULE) - 1)])
+
+
+# --- クライアント ---
+
+class GroqClient:
+    """Groq chat completions の共通クライアント（レート制御・429リトライ込み）"""
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        model: str = GROQ_MODEL,
+        timeout: float = 60.0,
+        max_attempts: int = MAX_ATTEMPTS,
+        use_cache: bool = True,
+    ):
+        self.api_key = api_key or os.getenv("GROQ_API_KEY")
+        if not self.api_key:
+            raise ValueError("GROQ_API_KEY is not set")
+        self.model = model
+        self.max_attempts = max_attempts
+        self._http = httpx.AsyncClient(timeout=timeout)
+        self.cache: Optional[LLMCache] = LLMCache() if use_cache else None
+        self._closed = False
+        # 実行サマリー用カウンタ
+        self.total_requests = 0
+        self.rate_limited = 0
+
+    async def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        await self._http.aclose()
+        if self.cache is not None:
+            self.cache.close()
+
+    async def __aenter__(self) -> "GroqClient":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.close()
+
+    async def complete(
+        self,
+        prompt: str,
+        *,
+        max_tokens: int,
+        temperature: float = 0.1,
+    ) -> str:
+        """1プロンプトを送信し、レスポンスのcontent文字列を返す（choicesが空なら""）。
+
+        429はRetry-After / BACKOFF_SCHEDULEの間リミッタ全体を止めてからリトライする。
+
+        Raises:
+            httpx.HTTPStatusError: 429のリトライ上限到達、または429以外のHTTPエラー
+            httpx.TransportError: タイムアウト・接続エラー
+        """
+        limiter = get_rate_limiter(self.model)
+        est_tokens = estimate_tokens(prompt) + max_tokens
+
+        for attempt in range(self.max_attempts):
+            await limiter.acquire(est_tokens)
+            self.total_requests += 1
+            try:
+                response = await self._http.post(
+                    GROQ_API_URL,
+                    headers={
+                        "Authorization": f"Bearer {self.api_key}",
+                        "Content-Type": "application/json",
+                    },
+                    json={
+                        "model": self.model,
+                        "messages": [{"role": "user", "content": prompt}],
+                        "temperature": temperature,
+                        "max_tokens": max_tokens,
+                    },
+                )
+            except BaseException:
+                await limiter.release(est_tokens)
+                raise
+
+            if response.status_code == 429:
+                self.rate_limited += 1
+                wait = _retry_wait(response, attempt)
+                await limiter.release(est_tokens, retry_after=wait, headers=response.headers)
+                if attempt < self.max_attempts - 1:
+                    logger.warning(
+                        f"Groq rate limited (429), {wait:.1f}s後にリトライ "
+                        f"(attempt {attempt + 1}/{self.max_attempts})"
+                    )
+                    continue
+                logger.error(f"Rate limit (429) persists after {self.max_attempts} attempts")
+                response.raise_for_status()
+
+            if response.is_error:
+                await limiter.release(est_tokens, headers=response.headers)
+                response.raise_for_status()
+
+            result = response.json()
+            usage = result.get("usage") or {}
+            await limiter.release(
+                est_tokens,
+                success=True,
+                headers=response.headers,
+                tokens_used=usage.get("total_tokens"),
+            )
+            choices = result.get("choices")
+            if not choices:
+                logger.warning("Groq APIが空のchoicesを返しました")
+                return ""
+            return (choices[0]["message"]["content"] or "").strip()
+
+        # max_attempts=0 の場合のみ到達
+        raise RuntimeError("GroqClient.complete: no attempts made")
+
+    async def stream(
+        self,
+        prompt: str,
+        *,
+        max_tokens: int,
+        temperature: float = 0.1,
+    ) -> AsyncIterator[str]:
+        """complete() のストリーミング版。レスポンスのcontentを届いた差分ごとに返す。
+
+        429はレスポンス本文を読む前に判定できるので complete() と同じくリトライする。
+        差分を返し始めた後の切断はリトライせず、そのまま例外を送出する
+        （呼び出し元はそこまでに受け取った分を使える）。
+
+        Raises:
+            httpx.HTTPStatusError: 429のリトライ上限到達、または429以外のHTTPエラー
+            httpx.TransportError: タイムアウト・接続エラー
+        """
+        limiter = get_rate_limiter(self.model)
+        est_tokens = estimate_tokens(prompt) + max_tokens
+
+        for attempt in range(self.max_attempts):
+            await limiter.acquire(est_tokens)
+            self.total_requests += 1
+            released = False
+            try:
+                async with self._http.stream(
+                    "POST",
+                    GROQ_API_URL,
+                    headers={
+                        "Authorization": f"Bearer {self.api_key}",
+                        "Content-Type": "application/json",
+                    },
+                    json={
+                        "model": self.model,
+                        "messages": [{"role": "user", "content": prompt}],
+                        "temperature": temperature,
+                        "max_tokens": max_tokens,
+                        "stream": True,
+                    },
+                ) as response:
+                    if response.status_code == 429:
+                        self.rate_limited += 1
+                        wait = _retry_wait(response, attempt)
+                        released = True
+                        await limiter.release(est_tokens, retry_after=wait, headers=response.headers)
+                        if attempt < self.max_attempts - 1:
+                            logger.warning(
+                                f"Groq rate limited (429), {wait:.1f}s後にリトライ "
+                                f"(attempt {attempt + 1}/{self.max_attempts})"
+                            )
+                            continue
+                        logger.error(f"Rate limit (429) persists after {self.max_attempts} attempts")
+                        response.raise_for_status()
+
+                    if response.is_error:
+                        await response.aread()
+                        released = True
+                        await limiter.release(est_tokens, headers=response.headers)
+                        response.raise_for_status()
+
+                    # Server-Sent Events: "data: {chunk}" の行が続き、"data: [DONE]" で終わる
+                    tokens_used = None
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[len("data:"):].strip()
+                        if data == "[DONE]":
+                            break
+                        chunk = json.loads(data)
+                        # 最後のチャンクに使用量が付く（Groqは x_groq.usage）
+                        usage = (chunk.get("x_groq") or {}).get("usage") or chunk.get("usage")
+                        if usage:
+                            tokens_used = usage.get("total_tokens")
+                        for choice in chunk.get("choices") or []:
+                            delta = (choice.get("delta") or {}).get("content")
+                            if delta:
+                                yield delta
+
+                    released = True
+                    await limiter.release(
+                        est_tokens, success=True, headers=response.headers, tokens_used=tokens_used,
+                    )
+                    return
+            finally:
+                if not released:
+                    await limiter.release(est_tokens)
+
+        # max_attempts=0 の場合のみ到達
+        raise RuntimeError("GroqClient.stream: no attempts made")
+
+    def request_token_budget(self) -> int:
+        """1リクエストに詰め込めるトークン数（TPMはレスポンスヘッダーで補正された実値を使う）"""
+        tpm = get_rate_limiter(self.model).tokens.capacity
+        return int(min(CONTEXT_TOKENS, tpm * REQUEST_TPM_SHARE))
+
+    def cache_get(self, prompt_version: str, text: str) -> Optional[Any]:
+        """ツイート1件分のキャッシュ済み結果（キャッシュ無効時・未登録ならNone）"""
+        if self.cache is None:
+            return None
+        return self.cache.get(self.model, prompt_version, text)
+
+    def cache_put(self, prompt_version: str, text: str, result: Any) -> None:
+        """ツイート1件分の結果をキャッシュに保存（LLMが実際に返した結果のみ渡すこと）"""
+        if self.cache is not None:
+            self.cache.put(self.model, prompt_version, text, result)
+
+    def summary(self) -> str:
+        """実行サマリー用の1行表示"""
+        line = f"Groqリクエスト {self.total_requests}回（429: {self.rate_limited}回）"
+        if self.cache is not None:
+            line += f" / {self.cache.summary()}"
+        return line
@@ -0,0 +1,183 @@
+"""
+json_stream.py - 大きなJSONファイルの配列要素を逐次読み出す（標準ライブラリのみ）
+
+ai-buzz-extractor の data.json のように {"tweets": [ {...}, {...}, ... ], ...} 形式で
+肥大化していくファイルを json.loads で丸ごと読むと、メモリがファイルサイズに比例する。
+
+iter_array_items() はファイルをチャンク単位で読み、トップレベルの指定キーの配列要素を
+1件ずつ json.JSONDecoder.raw_decode でデコードして返す。保持するのは読みかけの
+チャンクと要素1件分だけ。
+
+ArrayItemParser は同じ考え方で、LLMのストリーミング応答のようにチャンクで届く
+JSON配列テキストから、完成した要素を届いた順に取り出す（途中で切れても完成分は使える）。
+
+使い方:
+    for tweet in iter_array_items(AI_BUZZ_JSON, "tweets"):
+        ...
+
+    parser = ArrayItemParser()
+    async for delta in groq.stream(prompt, max_tokens=...):
+        for item in parser.feed(delta):
+            ...
+    leftovers = parser.close()
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Iterator
+
+CHUNK_SIZE = 1 << 16
+
+_WHITESPACE = " \t\r\n"
+
+
+class _Reader:
+    """チャンク読み込みバッファ。消費済みの先頭部分は随時捨てる"""
+
+    def __init__(self, f):
+        self.f = f
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.f.read(CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """次の非空白文字（消費しない）。EOFなら空文字"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, ch: str) -> None:
+        got = self.peek()
+        if got != ch:
+            raise ValueError(f"expected {ch!r}, got {got!r}")
+        self.pos += 1
+
+    def value(self) -> Any:
+        """次のJSON値を1つデコードする。
+
+        値がバッファ末尾で終わった場合は、数値などが途中で切れている可能性が
+        あるので追加で読み込んでからデコードし直す。
+        """
+        self.peek()
+        while True:
+            try:
+                obj, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            if end == len(self.buf) and self._fill():
+                continue
+            self.pos = end
+            return obj
+
+
+def iter_array_items(path: Path, key: str) -> Iterator[Any]:
+    """トップレベルオブジェクトの key の配列要素を順に返す（key がなければ何も返さない）"""
+    with open(path, encoding="utf-8") as f:
+        r = _Reader(f)
+        r.expect("{")
+        if r.peek() == "}":
+            return
+        while True:
+            name = r.value()
+            r.expect(":")
+            if name == key and r.peek() == "[":
+                r.expect("[")
+                if r.peek() == "]":
+                    return
+                while True:
+                    yield r.value()
+                    if r.peek() == "]":
+                        return
+                    r.expect(",")
+            r.value()  # 対象外のキーの値は読み飛ばす
+            if r.peek() == "}":
+                return
+            r.expect(",")
+
+
+class ArrayItemParser:
+    """チャンクで届くJSON配列テキストから、完成した要素を順に取り出すパーサ。
+
+    配列の前の文字（```json などのコードフェンスや前置き）は読み飛ばす。
+    要素の途中で届いたチャンクは続きが来るまで保留する。
+    """
+
+    def __init__(self):
+        self.buf = ""
+        self.pos = 0
+        self.started = False
+        self.finished = False
+        self.decoder = json.JSONDecoder()
+
+    def feed(self, text: str) -> list[Any]:
+        """text を追加し、新たに完成した要素を返す"""
+        self.buf += text
+        if not self.started:
+            start = self.buf.find("[", self.pos)
+            if start < 0:
+                return []
+            self.started = True
+            self.pos = start + 1
+        items = []
+        while not self.finished:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE + ",":
+                self.pos += 1
+            if self.pos >= len(self.buf):
+                break
+            if self.buf[self.pos] == "]":
+                self.finished = True
+                break
+            try:
+                obj, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                break  # 要素の途中（続きを待つ）
+            # 末尾で終わる数値・文字列リテラル以外は閉じ括弧まで届いているので完成している
+            if end == len(self.buf) and not isinstance(obj, (dict, list)):
+                break
+            items.append(obj)
+            self.pos = end
+        # 消費済みの先頭部分を捨てる
+        if self.pos > CHUNK_SIZE:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        return items
+
+    def close(self) -> list[Any]:
+        """入力の終わり。閉じていない配列に残った要素を読めるだけ読んで返す。
+
+        途中で壊れた要素があれば次の "{" まで読み飛ばして続きを探す
+        （配列が見つからない応答でも、オブジェクトが並んでいれば拾う）。
+        """
+        if self.finished:
+            return []
+        items = []
+        pos = self.pos
+        while True:
+            pos = self.buf.find("{", pos)
+            if pos < 0:
+                return items
+            try:
+                obj, end = self.decoder.raw_decode(self.buf, pos)
+            except json.JSONDecodeError:
+                pos += 1
+                continue
+            items.append(obj)
+            pos = end
@@ -0,0 +1,85 @@
+"""
+keyword_matcher.py - 複数キーワードの一括マッチ（Aho-Corasick）
+
+fetch_buzz_db.keyword_match は discourse領域ごと・ツイートごとに本文を lower() し直し、
+全キーワードを `kw in text` で線形に走査していた（ツイート数 × 領域数 × キーワード数）。
+
+KeywordMatcher は {グループ名: [キーワード, ...]} から1回だけオートマトンを組み立て、
+本文を1回なめるだけで一致した全グループを返す。
+
+正規化（キーワード・本文とも同じ処理）:
+  - NFKC: 全角英数（ＡＧＥＮＴ）→ 半角、半角カナ → 全角カナ
+  - casefold: 英字の大文字小文字を同一視（日本語はそのまま）
+一致判定は従来どおり部分文字列（"agent" は "agentic" にも一致する）。
+
+使い方:
+    matcher = KeywordMatcher(DISCOURSE_KEYWORDS)
+    areas = matcher.match(text)  # {"ai_agent", "vibe_coding"}
+"""
+
+import unicodedata
+from collections import deque
+from typing import Iterable, Mapping
+
+
+def normalize(text: str) -> str:
+    """マッチ用の正規化（NFKC + casefold）"""
+    return unicodedata.normalize("NFKC", text or "").casefold()
+
+
+class KeywordMatcher:
+    """グループ別キーワード集合の Aho-Corasick オートマトン"""
+
+    def __init__(self, groups: Mapping[str, Iterable[str]]):
+        # ノードごとの遷移・失敗リンク・出力（一致したグループ名の集合）
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[frozenset[str]] = [frozenset()]
+        self.groups = tuple(groups)
+
+        outputs: list[set[str]] = [set()]
+        for group, keywords in groups.items():
+            for kw in keywords:
+                kw = normalize(kw)
+                if not kw:
+                    continue
+                node = 0
+                for ch in kw:
+                    nxt = self._goto[node].get(ch)
+                    if nxt is None:
+                        nxt = len(self._goto)
+                        self._goto[node][ch] = nxt
+                        self._goto.append({})
+                        self._fail.append(0)
+                        outputs.append(set())
+                    node = nxt
+                outputs[node].add(group)
+
+        # 幅優先で失敗リンクを張り、出力を失敗先から継承する
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                outputs[nxt] |= outputs[self._fail[nxt]]
+                queue.append(nxt)
+
+        self._out = [frozenset(o) for o in outputs]
+
+    def match(self, text: str) -> set[str]:
+        """本文に含まれるキーワードのグループ名をすべて返す"""
+        goto, fail, out = self._goto, self._fail, self._out
+        found: set[str] = set()
+        node = 0
+        for ch in normalize(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                found |= out[node]
+                if len(found) == len(self.groups):
+                    break
+        return found
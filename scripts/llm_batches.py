@@ -0,0 +1,144 @@
+"""
+llm_batches.py - 複数ツイートを1プロンプトで分類する処理の共通部分（ストリーミング + 部分回収 + 欠落分の再リクエスト）
+
+content_evaluator._classify_batch / buzz_content_analyzer._classify_buzz_batch は応答全体を
+json.loads しており、途中で切れた出力（max_tokens 到達など）や壊れたJSONでは、バッチ全体を
+ハードコードのデフォルト値（content_type: other / originality: 3 ...）で埋めていた。
+統計が静かに汚れ、失敗した分は二度と再分類されなかった。
+
+このモジュールでは
+  - GroqClient.stream() で応答を受け取りながら、json_stream.ArrayItemParser で完成した要素から取り出す
+    （途中で切れても、そこまでに届いた要素は使える）
+  - tweet_index が範囲内・重複なしで、必須フィールドがそろった要素だけを採用する
+  - 欠けたツイートだけを詰め直して再リクエストする（RETRY_ROUNDS 回まで）
+  - それでも残ったツイートは結果に含めない。デフォルト値は作らないので、未評価のまま
+    次回の実行で再分類される
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+
+import httpx
+
+from groq_client import GroqClient, batch_summary
+from json_stream import ArrayItemParser
+
+logger = logging.getLogger(__name__)
+
+# --- 定数 ---
+
+# 欠けたツイートを詰め直して再リクエストする回数
+RETRY_ROUNDS = 2
+
+
+@dataclass
+class SalvageStats:
+    """実行サマリー用の集計"""
+    batches: int = 0
+    complete_batches: int = 0
+    salvaged: int = 0     # 不完全な応答（途中切れ・一部欠落）から回収した件数
+    retried: int = 0      # 再リクエストした件数（延べ）
+    unresolved: int = 0   # 再リクエストしても分類できず次回に回した件数
+
+    def summary(self) -> str:
+        return (
+            f"完全 {self.complete_batches}/{self.batches}バッチ / 部分回収 {self.salvaged}件 / "
+            f"再リクエスト {self.retried}件 / 未分類 {self.unresolved}件（次回再分類）"
+        )
+
+
+async def stream_json_items(
+    groq: GroqClient,
+    prompt: str,
+    *,
+    max_tokens: int,
+    n_items: int,
+    required_fields: tuple[str, ...],
+) -> dict[int, dict]:
+    """プロンプトを送り、JSON配列の要素を {tweet_index: 要素} で返す。
+
+    tweet_index が範囲外・重複、または required_fields が欠けた要素は含めない。
+    HTTPエラーや切断の場合も、それまでに届いた要素は返す。
+    """
+    parser = ArrayItemParser()
+    got: dict[int, dict] = {}
+
+    def accept(items: list) -> None:
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            idx = item.get("tweet_index")
+            if isinstance(idx, str) and idx.isdigit():
+                idx = int(idx)
+            if not isinstance(idx, int) or not 0 <= idx < n_items or idx in got:
+                continue
+            if any(field not in item for field in required_fields):
+                continue
+            got[idx] = {k: v for k, v in item.items() if k != "tweet_index"}
+
+    try:
+        async for delta in groq.stream(prompt, max_tokens=max_tokens):
+            accept(parser.feed(delta))
+    except httpx.HTTPStatusError as e:
+        logger.error(f"HTTP error ({e.response.status_code}): {e}")
+    except httpx.TransportError as e:
+        logger.error(f"Transport error after {len(got)}/{n_items} items: {e}")
+    except Exception as e:
+        logger.error(f"Unexpected error: {e}")
+    accept(parser.close())
+    return got
+
+
+async def classify_in_rounds(
+    tweets: list[dict],
+    classify_batch: Callable[[list[dict]], Awaitable[dict[int, dict]]],
+    pack: Callable[[list[dict]], list[list[dict]]],
+    retry_rounds: int = RETRY_ROUNDS,
+    on_batch: Optional[Callable[[list[dict]], None]] = None,
+) -> tuple[list[dict], SalvageStats]:
+    """tweets を pack で詰めて並列に分類し、返ってこなかったツイートだけを詰め直して再リクエストする。
+
+    classify_batch はバッチ内インデックス → 分類結果（tweet_id 付与済み）を返す。
+    on_batch はバッチが終わるたびにその結果で呼ばれる（チェックポイント書き込み用）。
+    戻り値の結果リストには、分類できたツイートの分だけが入る。
+    """
+    stats = SalvageStats()
+    results: list[dict] = []
+    pending = tweets
+    done = 0
+
+    async def run_batch(batch: list[dict]) -> dict[int, dict]:
+        nonlocal done
+        got = await classify_batch(batch)
+        if on_batch is not None and got:
+            on_batch(list(got.values()))
+        done += len(got)
+        print(f"  [PROGRESS] {done}/{len(tweets)} 完了")
+        return got
+
+    for round_no in range(1 + retry_rounds):
+        if not pending:
+            break
+        if round_no:
+            stats.retried += len(pending)
+            print(f"  [RETRY] 欠けた {len(pending)}件を再リクエスト（{round_no}/{retry_rounds}）")
+        batches = pack(pending)
+        print(f"  [PACK] {batch_summary(batches)}")
+        outcomes = await asyncio.gather(*(run_batch(b) for b in batches))
+
+        pending = []
+        for batch, got in zip(batches, outcomes):
+            stats.batches += 1
+            results.extend(got.values())
+            if len(got) == len(batch):
+                stats.complete_batches += 1
+            else:
+                stats.salvaged += len(got)
+                pending.extend(t for i, t in enumerate(batch) if i not in got)
+
+    stats.unresolved = len(pending)
+    if pending:
+        logger.warning(f"{len(pending)}件は分類できず（保存せず次回の実行で再分類）")
+    return results, stats
@@ -0,0 +1,175 @@
+"""
+llm_cache.py - LLM分類結果の永続キャッシュ（コンテンツアドレス方式）
+
+同じバズツイートが buzz_content_analyzer（多次元分類）/ zeitgeist_detector（ムード分類）/
+saturation_quantifier（キーワード抽出）で何度もGroqに送られ、--force の再実行でも
+同じリクエストが繰り返されていた。
+
+キー = sha256(モデル名, プロンプトテンプレートのバージョン, 正規化したツイート本文)
+  - 正規化: NFKC + 空白の連続を1つに圧縮 + 前後の空白除去
+  - プロンプトを変更したら各呼び出し元の *_PROMPT_VERSION を上げれば旧結果は参照されなくなる
+    （古いエントリはTTLかサイズ上限で自然に消える）
+
+値はLLMが返したツイート1件分の分類結果（JSON）。失敗時のデフォルト値は保存しない。
+
+エビクション:
+  - TTL: 作成から CACHE_TTL_DAYS 日経過したエントリは無効（参照時に無視、close時に削除）
+  - サイズ: CACHE_MAX_ENTRIES 件を超えたら最終参照が古い順に削除
+
+使い方:
+    # GroqClient が LLMCache を開いて持つ（use_cache=False で無効化）
+    async with GroqClient(api_key) as groq:
+        hit = groq.cache_get("buzz-v1", text)
+        ...
+        groq.cache_put("buzz-v1", text, result)
+"""
+
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import time
+import unicodedata
+from pathlib import Path
+from typing import Any, Optional
+
+from paths import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+# --- 定数 ---
+
+CACHE_PATH = DATA_DIR / "llm_cache.db"
+CACHE_TTL_DAYS = 30
+CACHE_MAX_ENTRIES = 50000
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """キャッシュキー用にツイート本文を正規化（全角/半角・改行/空白の揺れを吸収）"""
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFKC", text or "")).strip()
+
+
+def cache_key(model: str, prompt_version: str, text: str) -> str:
+    """(モデル, プロンプトバージョン, 正規化本文) のハッシュ"""
+    payload = "\x1f".join((model, prompt_version, normalize_text(text)))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """SQLiteに保存するLLM結果キャッシュ。プロセス間で共有される（WALモード）"""
+
+    def __init__(
+        self,
+        path: Path = CACHE_PATH,
+        ttl_days: float = CACHE_TTL_DAYS,
+        max_entries: int = CACHE_MAX_ENTRIES,
+    ):
+        self.path = path
+        self.ttl_seconds = ttl_days * 86400
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), timeout=30.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                prompt_version TEXT NOT NULL,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache(last_used_at)"
+        )
+        self._conn.commit()
+
+    def get(self, model: str, prompt_version: str, text: str) -> Optional[Any]:
+        """キャッシュ済みの結果を返す。未登録・期限切れならNone"""
+        key = cache_key(model, prompt_version, text)
+        now = time.time()
+        row = self._conn.execute(
+            "SELECT result, created_at FROM llm_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or now - row[1] > self.ttl_seconds:
+            self.misses += 1
+            return None
+        self._conn.execute(
+            "UPDATE llm_cache SET last_used_at = ? WHERE key = ?", (now, key)
+        )
+        self._conn.commit()
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, model: str, prompt_version: str, text: str, result: Any) -> None:
+        """結果を保存（同じキーは上書き）"""
+        now = time.time()
+        self._conn.execute(
+            """
+            INSERT INTO llm_cache (key, prompt_version, result, created_at, last_used_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET
+                result = excluded.result,
+                created_at = excluded.created_at,
+                last_used_at = excluded.last_used_at
+            """,
+            (
+                cache_key(model, prompt_version, text),
+                prompt_version,
+                json.dumps(result, ensure_ascii=False),
+                now,
+                now,
+            ),
+        )
+        self._conn.commit()
+        self.writes += 1
+
+    def evict(self) -> int:
+        """期限切れ + サイズ上限超過分を削除し、削除件数を返す"""
+        cur = self._conn.execute(
+            "DELETE FROM llm_cache WHERE created_at < ?",
+            (time.time() - self.ttl_seconds,),
+        )
+        removed = cur.rowcount
+        total = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        overflow = total - self.max_entries
+        if overflow > 0:
+            cur = self._conn.execute(
+                """
+                DELETE FROM llm_cache WHERE key IN (
+                    SELECT key FROM llm_cache ORDER BY last_used_at ASC LIMIT ?
+                )
+                """,
+                (overflow,),
+            )
+            removed += cur.rowcount
+        self._conn.commit()
+        if removed:
+            logger.info(f"LLMキャッシュ: {removed}件を削除（TTL/サイズ上限）")
+        return removed
+
+    def close(self) -> None:
+        """エビクションを実行して接続を閉じる"""
+        if self._conn is None:
+            return
+        try:
+            self.evict()
+        finally:
+            self._conn.close()
+            self._conn = None
+
+    def summary(self) -> str:
+        """実行サマリー用の1行表示"""
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups * 100 if lookups else 0.0
+        return f"キャッシュ ヒット{self.hits}件 / ミス{self.misses}件（ヒット率{rate:.0f}%）"
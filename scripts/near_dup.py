@@ -0,0 +1,97 @@
+"""
+near_dup.py - ほぼ同一ツイートのグループ化（文字シングル + MinHash/LSH）
+
+バズツイートにはニュースのコピペ投稿や、同じ発表を少しずつ言い換えた引用が大量に混ざる。
+buzz_content_analyzer / zeitgeist_detector はそれらを1件ずつLLMに送っていた
+（llm_cache は本文が完全一致しないとヒットしない）。
+
+このモジュールは
+  - 本文を正規化（NFKC + casefold、URL・@メンション・空白を除去）して文字 SHINGLE_SIZE-gram の集合にする
+    （日本語は分かち書きせず文字単位で扱う）
+  - MinHash署名（NUM_PERM 個のハッシュ）を LSH_BANDS 個のバンドに分け、同じバケットに入った組だけを候補にする
+  - 候補の組はシングル集合の実際のJaccard係数が DUP_THRESHOLD 以上のときだけ同一グループにする
+グループの代表は入力順で最初の要素。呼び出し元は優先したい順（エンゲージメント順など）に並べて渡す。
+
+使い方:
+    reps = near_duplicate_groups([t["text"] for t in tweets])
+    # reps[i] == i なら代表、それ以外は代表のインデックス
+"""
+
+import random
+import re
+import unicodedata
+import zlib
+
+# --- 定数 ---
+
+SHINGLE_SIZE = 3
+NUM_PERM = 64
+LSH_BANDS = 16  # 1バンド = NUM_PERM / LSH_BANDS 行。候補になる類似度の目安は (1/16)^(1/4) ≒ 0.5
+DUP_THRESHOLD = 0.7
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_rng = random.Random(42)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(NUM_PERM)
+]
+
+_STRIP_RE = re.compile(r"https?://\S+|@\w+|\s+")
+
+
+def _normalize(text: str) -> str:
+    return _STRIP_RE.sub("", unicodedata.normalize("NFKC", text or "").casefold())
+
+
+def shingles(text: str) -> set[int]:
+    """正規化した本文の文字シングル（ハッシュ値の集合）。SHINGLE_SIZE 未満の短文は全体を1つとする"""
+    t = _normalize(text)
+    if len(t) <= SHINGLE_SIZE:
+        return {zlib.crc32(t.encode("utf-8"))} if t else set()
+    return {
+        zlib.crc32(t[i:i + SHINGLE_SIZE].encode("utf-8"))
+        for i in range(len(t) - SHINGLE_SIZE + 1)
+    }
+
+
+def minhash(shingle_set: set[int]) -> tuple[int, ...]:
+    return tuple(
+        min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in shingle_set)
+        for a, b in _PERMUTATIONS
+    )
+
+
+def jaccard(a: set[int], b: set[int]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def near_duplicate_groups(texts: list[str], threshold: float = DUP_THRESHOLD) -> list[int]:
+    """各テキストが属するグループの代表インデックスを返す（代表はグループ内で最小のインデックス）"""
+    sets = [shingles(t) for t in texts]
+    parent = list(range(len(texts)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    rows = NUM_PERM // LSH_BANDS
+    buckets: dict[tuple, list[int]] = {}
+    for i, s in enumerate(sets):
+        if not s:
+            continue
+        sig = minhash(s)
+        for band in range(LSH_BANDS):
+            key = (band, sig[band * rows:(band + 1) * rows])
+            for j in buckets.setdefault(key, []):
+                ri, rj = find(i), find(j)
+                if ri != rj and jaccard(s, sets[j]) >= threshold:
+                    # 小さいインデックス（入力順で先）を根にして代表を安定させる
+                    parent[max(ri, rj)] = min(ri, rj)
+            buckets[key].append(i)
+
+    return [find(i) for i in range(len(texts))]
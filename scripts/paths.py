@@ -0,0 +1,10 @@
+"""
+paths.py - スクリプト間で共有するデータディレクトリ
+
+x_client（tweepy / requests / dotenv に依存）を import せずに参照できるよう、ここだけで定義する。
+SQLiteストアやキャッシュ（eval_store / llm_cache / search_cache など）はここから DATA_DIR を取る。
+"""
+
+from pathlib import Path
+
+DATA_DIR = Path(__file__).parent / "data"
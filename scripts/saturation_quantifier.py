@@ -9,6 +9,18 @@ LLMの推測（first_mover/early/mainstream/late/rehash）を定量データで
   2. twscrapeでキーワード検索し、直近24-72hのツイート件数を計測
   3. 件数 + 時間経過 + キーパーソン出現率から飽和度スコアを算出
 
+  複数ツイートは quantify_saturation でパイプライン実行する: キーワード抽出を
+  KEYWORD_BATCH_SIZE 件ずつ1プロンプトにまとめて行い（tweet_index付きJSON配列で受け取る）、
+  全ツイートの検索を1つの検索キュー（空きアカウント数だけ並列）に流し、
+  Q1/Q2が揃ったツイートから順に結果を確定・書き戻す。
+
+  手順2はまずローカルコーパス（tweet_corpus.py: 各コレクタが集めた直近ツイートの
+  FTS5インデックス）で数える。コーパスが遡及期間をカバーしていない、または
+  Q1のヒットが LOCAL_MIN_MATCHES 件未満のときだけ twscrape で検索する。
+  コーパスはバズ寄り（いいねの多いツイート中心）に偏っているため、件数が少ない
+  トピックほど実数との差が大きい。少数ヒットをそのまま使わないのはそのため。
+  計測結果の source に "local" / "live" を記録する。
+
 使い方（単体テスト）:
   python -X utf8 saturation_quantifier.py                    # 直近のai_newsで計測
   python -X utf8 saturation_quantifier.py --tweet-id <id>    # 特定ツイートで計測
@@ -26,14 +38,13 @@ import logging
 import math
 import os
 import re
-import sqlite3
 import sys
 import argparse
 from dataclasses import dataclass, field
 from pathlib import Path
 from datetime import datetime, timedelta, timezone
 from collections import Counter
-from typing import Any, TypedDict
+from typing import Any, Callable, TypedDict
 
 import httpx
 
@@ -50,10 +61,16 @@ try:
 except ImportError:
     pass
 
-from twscrape import API
-
 from dotenv import load_dotenv
 
+sys.path.insert(0, str(Path(__file__).parent))
+from groq_client import GroqClient
+from twscrape_search import SearchExecutor, SearchJob, SearchResult, check_rate_limit
+from search_cache import SearchCache
+from tweet_corpus import TweetCorpus
+from eval_store import EvaluationStore
+from paths import DATA_DIR
+
 # .env読み込み（パスは環境変数で上書き可能）
 _ENV_PRIMARY = Path(
     os.environ.get(
@@ -78,25 +95,25 @@ ACCOUNTS_DB = Path(
         str(Path.home() / "Documents" / "ai-buzz-extractor-dev" / "accounts.db"),
     )
 )
-DATA_DIR = Path(__file__).parent / "data"
 KEY_PERSONS_PATH = DATA_DIR / "key_persons.json"
-EVAL_PATH = DATA_DIR / "content_evaluations.json"
-
-GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
-GROQ_MODEL = "llama-3.3-70b-versatile"
-BACKOFF_SCHEDULE = [5, 15, 30, 60]
 
 JST = timezone(timedelta(hours=9))
 
 # twscrape検索の上限（飽和度計測用: 件数カウントが目的なので少なめ）
 SATURATION_QUERY_LIMIT = 50
 
-# クエリ間待機秒数（レート制限対策）
-QUERY_DELAY = 2.0
+# 同一アカウントでの連続検索の最小間隔（秒）。Q1/Q2はアカウント数だけ並列実行される
+ACCOUNT_PACE_SECONDS = 2.0
 
 # キーワード抽出時のツイートテキスト最大文字数
 TWEET_TEXT_MAX_CHARS = 500
 
+# キーワード抽出の1リクエストあたりのツイート数と、1ツイートあたりの出力トークン見積もり
+KEYWORD_BATCH_SIZE = 5
+KEYWORD_TOKENS_PER_TWEET = 150
+# バッチ内で欠落・不正だったツイートを再バッチする回数（超えたら1件ずつ抽出）
+KEYWORD_BATCH_RETRY_ROUNDS = 1
+
 # --- スコア算出用の定数 ---
 
 # 件数シグナルの正規化基準値（log1p(COUNT_SIGNAL_MAX)が1.0に対応）
@@ -145,6 +162,9 @@ def _setup_logger() -> None:
         logger.setLevel(logging.INFO)
 
 
+# ローカルコーパスの結果を採用する最小ヒット件数（Q1）。未満なら twscrape で検索する
+LOCAL_MIN_MATCHES = 10
+
 # === 検索コンテキスト（_run_search_query / _process_search_tweet の引数集約） ===
 
 @dataclass
@@ -172,6 +192,7 @@ class MeasurementResult(TypedDict):
     saturation_score: float
     suggested_level: str
     confidence: float
+    source: str  # "local"（ローカルコーパス）/ "live"（twscrape）/ ""（計測失敗）
 
 
 class MeasurementError(MeasurementResult):
@@ -207,6 +228,8 @@ QuantifyResult = QuantifyResultNormal | QuantifyResultDryRun | QuantifyResultErr
 
 
 # キーワード抽出プロンプト
+# 変更したら KEYWORD_PROMPT_VERSION を上げる（llm_cache のキーに含まれ、旧結果が無効になる）
+KEYWORD_PROMPT_VERSION = "keywords-v1"
 KEYWORD_EXTRACTION_PROMPT = """\
 あなたはX(Twitter)のニュース分析の専門家です。
 以下のツイートからニュースの「トピック」を特定し、
@@ -237,54 +260,44 @@ X検索用のキーワードを生成してください。
 }}
 ```"""
 
-# LLMレスポンスからJSONブロックを抽出する正規表現
-_JSON_BLOCK_RE = re.compile(r"```(?:json)?\s*(.*?)\s*```", re.DOTALL)
-
-
-# === レート制限チェック（buzz_tweet_extractor.pyと同じロジック） ===
-
-def check_rate_limit() -> tuple[bool, str | None]:
-    """accounts.dbからtwscrapeのレート制限状態を事前確認する。
-
-    Note:
-        同期的にSQLiteへアクセスする。async関数内から呼ぶ場合、
-        イベントループをブロックするが、SQLiteの単一SELECTは
-        ミリ秒単位で完了するため実用上問題ない。
-        並行度が高い環境ではasyncio.to_thread()でラップすること。
-    """
-    conn = None
-    try:
-        conn = sqlite3.connect(str(ACCOUNTS_DB))
-        cursor = conn.cursor()
-        cursor.execute("SELECT locks FROM accounts LIMIT 1")
-        row = cursor.fetchone()
-
-        if not row or not row[0]:
-            return True, None
+# 複数ツイートを1リクエストで処理するバッチ版（ルールは単体版と同じ）
+KEYWORD_BATCH_PROMPT_VERSION = "keywords-batch-v1"
+KEYWORD_BATCH_PROMPT = """\
+あなたはX(Twitter)のニュース分析の専門家です。
+以下の各ツイートからニュースの「トピック」を特定し、
+X検索用のキーワードをツイートごとに生成してください。
 
-        locks = json.loads(row[0])
-        search_lock = locks.get("SearchTimeline")
+## ルール
+- ツイートが言及している**具体的なニュース・発表・リリース**を特定する
+- **primary_keywordは「そのニュース固有」の2-4語フレーズにする（1語の固有名詞だけでは不可）**
+  - 悪い例: "Codex"（一般的すぎる。Codex全般のツイートが全てヒットしてしまう）
+  - 良い例: "Codex コードレビュー"（この記事固有のトピック）
+  - 悪い例: "Claude Code"（常時流通するワード）
+  - 良い例: "Claude Code Klaus"（この話題固有の組み合わせ）
+- secondary_keywordsも同様に特定性の高いフレーズにする
+- 一般的すぎる単語（「AI」「すごい」「ツール」等）は単独で使わない
+- 日本語と英語の混合フレーズも可
 
-        if not search_lock:
-            return True, None
+## 入力ツイート
 
-        lock_time_utc = datetime.strptime(
-            search_lock, "%Y-%m-%d %H:%M:%S"
-        ).replace(tzinfo=timezone.utc)
-        lock_time_jst = lock_time_utc.astimezone(JST)
-        now = datetime.now(JST)
+{tweets_block}
+## 出力形式
+全ツイート分のJSON配列のみを返してください（説明不要）。各要素に tweet_index（0始まり）を含めてください。
 
-        if now >= lock_time_jst:
-            return True, None
-        else:
-            return False, lock_time_jst.strftime("%H:%M:%S")
+```json
+[
+  {{
+    "tweet_index": 0,
+    "topic": "トピックの簡潔な説明（日本語）",
+    "primary_keyword": "そのニュース固有の2-4語フレーズ（X検索用）",
+    "secondary_keywords": ["補助フレーズ1", "補助フレーズ2"],
+    "news_date_estimate": "推定発表日（YYYY-MM-DD or unknown）"
+  }}
+]
+```"""
 
-    except Exception as e:
-        logger.warning("accounts.db読み込みエラー: %s", e)
-        return True, None
-    finally:
-        if conn:
-            conn.close()
+# LLMレスポンスからJSONブロックを抽出する正規表現
+_JSON_BLOCK_RE = re.compile(r"```(?:json)?\s*(.*?)\s*```", re.DOTALL)
 
 
 # === キーパーソンDB読み込み ===
@@ -327,39 +340,22 @@ def _extract_json_from_llm(content: str) -> dict | None:
 # === Groq API共通呼び出し ===
 
 async def _call_groq_completion(
-    client: httpx.AsyncClient,
-    api_key: str,
+    groq: GroqClient,
     prompt: str,
     temperature: float = 0.1,
 ) -> str | None:
     """Groq APIにリクエストを送信し、レスポンスのテキスト部分を返す。
 
+    429のリトライとRPM/TPMのペース配分は GroqClient の共有レートリミッタが行う。
+
     Returns:
         成功時: LLMレスポンスのcontent文字列
-        失敗時: None
+        失敗時: None（choicesが空）
     Raises:
-        httpx.HTTPStatusError: HTTP 429等のエラー（呼び出し元でハンドリング）
+        httpx.HTTPStatusError: 429リトライ上限到達・その他HTTPエラー（呼び出し元でハンドリング）
     """
-    response = await client.post(
-        GROQ_API_URL,
-        headers={
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json",
-        },
-        json={
-            "model": GROQ_MODEL,
-            "messages": [{"role": "user", "content": prompt}],
-            "temperature": temperature,
-            "max_tokens": 300,
-        },
-    )
-    response.raise_for_status()
-    result = response.json()
-    choices = result.get("choices")
-    if not choices:
-        logger.warning("Groq APIが空のchoicesを返しました")
-        return None
-    return choices[0]["message"]["content"].strip()
+    content = await groq.complete(prompt, max_tokens=300, temperature=temperature)
+    return content or None
 
 
 # === Groqでキーワード抽出 ===
@@ -367,26 +363,29 @@ async def _call_groq_completion(
 async def extract_topic_keywords(
     tweet_text: str,
     api_key: str,
-    http_client: httpx.AsyncClient | None = None,
+    groq: GroqClient | None = None,
 ) -> dict | None:
     """ツイートテキストからニューストピックのキーワードを抽出する。
 
     リトライ戦略:
-        外側ループ(3回): HTTP 429/タイムアウト/接続エラーのリトライ。
+        外側ループ(3回): タイムアウト/接続エラー/JSONパース失敗のリトライ。
         各attempt内でJSONパース失敗時はtemperatureを上げて1回だけ再試行する。
         パース失敗2回（temperature=0.1 + 0.3）で次のattemptへ進む。
-
-        注意: HTTPリトライとパースリトライはattemptカウンタを共有する。
-        JSONパース失敗でattemptが消費されるため、HTTP 429の実質リトライ回数が
-        減る場合がある（両方が同時に起きるケースは極めて稀）。
+        HTTP 429 は GroqClient 内でリトライ済みのため、ここに届いた時点で諦める。
     """
-    prompt = KEYWORD_EXTRACTION_PROMPT.format(
-        tweet_text=tweet_text[:TWEET_TEXT_MAX_CHARS]
-    )
+    cache_text = tweet_text[:TWEET_TEXT_MAX_CHARS]
+    prompt = KEYWORD_EXTRACTION_PROMPT.format(tweet_text=cache_text)
 
-    # 外部からクライアントを受け取れるように（接続プール再利用）
-    own_client = http_client is None
-    client = http_client or httpx.AsyncClient(timeout=30.0)
+    # 外部からクライアントを受け取れるように（接続プール・レートリミッタ共有）
+    own_client = groq is None
+    client = groq or GroqClient(api_key, timeout=30.0)
+
+    # 同じ本文の抽出結果がキャッシュにあればAPIを呼ばない
+    cached = client.cache_get(KEYWORD_PROMPT_VERSION, cache_text)
+    if cached is not None:
+        if own_client:
+            await client.close()
+        return cached
 
     # JSONパース用のtemperature段階: 低温→高温の順で試す
     temperatures = [0.1, 0.3]
@@ -396,12 +395,13 @@ async def extract_topic_keywords(
             try:
                 # 各attemptでtemperature段階を順に試す
                 for temp in temperatures:
-                    content = await _call_groq_completion(client, api_key, prompt, temperature=temp)
+                    content = await _call_groq_completion(client, prompt, temperature=temp)
                     if content is None:
                         return None
 
                     parsed = _extract_json_from_llm(content)
                     if parsed is not None:
+                        client.cache_put(KEYWORD_PROMPT_VERSION, cache_text, parsed)
                         return parsed
 
                     if temp < temperatures[-1]:
@@ -410,7 +410,7 @@ async def extract_topic_keywords(
                             temp, temperatures[temperatures.index(temp) + 1], attempt + 1,
                         )
 
-                # 全temperatureでパース失敗 → 次のattemptへ（HTTP/接続リトライと統合）
+                # 全temperatureでパース失敗 → 次のattemptへ（接続リトライと統合）
                 logger.warning(
                     "全temperature(%s)でJSONパース失敗 (attempt %d/%d)",
                     temperatures, attempt + 1, 3,
@@ -418,11 +418,6 @@ async def extract_topic_keywords(
                 continue
 
             except httpx.HTTPStatusError as e:
-                if e.response.status_code == 429:
-                    wait = BACKOFF_SCHEDULE[min(attempt, len(BACKOFF_SCHEDULE) - 1)]
-                    logger.warning("Rate limited, %d秒待機...", wait)
-                    await asyncio.sleep(wait)
-                    continue
                 logger.error("HTTP error: %d", e.response.status_code)
                 return None
             except (json.JSONDecodeError, KeyError) as e:
@@ -442,7 +437,104 @@ async def extract_topic_keywords(
         return None
     finally:
         if own_client:
-            await client.aclose()
+            await client.close()
+
+
+async def extract_topic_keywords_batch(
+    tweet_texts: list[str],
+    api_key: str,
+    groq: GroqClient,
+    batch_size: int = KEYWORD_BATCH_SIZE,
+) -> list[dict | None]:
+    """複数ツイートのキーワードを batch_size 件ずつ1プロンプトで抽出する（入力と同じ順序）。
+
+    返ってこなかった・不正だったツイートだけを再バッチし、それでも残ったものは
+    extract_topic_keywords で1件ずつ抽出する。抽出できなかったツイートは None。
+    """
+    texts = [t[:TWEET_TEXT_MAX_CHARS] for t in tweet_texts]
+    results: list[dict | None] = [None] * len(texts)
+
+    # 同じ本文の抽出結果がキャッシュにあればAPIに送らない
+    pending = []
+    for i, text in enumerate(texts):
+        cached = groq.cache_get(KEYWORD_BATCH_PROMPT_VERSION, text)
+        if cached is not None:
+            results[i] = cached
+        else:
+            pending.append(i)
+
+    for round_no in range(1 + KEYWORD_BATCH_RETRY_ROUNDS):
+        if not pending or batch_size <= 1:
+            break
+        chunks = [pending[i : i + batch_size] for i in range(0, len(pending), batch_size)]
+        chunk_results = await asyncio.gather(
+            *(_extract_keywords_chunk(groq, [texts[i] for i in chunk]) for chunk in chunks)
+        )
+        for chunk, got in zip(chunks, chunk_results):
+            for local_idx, parsed in got.items():
+                results[chunk[local_idx]] = parsed
+
+        missing = [i for i in pending if results[i] is None]
+        logger.info(
+            "キーワード抽出 バッチ%d回目: %d/%d件（%dリクエスト）",
+            round_no + 1, len(pending) - len(missing), len(pending), len(chunks),
+        )
+        pending = missing
+
+    # 再バッチでも埋まらなかったツイートは1件ずつ抽出
+    if pending:
+        if batch_size > 1:
+            logger.warning("バッチ出力に欠けた%d件を1件ずつ抽出", len(pending))
+        singles = await asyncio.gather(*(
+            extract_topic_keywords(texts[i], api_key, groq=groq) for i in pending
+        ))
+        for i, parsed in zip(pending, singles):
+            results[i] = parsed
+
+    return results
+
+
+async def _extract_keywords_chunk(groq: GroqClient, texts: list[str]) -> dict[int, dict]:
+    """1プロンプトで複数ツイートのキーワードを抽出する。
+
+    Returns:
+        {チャンク内index: 抽出結果}。indexが範囲外・重複、primary_keyword が空の要素は含めない
+        （呼び出し元で再キュー）
+    """
+    tweets_block = "".join(f"### ツイート {i}\n{text}\n\n" for i, text in enumerate(texts))
+    prompt = KEYWORD_BATCH_PROMPT.format(tweets_block=tweets_block)
+
+    try:
+        content = await groq.complete(
+            prompt, max_tokens=KEYWORD_TOKENS_PER_TWEET * len(texts) + 50, temperature=0.1
+        )
+    except httpx.HTTPStatusError as e:
+        logger.error("キーワード抽出(バッチ) HTTP error: %d", e.response.status_code)
+        return {}
+    except (httpx.TimeoutException, httpx.ConnectError) as e:
+        logger.warning("キーワード抽出(バッチ) 接続エラー: %s: %s", type(e).__name__, e)
+        return {}
+
+    parsed = _extract_json_from_llm(content or "")
+    if not isinstance(parsed, list):
+        logger.warning("キーワード抽出(バッチ) JSONパース失敗: %s", (content or "")[:200])
+        return {}
+
+    got: dict[int, dict] = {}
+    for item in parsed:
+        if not isinstance(item, dict):
+            continue
+        idx = item.get("tweet_index")
+        if isinstance(idx, str) and idx.isdigit():
+            idx = int(idx)
+        if not isinstance(idx, int) or not 0 <= idx < len(texts) or idx in got:
+            continue
+        if not isinstance(item.get("primary_keyword"), str) or not item["primary_keyword"].strip():
+            continue
+        result = {k: v for k, v in item.items() if k != "tweet_index"}
+        groq.cache_put(KEYWORD_BATCH_PROMPT_VERSION, texts[idx], result)
+        got[idx] = result
+    return got
 
 
 # === ツイート処理ヘルパー（Q1/Q2共通） ===
@@ -488,33 +580,22 @@ def _process_search_tweet(tweet, ctx: SearchContext) -> bool:
     return True
 
 
-# === twscrapeで1クエリ実行 ===
+# === twscrape検索結果の取り込み ===
 
-async def _run_search_query(api: API, query: str, ctx: SearchContext) -> int:
-    """twscrapeで1つの検索クエリを実行し、新規追加件数を返す。
+def _apply_search_result(result: SearchResult, ctx: SearchContext) -> int:
+    """1クエリ分の検索結果をctxに取り込み、新規追加件数を返す。
 
-    レート制限検出時は -1 を返す。
+    レート制限検出時（アカウント枯渇によるスキップ含む）は -1 を返す。
     """
     added = 0
-    try:
-        async for tweet in api.search(query, limit=SATURATION_QUERY_LIMIT):
-            if _process_search_tweet(tweet, ctx):
-                added += 1
-    except httpx.HTTPStatusError as e:
-        if e.response.status_code == 429:
-            logger.warning("レート制限検出（HTTP 429）")
-            return -1
-        logger.error("検索エラー（HTTP %d）: %s", e.response.status_code, e)
-    except Exception as e:
-        # twscrape内部で発生する非HTTPのレート制限エラーはHTTPStatusErrorではなく
-        # 独自のException/Errorで送出されることがある。具体的な例外クラスが
-        # twscrapeのpublic APIで公開されていないため、str(e)のパターンマッチで検出する。
-        # ⚠ twscrapeのバージョンアップでエラーメッセージ形式が変わると検出漏れの可能性あり。
-        err_str = str(e).lower()
-        if "429" in err_str or "rate" in err_str:
-            logger.warning("レート制限検出")
-            return -1
-        logger.error("検索エラー: %s", e)
+    for tweet in result.tweets:
+        if _process_search_tweet(tweet, ctx):
+            added += 1
+    if result.rate_limited or result.skipped:
+        logger.warning("レート制限検出（%s）", result.label)
+        return -1
+    if result.error:
+        logger.error("検索エラー（%s）: %s", result.label, result.error)
     return added
 
 
@@ -546,84 +627,73 @@ def _aggregate_tweet_stats(
 
 # === twscrapeで飽和度計測 ===
 
-async def measure_saturation(
+def _build_search_jobs(
     primary_keyword: str,
     secondary_keywords: list[str],
-    key_persons: dict[str, dict[str, Any]],
-    lookback_hours: int = 72,
-    api: API | None = None,
-) -> MeasurementResult | MeasurementError:
-    """twscrapeでトピックの飽和度を実測する。
-
-    Args:
-        primary_keyword: メインの検索キーワード（最も特定性が高い）
-        secondary_keywords: 補助キーワードのリスト。レート制限対策として
-            先頭の1つだけを検索に使用する。
-        key_persons: username→情報のマップ（load_key_persons()の戻り値）
-        lookback_hours: 遡及する時間数（デフォルト72h）
-        api: twscrape APIインスタンス。未指定時は内部生成する。
-             複数回呼び出す場合は外部で生成して渡すと効率的。
-
-    Returns:
-        MeasurementResult: 正常計測結果（11フィールド）
-        MeasurementError: エラー時（MeasurementResult + errorキー）
-
-    Note:
-        戻り値はdictリテラルであり、TypedDictクラスのインスタンスではない。
-        正常/エラーの判定は ``"error" in result`` で行うこと（isinstance不可）。
-    """
-    # レート制限チェック
-    available, next_time = check_rate_limit()
-    if not available:
-        logger.warning("twscrapeレート制限中（解除: %s）", next_time)
-        return _empty_result("rate_limited")
-
-    if api is None:
-        api = API(str(ACCOUNTS_DB))
-
-    now = datetime.now(JST)
+    now: datetime,
+    lookback_hours: int,
+    label_prefix: str = "",
+) -> list[SearchJob]:
+    """1トピック分の検索ジョブ（Q1: メインキーワード、Q2: 補助キーワード）を組み立てる"""
     since = (now - timedelta(hours=lookback_hours)).strftime("%Y-%m-%d")
     until = (now + timedelta(days=1)).strftime("%Y-%m-%d")
 
-    ctx = SearchContext(
-        key_persons=key_persons,
-        cutoff_dt=now - timedelta(hours=lookback_hours),
-    )
-
     # --- Q1: メインキーワード（最も特定性が高い） ---
     primary_query = (
         f'{primary_keyword} -filter:retweets lang:ja '
         f"since:{since} until:{until}"
     )
-    logger.info("  Q1: %s", primary_query)
-
-    q1_result = await _run_search_query(api, primary_query, ctx)
-    if q1_result == -1:
-        return _empty_result("rate_limited_during_search")
-
-    primary_count = len(ctx.all_tweets)
-    logger.info("  Q1結果: %d件", primary_count)
-
-    await asyncio.sleep(QUERY_DELAY)
+    logger.info("  %sQ1: %s", label_prefix, primary_query)
+    jobs = [SearchJob(label=f"{label_prefix}Q1", query=primary_query, limit=SATURATION_QUERY_LIMIT)]
 
     # --- Q2: 補助キーワード ---
     # secondary_keywordsは複数存在しうるが、レート制限を考慮して最も特定性の高い
     # 先頭1つだけを検索する（LLMが特定性順に並べて返す前提）。
     # 全件検索すると1ツイートあたりのAPI呼び出しが増え、レート制限に達しやすくなる。
-    secondary_count = 0
     if secondary_keywords:
         sec_kw = secondary_keywords[0]
         secondary_query = (
             f'{sec_kw} -filter:retweets lang:ja '
             f"since:{since} until:{until}"
         )
-        logger.info("  Q2: %s", secondary_query)
+        logger.info("  %sQ2: %s", label_prefix, secondary_query)
+        jobs.append(SearchJob(
+            label=f"{label_prefix}Q2", query=secondary_query, limit=SATURATION_QUERY_LIMIT,
+        ))
+    return jobs
+
+
+def _measurement_from_results(
+    primary_keyword: str,
+    search_results: list[SearchResult],
+    key_persons: dict[str, dict[str, Any]],
+    now: datetime,
+    lookback_hours: int,
+    source: str = "live",
+) -> MeasurementResult | MeasurementError:
+    """Q1/Q2の検索結果から計測結果を組み立てる（取り込みはQ1→Q2の順: primary_countの意味を維持）"""
+    ctx = SearchContext(
+        key_persons=key_persons,
+        cutoff_dt=now - timedelta(hours=lookback_hours),
+    )
+
+    q1_result = _apply_search_result(search_results[0], ctx)
+    if q1_result == -1:
+        return _empty_result("rate_limited_during_search")
 
-        q2_result = await _run_search_query(api, secondary_query, ctx)
+    primary_count = len(ctx.all_tweets)
+    logger.info("  %s結果: %d件", search_results[0].label, primary_count)
+
+    secondary_count = 0
+    if len(search_results) > 1:
+        q2_result = _apply_search_result(search_results[1], ctx)
         if q2_result >= 0:
             secondary_count = q2_result
 
-    logger.info("  Q2結果: +%d件（合計: %d件）", secondary_count, len(ctx.all_tweets))
+        logger.info(
+            "  %s結果: +%d件（合計: %d件）",
+            search_results[1].label, secondary_count, len(ctx.all_tweets),
+        )
 
     # --- 統計集計 + スコア算出 ---
     total_count = len(ctx.all_tweets)
@@ -651,9 +721,97 @@ async def measure_saturation(
         "saturation_score": round(saturation_score, 3),
         "suggested_level": suggested_level,
         "confidence": round(confidence, 2),
+        "source": source,
     }
 
 
+def _local_measurement(
+    corpus: TweetCorpus,
+    primary_keyword: str,
+    secondary_keywords: list[str],
+    key_persons: dict[str, dict[str, Any]],
+    now: datetime,
+    lookback_hours: int,
+) -> MeasurementResult | None:
+    """ローカルコーパスで計測する。カバー範囲外・ヒット不足なら None（twscrapeで検索する）"""
+    cutoff = now - timedelta(hours=lookback_hours)
+    if not corpus.covers(cutoff):
+        return None
+    q1 = corpus.search(primary_keyword, cutoff, limit=SATURATION_QUERY_LIMIT)
+    if len(q1) < LOCAL_MIN_MATCHES:
+        logger.info("  Q1(local): %d件 < %d → twscrapeで検索", len(q1), LOCAL_MIN_MATCHES)
+        return None
+    search_results = [SearchResult(label="Q1(local)", query=primary_keyword, tweets=q1)]
+    if secondary_keywords:
+        sec_kw = secondary_keywords[0]
+        search_results.append(SearchResult(
+            label="Q2(local)", query=sec_kw,
+            tweets=corpus.search(sec_kw, cutoff, limit=SATURATION_QUERY_LIMIT),
+        ))
+    return _measurement_from_results(
+        primary_keyword, search_results, key_persons, now, lookback_hours, source="local",
+    )
+
+
+async def measure_saturation(
+    primary_keyword: str,
+    secondary_keywords: list[str],
+    key_persons: dict[str, dict[str, Any]],
+    lookback_hours: int = 72,
+    executor: SearchExecutor | None = None,
+    corpus: TweetCorpus | None = None,
+) -> MeasurementResult | MeasurementError:
+    """twscrapeでトピックの飽和度を実測する。
+
+    Args:
+        primary_keyword: メインの検索キーワード（最も特定性が高い）
+        secondary_keywords: 補助キーワードのリスト。レート制限対策として
+            先頭の1つだけを検索に使用する。
+        key_persons: username→情報のマップ（load_key_persons()の戻り値）
+        lookback_hours: 遡及する時間数（デフォルト72h）
+        executor: twscrape検索エグゼキュータ。未指定時は内部生成する。
+             複数回呼び出す場合は外部で生成して渡すと、アカウント単位の
+             ペース配分が呼び出しをまたいで維持される。
+        corpus: ローカルコーパス。指定時はまずコーパスで数え、足りなければ twscrape で検索する。
+
+    Returns:
+        MeasurementResult: 正常計測結果（12フィールド）
+        MeasurementError: エラー時（MeasurementResult + errorキー）
+
+    Note:
+        戻り値はdictリテラルであり、TypedDictクラスのインスタンスではない。
+        正常/エラーの判定は ``"error" in result`` で行うこと（isinstance不可）。
+        複数ツイートをまとめて計測する場合は quantify_saturation（パイプライン実行）を使う。
+    """
+    now = datetime.now(JST)
+    if corpus is not None:
+        local = _local_measurement(
+            corpus, primary_keyword, secondary_keywords, key_persons, now, lookback_hours,
+        )
+        if local is not None:
+            return local
+
+    # レート制限チェック
+    available, next_time = check_rate_limit(ACCOUNTS_DB)
+    if not available:
+        logger.warning("twscrapeレート制限中（解除: %s）", next_time)
+        return _empty_result("rate_limited")
+
+    if executor is None:
+        executor = SearchExecutor(ACCOUNTS_DB, pace_seconds=ACCOUNT_PACE_SECONDS)
+
+    jobs = _build_search_jobs(primary_keyword, secondary_keywords, now, lookback_hours)
+
+    # Q1/Q2は空きアカウントがあれば並列実行
+    search_results = await executor.run(jobs)
+    if corpus is not None:
+        for result in search_results:
+            corpus.add_tweets(result.tweets, source="saturation")
+    return _measurement_from_results(
+        primary_keyword, search_results, key_persons, now, lookback_hours,
+    )
+
+
 def _calculate_saturation(
     total_count: int,
     kp_count: int,
@@ -722,26 +880,18 @@ def _empty_result(reason: str) -> MeasurementError:
         "saturation_score": -1.0,
         "suggested_level": "unknown",
         "confidence": 0.0,
+        "source": "",
         "error": reason,
     }
 
 
-# === 対象ツイート取得（content_evaluations.jsonからai_newsを抽出） ===
+# === 対象ツイート取得（評価ストアからai_newsを抽出） ===
 
 def get_ai_news_tweets(limit: int = 5, tweet_id: str | None = None) -> list[dict]:
-    """content_evaluations.jsonからai_newsツイートを取得する。
+    """評価ストア（content_evaluations）からai_newsツイートを取得する。
 
-    tweet_detailsからテキスト情報も結合する。
-    JSONファイル全体をメモリに読み込むため、データ件数が数百件程度を
-    前提としている。1000件超の規模になる場合はSQLite等への移行を検討。
+    content_typeインデックスでai_newsだけを読み、tweet_detailsからテキスト情報を結合する。
     """
-    if not EVAL_PATH.exists():
-        logger.error("content_evaluations.json が見つかりません")
-        return []
-
-    eval_data = json.loads(EVAL_PATH.read_text(encoding="utf-8"))
-    evaluations = eval_data.get("evaluations", {})
-
     # tweet_details.jsonからテキスト情報を取得
     details_path = DATA_DIR / "tweet_details.json"
     text_map: dict[str, str] = {}
@@ -750,9 +900,16 @@ def get_ai_news_tweets(limit: int = 5, tweet_id: str | None = None) -> list[dict
         for t in details.get("tweets", []):
             text_map[t["id"]] = t.get("text", "")
 
+    with EvaluationStore("content") as store:
+        # 特定ツイート指定
+        if tweet_id:
+            ev = store.get(tweet_id)
+        else:
+            # ai_newsのみ、最新順（evaluated_at降順）
+            ai_news_evals = store.query(content_type="ai_news", newest_first=True)
+
     # 特定ツイート指定
     if tweet_id:
-        ev = evaluations.get(tweet_id)
         if ev and ev.get("content_type") == "ai_news":
             return [{
                 "id": tweet_id,
@@ -762,22 +919,21 @@ def get_ai_news_tweets(limit: int = 5, tweet_id: str | None = None) -> list[dict
         logger.warning("tweet_id=%s はai_newsではないか見つかりません", tweet_id)
         return []
 
-    # ai_newsのみ抽出、最新順（evaluated_at降順）
+    # テキストがあるものだけ上位N件（evaluated_at降順はクエリ側で保証）
     ai_news = []
-    for tid, ev in evaluations.items():
-        if ev.get("content_type") == "ai_news":
-            text = text_map.get(tid, "")
-            if text:
-                ai_news.append({
-                    "id": tid,
-                    "text": text,
-                    "news_saturation_llm": ev.get("news_saturation", "n/a"),
-                    "evaluated_at": ev.get("evaluated_at", ""),
-                })
-
-    # 最新順ソート → 上位N件
-    ai_news.sort(key=lambda x: x.get("evaluated_at", ""), reverse=True)
-    return ai_news[:limit]
+    for ev in ai_news_evals:
+        tid = ev["tweet_id"]
+        text = text_map.get(tid, "")
+        if text:
+            ai_news.append({
+                "id": tid,
+                "text": text,
+                "news_saturation_llm": ev.get("news_saturation", "n/a"),
+                "evaluated_at": ev.get("evaluated_at", ""),
+            })
+            if len(ai_news) >= limit:
+                break
+    return ai_news
 
 
 # === メイン ===
@@ -786,11 +942,22 @@ async def quantify_saturation(
     tweets: list[dict],
     api_key: str,
     dry_run: bool = False,
+    on_result: Callable[[QuantifyResult], None] | None = None,
+    lookback_hours: int = 72,
 ) -> list[QuantifyResult]:
-    """ai_newsツイートの飽和度を定量計測する。
+    """ai_newsツイートの飽和度を定量計測する（パイプライン実行）。
+
+    1. 全ツイートのキーワード抽出をまとめて実行（GroqClientの共有レートリミッタの範囲で並列）
+    2. ローカルコーパスで数えられるツイートはその場で確定（_local_measurement）
+    3. 残りのQ1/Q2検索を1つの検索キューに投入（空きアカウント数だけ並列。
+       SearchTimelineロック中のアカウントは使わない）
+    4. ツイートごとにQ1/Q2が揃った時点で計測結果を確定し、on_result で書き戻す
+
+    Args:
+        on_result: 各ツイートの結果が確定するたびに呼ばれるコールバック（確定順）
 
     Returns:
-        各ツイートの計測結果リスト。要素は以下のいずれか:
+        各ツイートの計測結果リスト（入力順）。要素は以下のいずれか:
         - QuantifyResultNormal: 通常計測結果（measurement + match_status）
         - QuantifyResultDryRun: dry-run時（keywords + llm_level + dry_run=True）
         - QuantifyResultError: キーワード抽出失敗時（error文字列のみ）
@@ -798,28 +965,59 @@ async def quantify_saturation(
     key_persons = load_key_persons()
     logger.info("キーパーソンDB: %d名ロード済み", len(key_persons))
 
-    results = []
+    results: list[QuantifyResult | None] = [None] * len(tweets)
+
+    def finish(i: int, result: QuantifyResult) -> None:
+        results[i] = result
+        if on_result is not None:
+            on_result(result)
+
+    def finish_measurement(i: int, measurement: MeasurementResult | MeasurementError) -> None:
+        tweet, keywords = tweets[i], all_keywords[i]
+        # LLM判定との比較
+        llm_level = tweet.get("news_saturation_llm", "n/a")
+        quant_level = measurement["suggested_level"]
+        match_status = "MATCH" if llm_level == quant_level else "DIFF"
+
+        logger.info(
+            "  %s... 計測結果(%s): %d件 → %s (score=%.3f) / KP言及: %d名 / LLM=%s vs 実測=%s [%s]",
+            tweet["id"][:12], measurement["source"] or "-", measurement["total_count"], quant_level,
+            measurement["saturation_score"], measurement["key_person_count"],
+            llm_level, quant_level, match_status,
+        )
+        finish(i, {
+            "tweet_id": tweet["id"],
+            "keywords": keywords,
+            "llm_level": llm_level,
+            "measurement": measurement,
+            "match_status": match_status,
+        })
+
+    # Step 1: キーワード抽出（KEYWORD_BATCH_SIZE 件ずつ1プロンプトにまとめる）
+    async with GroqClient(api_key, timeout=30.0) as groq:
+        all_keywords = await extract_topic_keywords_batch(
+            [tweet["text"] for tweet in tweets], api_key, groq
+        )
+        logger.info("キーワード抽出: %d件（%s）", len(tweets), groq.summary())
 
-    # twscrape APIインスタンスをループ全体で共有（接続再利用）
-    tw_api = API(str(ACCOUNTS_DB))
+    with TweetCorpus() as corpus:
+        if not dry_run:
+            synced = corpus.sync_from_buzz_db()
+            pruned = corpus.prune()
+            logger.info("ローカルコーパス: ai_buzz.db から%d件取り込み / 期限切れ%d件削除", synced, pruned)
 
-    # httpxクライアントをループ全体で共有（接続プール再利用）
-    async with httpx.AsyncClient(timeout=30.0) as http_client:
-        for i, tweet in enumerate(tweets):
+        now = datetime.now(JST)
+        jobs: list[SearchJob] = []
+        job_owner: list[int] = []  # ジョブ → ツイートのインデックス
+        local_count = 0
+        for i, (tweet, keywords) in enumerate(zip(tweets, all_keywords)):
             logger.info("[%d/%d] %s...", i + 1, len(tweets), tweet["id"][:12])
             preview = tweet["text"][:80].replace("\n", " ")
             logger.info("  テキスト: %s...", preview)
 
-            # Step 1: キーワード抽出
-            keywords = await extract_topic_keywords(
-                tweet["text"], api_key, http_client=http_client
-            )
             if not keywords:
                 logger.warning("  キーワード抽出失敗 → スキップ")
-                results.append({
-                    "tweet_id": tweet["id"],
-                    "error": "keyword_extraction_failed",
-                })
+                finish(i, {"tweet_id": tweet["id"], "error": "keyword_extraction_failed"})
                 continue
 
             logger.info("  トピック: %s", keywords.get("topic", "?"))
@@ -828,7 +1026,7 @@ async def quantify_saturation(
             logger.info("  LLM判定: %s", tweet.get("news_saturation_llm", "?"))
 
             if dry_run:
-                results.append({
+                finish(i, {
                     "tweet_id": tweet["id"],
                     "keywords": keywords,
                     "llm_level": tweet.get("news_saturation_llm", "?"),
@@ -836,37 +1034,63 @@ async def quantify_saturation(
                 })
                 continue
 
-            # Step 2: twscrape計測（APIインスタンスを共有）
-            measurement = await measure_saturation(
-                primary_keyword=keywords["primary_keyword"],
-                secondary_keywords=keywords.get("secondary_keywords", []),
-                key_persons=key_persons,
-                api=tw_api,
+            # Step 2: ローカルコーパスで数えられればtwscrapeは使わない
+            local = _local_measurement(
+                corpus, keywords["primary_keyword"], keywords.get("secondary_keywords", []),
+                key_persons, now, lookback_hours,
             )
+            if local is not None:
+                local_count += 1
+                finish_measurement(i, local)
+                continue
 
-            # LLM判定との比較
-            llm_level = tweet.get("news_saturation_llm", "n/a")
-            quant_level = measurement["suggested_level"]
-            match_status = "MATCH" if llm_level == quant_level else "DIFF"
+            for job in _build_search_jobs(
+                keywords["primary_keyword"], keywords.get("secondary_keywords", []),
+                now, lookback_hours, label_prefix=f"{tweet['id'][:12]} ",
+            ):
+                jobs.append(job)
+                job_owner.append(i)
 
+        if not dry_run:
             logger.info(
-                "  計測結果: %d件 → %s (score=%.3f)",
-                measurement["total_count"], quant_level, measurement["saturation_score"],
+                "ローカル計測: %d件 / twscrape検索へ: %d件", local_count, len(set(job_owner)),
             )
-            logger.info("  KP言及: %d名", measurement["key_person_count"])
-            logger.info("  LLM=%s vs 実測=%s [%s]", llm_level, quant_level, match_status)
-
-            results.append({
-                "tweet_id": tweet["id"],
-                "keywords": keywords,
-                "llm_level": llm_level,
-                "measurement": measurement,
-                "match_status": match_status,
-            })
-
-            # ツイート間待機
-            if i < len(tweets) - 1:
-                await asyncio.sleep(QUERY_DELAY)
+        if not jobs:
+            return results
+
+        # Step 3: レート制限チェック（全アカウントがロック中なら検索しない）
+        available, next_time = check_rate_limit(ACCOUNTS_DB)
+        if not available:
+            logger.warning("twscrapeレート制限中（解除: %s）", next_time)
+            for i in dict.fromkeys(job_owner):
+                finish_measurement(i, _empty_result("rate_limited"))
+            return results
+
+        # Step 4: 全検索を1つのキューで実行し、ツイートごとにQ1/Q2が揃ったら確定
+        pending: dict[int, dict[int, SearchResult]] = {}
+        expected = Counter(job_owner)
+
+        def on_search_done(job_idx: int, result: SearchResult) -> None:
+            # 実測した検索結果は次回以降のローカル計測に使う
+            corpus.add_tweets(result.tweets, source="saturation")
+            i = job_owner[job_idx]
+            pending.setdefault(i, {})[job_idx] = result
+            if len(pending[i]) < expected[i]:
+                return
+            # ジョブは Q1, Q2 の順に投入しているので、インデックス順に並べれば Q1→Q2
+            search_results = [r for _, r in sorted(pending.pop(i).items())]
+            finish_measurement(i, _measurement_from_results(
+                all_keywords[i]["primary_keyword"], search_results, key_persons, now, lookback_hours,
+            ))
+
+        cache = SearchCache()
+        executor = SearchExecutor(ACCOUNTS_DB, pace_seconds=ACCOUNT_PACE_SECONDS, cache=cache)
+        logger.info("検索キュー: %d件（%dツイート）", len(jobs), len(expected))
+        try:
+            await executor.run(jobs, on_result=on_search_done)
+        finally:
+            logger.info(cache.summary())
+            cache.close()
 
     return results
 
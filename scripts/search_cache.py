@@ -0,0 +1,317 @@
+"""
+search_cache.py - twscrape検索結果のローカルキャッシュ
+
+saturation_quantifier は同じニュースについての複数ツイートから、ほぼ同じ primary_keyword /
+secondary_keywords を抽出することが多く、そのたびに同じ72時間窓の検索をtwscrapeに投げていた。
+
+このモジュールは検索結果をSQLite（WALモード）に保存し、同じ検索を
+1回の実行内でも実行をまたいでもローカルで返す。
+  - キー = (正規化クエリ, since, until)
+    正規化: 語順は保ち、ダブルクォートのフレーズの外側だけ NFKC + casefold + 空白圧縮
+    （フレーズはそのまま。OR 演算子は小文字にすると通常の語になるので大文字のまま）。
+    OR も括弧もない AND だけのクエリに限り、語順の違い・重複を同一視する。
+    since:/until: はキーの別要素に分離する
+  - ツイート本体は id 単位で1回だけ保存し、クエリ → ツイートID列 を別テーブルに持つ
+  - 鮮度: 取得から SEARCH_CACHE_TTL_HOURS 時間以内の結果だけを使う
+  - limit: キャッシュ時より大きい limit の検索は、キャッシュ時に結果が尽きていた場合のみヒット
+  - ヒット率は summary() で確認、invalidate() / --clear で無効化
+
+キャッシュから返すツイートは twscrape の Tweet と同じ属性名（id / date / user.username /
+rawContent / likeCount ...）を持つ CachedTweet。
+
+使い方:
+    executor = SearchExecutor(ACCOUNTS_DB, cache=SearchCache())
+    python -X utf8 search_cache.py --stats   # 件数・保存期間
+    python -X utf8 search_cache.py --clear   # 全削除
+"""
+
+import argparse
+import json
+import logging
+import re
+import sqlite3
+import time
+import unicodedata
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Optional
+
+from paths import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+# --- 定数 ---
+
+SEARCH_CACHE_PATH = DATA_DIR / "search_cache.db"
+SEARCH_CACHE_TTL_HOURS = 3
+
+# ダブルクォートのフレーズ（閉じていなければ末尾まで）か、空白・クォート以外の連続
+_TOKEN_RE = re.compile(r'"[^"]*"?|[^\s"]+')
+
+
+def _normalize_term(tok: str) -> list[str]:
+    """フレーズ外の語を正規化（NFKCで空白が生じた場合は分割）。OR 演算子は大文字のまま"""
+    if tok == "OR":
+        return [tok]
+    return unicodedata.normalize("NFKC", tok).casefold().split()
+
+
+def query_key(query: str) -> tuple[str, str, str]:
+    """検索クエリを (正規化クエリ, since, until) に分解する"""
+    since = until = ""
+    terms = []
+    for tok in _TOKEN_RE.findall(query):
+        if tok.startswith('"'):
+            terms.append(tok)
+            continue
+        for term in _normalize_term(tok):
+            if term.startswith("since:"):
+                since = term[len("since:"):]
+            elif term.startswith("until:"):
+                until = term[len("until:"):]
+            else:
+                terms.append(term)
+    # AND だけのクエリは語順・重複に意味がないので並べ替える（OR や括弧があれば順序を保つ）
+    if not any(t == "OR" or (not t.startswith('"') and ("(" in t or ")" in t)) for t in terms):
+        terms = sorted(set(terms))
+    return " ".join(terms), since, until
+
+
+@dataclass
+class CachedUser:
+    username: str = ""
+    displayname: str = ""
+
+
+@dataclass
+class CachedTweet:
+    """キャッシュから復元したツイート（twscrape.Tweet の参照される属性のみ）"""
+    id: int
+    date: Optional[datetime]
+    user: Optional[CachedUser]
+    rawContent: str = ""
+    likeCount: int = 0
+    retweetCount: int = 0
+    quoteCount: int = 0
+    replyCount: int = 0
+    url: str = ""
+
+
+def _tweet_payload(tweet) -> dict:
+    user = getattr(tweet, "user", None)
+    date = getattr(tweet, "date", None)
+    return {
+        "date": date.isoformat() if date else None,
+        "username": user.username if user else None,
+        "displayname": getattr(user, "displayname", "") if user else "",
+        "rawContent": getattr(tweet, "rawContent", "") or "",
+        "likeCount": getattr(tweet, "likeCount", 0) or 0,
+        "retweetCount": getattr(tweet, "retweetCount", 0) or 0,
+        "quoteCount": getattr(tweet, "quoteCount", 0) or 0,
+        "replyCount": getattr(tweet, "replyCount", 0) or 0,
+        "url": getattr(tweet, "url", "") or "",
+    }
+
+
+def _tweet_from_payload(tweet_id: int, payload: dict) -> CachedTweet:
+    date = payload.get("date")
+    username = payload.get("username")
+    return CachedTweet(
+        id=tweet_id,
+        date=datetime.fromisoformat(date) if date else None,
+        user=CachedUser(username, payload.get("displayname", "")) if username is not None else None,
+        rawContent=payload.get("rawContent", ""),
+        likeCount=payload.get("likeCount", 0),
+        retweetCount=payload.get("retweetCount", 0),
+        quoteCount=payload.get("quoteCount", 0),
+        replyCount=payload.get("replyCount", 0),
+        url=payload.get("url", ""),
+    )
+
+
+class SearchCache:
+    """twscrape検索結果のSQLiteキャッシュ。プロセス間で共有される（WALモード）"""
+
+    def __init__(self, path: Path = SEARCH_CACHE_PATH, ttl_hours: float = SEARCH_CACHE_TTL_HOURS):
+        self.path = path
+        self.ttl_seconds = ttl_hours * 3600
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), timeout=30.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS queries (
+                query TEXT NOT NULL,
+                since TEXT NOT NULL,
+                until TEXT NOT NULL,
+                fetch_limit INTEGER NOT NULL,
+                result_count INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (query, since, until)
+            );
+            CREATE TABLE IF NOT EXISTS query_tweets (
+                query TEXT NOT NULL,
+                since TEXT NOT NULL,
+                until TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                tweet_id INTEGER NOT NULL,
+                PRIMARY KEY (query, since, until, position)
+            );
+            CREATE INDEX IF NOT EXISTS idx_query_tweets_tweet ON query_tweets(tweet_id);
+            CREATE TABLE IF NOT EXISTS tweets (
+                id INTEGER PRIMARY KEY,
+                payload TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_queries_fetched ON queries(fetched_at);
+            """
+        )
+        self._conn.commit()
+
+    def get(self, query: str, limit: int) -> Optional[list[CachedTweet]]:
+        """有効なキャッシュがあればツイート一覧（検索結果の順）を返す。なければNone"""
+        key = query_key(query)
+        row = self._conn.execute(
+            "SELECT fetch_limit, result_count, fetched_at FROM queries "
+            "WHERE query = ? AND since = ? AND until = ?",
+            key,
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        fetch_limit, result_count, fetched_at = row
+        # 期限切れ / キャッシュ時より多く必要で、かつキャッシュ時に結果が尽きていなかった
+        if time.time() - fetched_at > self.ttl_seconds or (
+            limit > fetch_limit and result_count >= fetch_limit
+        ):
+            self.misses += 1
+            return None
+
+        rows = self._conn.execute(
+            """
+            SELECT t.id, t.payload FROM query_tweets q JOIN tweets t ON t.id = q.tweet_id
+            WHERE q.query = ? AND q.since = ? AND q.until = ?
+            ORDER BY q.position LIMIT ?
+            """,
+            (*key, limit),
+        ).fetchall()
+        self.hits += 1
+        return [_tweet_from_payload(tid, json.loads(payload)) for tid, payload in rows]
+
+    def put(self, query: str, limit: int, tweets: Iterable) -> None:
+        """検索結果を保存（同じキーは上書き。ツイート本体は id 単位で最新に更新）"""
+        key = query_key(query)
+        tweets = list(tweets)
+        now = time.time()
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO tweets (id, payload, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET payload = excluded.payload, "
+                "updated_at = excluded.updated_at",
+                [(t.id, json.dumps(_tweet_payload(t), ensure_ascii=False), now) for t in tweets],
+            )
+            self._conn.execute(
+                "DELETE FROM query_tweets WHERE query = ? AND since = ? AND until = ?", key
+            )
+            self._conn.executemany(
+                "INSERT INTO query_tweets (query, since, until, position, tweet_id) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(*key, pos, t.id) for pos, t in enumerate(tweets)],
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO queries "
+                "(query, since, until, fetch_limit, result_count, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (*key, limit, len(tweets), now),
+            )
+        self.writes += 1
+
+    def invalidate(self, query: Optional[str] = None) -> int:
+        """指定クエリ（省略時は全件）のキャッシュを削除し、削除したクエリ数を返す"""
+        with self._conn:
+            if query is None:
+                cur = self._conn.execute("DELETE FROM queries")
+                self._conn.execute("DELETE FROM query_tweets")
+            else:
+                key = query_key(query)
+                cur = self._conn.execute(
+                    "DELETE FROM queries WHERE query = ? AND since = ? AND until = ?", key
+                )
+                self._conn.execute(
+                    "DELETE FROM query_tweets WHERE query = ? AND since = ? AND until = ?", key
+                )
+            self._delete_orphan_tweets()
+        return cur.rowcount
+
+    def purge_expired(self) -> int:
+        """期限切れのクエリと、どのクエリからも参照されなくなったツイートを削除"""
+        cutoff = time.time() - self.ttl_seconds
+        with self._conn:
+            self._conn.execute(
+                """
+                DELETE FROM query_tweets WHERE (query, since, until) IN (
+                    SELECT query, since, until FROM queries WHERE fetched_at < ?
+                )
+                """,
+                (cutoff,),
+            )
+            cur = self._conn.execute("DELETE FROM queries WHERE fetched_at < ?", (cutoff,))
+            self._delete_orphan_tweets()
+        return cur.rowcount
+
+    def _delete_orphan_tweets(self) -> None:
+        self._conn.execute(
+            "DELETE FROM tweets WHERE id NOT IN (SELECT tweet_id FROM query_tweets)"
+        )
+
+    def summary(self) -> str:
+        total = self.hits + self.misses
+        rate = f"{self.hits / total:.0%}" if total else "-"
+        return f"検索キャッシュ ヒット{self.hits}件 / ミス{self.misses}件（ヒット率{rate}）"
+
+    def close(self) -> None:
+        if self._conn is None:
+            return
+        try:
+            self.purge_expired()
+        except sqlite3.Error as e:
+            logger.warning(f"検索キャッシュの期限切れ削除に失敗: {e}")
+        self._conn.close()
+        self._conn = None
+
+
+# --- CLI ---
+
+def main():
+    parser = argparse.ArgumentParser(description="twscrape検索結果キャッシュ")
+    parser.add_argument("--stats", action="store_true", help="件数を表示")
+    parser.add_argument("--clear", action="store_true", help="全件削除")
+    parser.add_argument("--invalidate", metavar="QUERY", help="指定クエリのキャッシュを削除")
+    args = parser.parse_args()
+
+    cache = SearchCache()
+    try:
+        if args.clear:
+            print(f"[OK] {cache.invalidate()}件のクエリを削除")
+        if args.invalidate:
+            print(f"[OK] {cache.invalidate(args.invalidate)}件のクエリを削除")
+        if args.stats or not (args.clear or args.invalidate):
+            n_queries, oldest = cache._conn.execute(
+                "SELECT COUNT(*), MIN(fetched_at) FROM queries"
+            ).fetchone()
+            n_tweets = cache._conn.execute("SELECT COUNT(*) FROM tweets").fetchone()[0]
+            print(f"クエリ: {n_queries}件 / ツイート: {n_tweets}件")
+            if oldest:
+                print(f"最古の取得: {datetime.fromtimestamp(oldest):%Y-%m-%d %H:%M}")
+    finally:
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -22,7 +22,7 @@ import sys
 import traceback
 from pathlib import Path
 from datetime import datetime, timedelta, timezone
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 # twscrape_patchを先に適用（Twitter JSON解析エラー対策）
 PATCH_PATH = Path(r"C:\Users\Tenormusica\Documents\ai-buzz-extractor-dev\scripts")
@@ -32,7 +32,11 @@ try:
 except ImportError:
     print("[WARNING] twscrape_patch not found - JSON parsing may fail")
 
-from twscrape import API
+
+sys.path.insert(0, str(Path(__file__).parent))
+from twscrape_search import SearchExecutor, SearchJob, check_rate_limit
+from topk import merge_top_k
+from tweet_corpus import add_search_results
 
 # === 設定 ===
 
@@ -54,8 +58,8 @@ MAX_OUTPUT = 50
 # 検索期間（時間）
 SEARCH_RANGE_HOURS = 48
 
-# クエリ間待機秒数（レート制限対策）
-QUERY_DELAY = 2
+# 同一アカウントでの連続検索の最小間隔（秒）。クエリはアカウント数だけ並列実行される
+ACCOUNT_PACE_SECONDS = 2
 
 # JST timezone
 JST = timezone(timedelta(hours=9))
@@ -87,43 +91,6 @@ def log(msg: str, level: str = "INFO"):
     print(f"[{timestamp}] [{level}] {msg}")
 
 
-def check_rate_limit() -> tuple[bool, Optional[str]]:
-    """accounts.dbからtwscrapeのレート制限状態を事前確認"""
-    import sqlite3
-    conn = None
-    try:
-        conn = sqlite3.connect(str(ACCOUNTS_DB))
-        cursor = conn.cursor()
-        cursor.execute("SELECT locks FROM accounts LIMIT 1")
-        row = cursor.fetchone()
-
-        if not row or not row[0]:
-            return True, None
-
-        locks = json.loads(row[0])
-        search_lock = locks.get("SearchTimeline")
-
-        if not search_lock:
-            return True, None
-
-        # locksはUTCで保存 → aware datetimeに変換してJST比較
-        lock_time_utc = datetime.strptime(search_lock, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
-        lock_time_jst = lock_time_utc.astimezone(JST)
-        now = datetime.now(JST)
-
-        if now >= lock_time_jst:
-            return True, None
-        else:
-            return False, lock_time_jst.strftime("%H:%M:%S")
-
-    except Exception as e:
-        log(f"accounts.db読み込みエラー: {e}", "WARNING")
-        return True, None  # エラー時は続行を試みる
-    finally:
-        if conn:
-            conn.close()
-
-
 def calculate_engagement(tweet) -> int:
     """エンゲージメントスコア計算（バズ度重視）
     Score = 引用RT*5 + リプライ*4 + RT*2 + いいね*1
@@ -163,12 +130,12 @@ async def fetch_themed_tweets(
     """テーマ特化クエリでバズツイートを収集し、重複排除してエンゲージメント順でソート"""
 
     # レート制限チェック
-    available, next_time = check_rate_limit()
+    available, next_time = check_rate_limit(ACCOUNTS_DB)
     if not available:
         log(f"twscrapeレート制限中（解除予定: {next_time}）- スキップ", "WARNING")
         return {"tweets": [], "skipped": True, "reason": f"rate_limited until {next_time}"}
 
-    api = API(str(ACCOUNTS_DB))
+    executor = SearchExecutor(ACCOUNTS_DB, pace_seconds=ACCOUNT_PACE_SECONDS)
 
     queries = theme_config["queries"]
 
@@ -179,72 +146,66 @@ async def fetch_themed_tweets(
     since_str = since_date.strftime("%Y-%m-%d")
     until_str = until_date.strftime("%Y-%m-%d")
 
-    all_tweets: Dict[int, Dict] = {}  # tweet_id -> tweet_data（重複排除用）
+    searched: List[Dict] = []  # 全クエリの検索結果（重複排除は merge_top_k でまとめて行う）
     query_stats = []
     total_fetched = 0
 
     min_faves = theme_config["min_faves"]
 
+    # 全クエリを組み立て（dry-runでは検索しない）
+    jobs = []
     for i, q in enumerate(queries):
-        label = q["label"]
-        base_query = q["query"]
         # min_favesはテーマ辞書の値から動的に組み立て（クエリ文字列との二重管理を防止）
-        full_query = f"{base_query} min_faves:{min_faves} -filter:retweets since:{since_str} until:{until_str}"
-
-        log(f"[{i+1}/{len(queries)}] {label}: {full_query}")
+        full_query = f"{q['query']} min_faves:{min_faves} -filter:retweets since:{since_str} until:{until_str}"
+        log(f"[{i+1}/{len(queries)}] {q['label']}: {full_query}")
+        jobs.append(SearchJob(label=q["label"], query=full_query, limit=query_limit))
+
+    if dry_run:
+        log(f"  (dry-run) 検索スキップ")
+        query_stats = [{"label": j.label, "fetched": 0, "errors": 0} for j in jobs]
+        search_results = []
+    else:
+        # 空きアカウント数だけ並列検索（結果は投入順）
+        search_results = await executor.run(jobs)
+        corpus_added = add_search_results(search_results, source="themed")
+        log(f"  ローカルコーパスに{corpus_added}件追加")
+
+    # 投入順に積むので、重複排除の結果は直列実行時と同じ
+    for r in search_results:
+        label = r.label
+        if r.skipped:
+            reason = "全アカウントがレート制限で停止" if r.rate_limited else "空きアカウントなし"
+            log(f"  {label}: {reason} - スキップ", "WARNING")
+            continue
 
         fetched = 0
         errors = 0
-
-        if dry_run:
-            log(f"  (dry-run) スキップ")
-            query_stats.append({"label": label, "fetched": 0, "errors": 0})
-            continue
-
-        try:
-            async for tweet in api.search(full_query, limit=query_limit):
-                try:
-                    tweet_id = tweet.id
-                    if tweet_id in all_tweets:
-                        # 重複: エンゲージメントが高い方を保持
-                        existing_eng = all_tweets[tweet_id]["engagement_score"]
-                        new_eng = calculate_engagement(tweet)
-                        if new_eng > existing_eng:
-                            all_tweets[tweet_id] = _tweet_to_dict(tweet, label, new_eng)
-                        continue
-
-                    eng = calculate_engagement(tweet)
-                    all_tweets[tweet_id] = _tweet_to_dict(tweet, label, eng)
-                    fetched += 1
-
-                except Exception as e:
-                    errors += 1
-                    log(f"  ツイート処理エラー: {e}", "WARNING")
-
-        except Exception as e:
-            error_msg = str(e)
-            if "429" in error_msg or "rate" in error_msg.lower():
-                log(f"  レート制限検出 - 残りクエリスキップ", "WARNING")
-                query_stats.append({"label": label, "fetched": fetched, "errors": errors + 1})
-                break
-            else:
-                log(f"  検索エラー: {e}", "ERROR")
+        for tweet in r.tweets:
+            try:
+                searched.append(_tweet_to_dict(tweet, label, calculate_engagement(tweet)))
+                fetched += 1
+            except Exception as e:
                 errors += 1
+                log(f"  ツイート処理エラー: {e}", "WARNING")
+
+        if r.rate_limited:
+            log(f"  {label}: レート制限検出 - このアカウントのスロットを停止", "WARNING")
+            errors += 1
+        elif r.error:
+            log(f"  {label}: 検索エラー: {r.error}", "ERROR")
+            errors += 1
 
         total_fetched += fetched
-        log(f"  取得: {fetched}件 (エラー: {errors})")
+        log(f"  {label}: 取得 {fetched}件 (エラー: {errors}, {r.elapsed:.1f}s)")
         query_stats.append({"label": label, "fetched": fetched, "errors": errors})
 
-        # クエリ間待機
-        if i < len(queries) - 1:
-            await asyncio.sleep(QUERY_DELAY)
-
-    # エンゲージメント順ソート → 上位MAX_OUTPUT件
-    sorted_tweets = sorted(
-        all_tweets.values(),
-        key=lambda t: t["engagement_score"],
-        reverse=True
-    )[:MAX_OUTPUT]
+    # ID（なければURL）で重複排除してエンゲージメントが高い方を残し、上位MAX_OUTPUT件をヒープで選ぶ
+    sorted_tweets, merge_stats = merge_top_k(
+        [searched], MAX_OUTPUT,
+        score=lambda t: t["engagement_score"],
+        key=lambda t: t["id"] or t.get("url"),
+    )
+    log(f"重複排除: {merge_stats}")
 
     result = {
         "theme": theme_name,
@@ -254,7 +215,7 @@ async def fetch_themed_tweets(
         "search_period": {"since": since_str, "until": until_str},
         "query_count": len(queries),
         "total_fetched": total_fetched,
-        "after_dedup": len(all_tweets),
+        "after_dedup": merge_stats.unique,
         "exported": len(sorted_tweets),
         "query_stats": query_stats,
         "tweets": sorted_tweets,
@@ -0,0 +1,88 @@
+"""
+topk.py - 複数ソースのツイートを重複排除してエンゲージメント上位K件を取り出す
+
+zeitgeist_detector._merge_tweets は両ソースの全ツイートをリストに積み、重複比較のたびに
+_calc_engagement を計算し直したうえで全件ソートして limit 件だけ使っていた。
+buzz_tweet_extractor / themed_buzz_extractor も全件ソートしてから [:MAX_OUTPUT] していた。
+
+merge_top_k() は
+  - キー（URL / ツイートID）で重複排除し、スコアが高い方を残す（同点は先に来た方）
+  - スコアは1件につき1回だけ計算する
+  - 上位K件は heapq.nlargest（サイズKのヒープ）で選ぶ
+  - キーのないツイートは重複判定せずすべて候補に残す
+結果はスコアの降順、同点は最初に現れた順。
+
+使い方:
+    tweets, stats = merge_top_k([main, buzz], limit, score=_calc_engagement, key=lambda t: t.get("url"))
+    logger.info(f"Merged: {stats}")
+"""
+
+import heapq
+from dataclasses import dataclass
+from typing import Callable, Hashable, Iterable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass
+class MergeStats:
+    """merge_top_k の集計"""
+    scanned: int = 0      # 入力の総件数
+    duplicates: int = 0   # 既出キーだった件数
+    replaced: int = 0     # 重複のうち、スコアが高く既存と入れ替えた件数
+    unkeyed: int = 0      # キーなしで重複判定しなかった件数
+    unique: int = 0       # 重複排除後の件数
+    kept: int = 0         # 上位K件として返した件数
+
+    def __str__(self) -> str:
+        return (
+            f"{self.scanned} scanned -> {self.unique} unique "
+            f"({self.duplicates} duplicates, {self.replaced} replaced, {self.unkeyed} unkeyed) "
+            f"-> {self.kept} kept"
+        )
+
+
+def merge_top_k(
+    sources: Iterable[Iterable[T]],
+    k: int,
+    score: Callable[[T], float],
+    key: Callable[[T], Optional[Hashable]],
+) -> tuple[list[T], MergeStats]:
+    """sources を順に走査して重複排除し、score 上位 k 件と集計を返す"""
+    stats = MergeStats()
+    best: dict[Hashable, tuple[float, int, T]] = {}  # key -> (score, 初出順, item)
+    unkeyed: list[tuple[float, int, T]] = []
+    seq = 0
+
+    for source in sources:
+        for item in source:
+            stats.scanned += 1
+            s = score(item)
+            item_key = key(item)
+            if not item_key:
+                unkeyed.append((s, seq, item))
+                seq += 1
+                continue
+            existing = best.get(item_key)
+            if existing is None:
+                best[item_key] = (s, seq, item)
+                seq += 1
+                continue
+            stats.duplicates += 1
+            if s > existing[0]:
+                # 順位の同点判定は最初に現れた位置のまま
+                best[item_key] = (s, existing[1], item)
+                stats.replaced += 1
+
+    stats.unkeyed = len(unkeyed)
+    stats.unique = len(best) + len(unkeyed)
+
+    if k <= 0:
+        return [], stats
+    top = heapq.nlargest(
+        k,
+        [*best.values(), *unkeyed],
+        key=lambda entry: (entry[0], -entry[1]),
+    )
+    stats.kept = len(top)
+    return [item for _, _, item in top], stats
@@ -9,6 +9,21 @@ X Search APIで各トピックの盛り上がり度を計測。
   python -X utf8 trend_detector.py              # 通常実行
   python -X utf8 trend_detector.py --threshold 30  # 閾値を下げて感度UP
   python -X utf8 trend_detector.py --dry-run       # API呼び出しなしでキーワード抽出のみ
+  python -X utf8 trend_detector.py --concurrency 1 # トピック検索を1件ずつ実行
+  python -X utf8 trend_detector.py --heat-mode counts  # 件数エンドポイントで計測
+
+ヒートの計測モード:
+  search（従来）: 各トピックのツイートを max_results 件取得し、その件数とエンゲージメントで算出。
+           件数は取得件数で頭打ちになるので、実質的にサンプルの反応の大きさを見ている
+  counts: GET /2/tweets/counts/recent で直近 COUNT_WINDOW_HOURS 時間の1時間ごとの投稿数を取り、
+           直近 HEAT_RECENT_HOURS 時間の投稿数（volume）と1時間ごとの増減の傾き（velocity）を出す。
+           ツイート本文の取得は volume 上位 SAMPLE_TOP_N トピックだけ（下書き・キーパーソン用）。
+           サンプル未取得のトピックは heat が投稿数のままで閾値と比べられないため、
+           ホット判定・下書きの対象外にし、レポートでもサンプル取得済みの後ろに並べる
+
+トピック検索はスレッドプールで並行実行する（SEARCH_CONCURRENCY 件同時、
+15分あたり SEARCH_QUOTA_PER_WINDOW 回まで）。1件がレート制限待ちで止まっても
+他のトピックは進むので、全体の所要時間はほぼ最も遅い1件の検索時間になる。
 
 コスト: トピック10件 x 検索 = ~$0.50（約75円）
 """
@@ -16,7 +31,9 @@ X Search APIで各トピックの盛り上がり度を計測。
 import sys
 import re
 import json
+import time
 import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from datetime import datetime, timedelta, timezone
 
@@ -26,12 +43,27 @@ sys.path.insert(0, str(Path(__file__).parent))
 # 運用中にニュースメディアが混入したら都度追加する
 MEDIA_USERNAMES = {"WSJJapan"}
 
+# トピック検索の同時実行数
+SEARCH_CONCURRENCY = 10
+# search_recent_tweets の15分枠あたりの上限（契約プランの上限に合わせる）
+SEARCH_QUOTA_PER_WINDOW = 60
+
+# --heat-mode counts の設定
+HEAT_MODES = ("search", "counts")
+COUNT_WINDOW_HOURS = 24
+HEAT_RECENT_HOURS = 6
+# tweets/counts/recent の15分枠あたりの上限（契約プランの上限に合わせる）
+COUNTS_QUOTA_PER_WINDOW = 300
+SAMPLE_TOP_N = 3
+SAMPLE_MAX_RESULTS = 10  # search_recent_tweets の max_results 下限
+
 from x_client import (
     get_x_client, notify_discord, save_to_obsidian,
     today_str, now_str,
     OBSIDIAN_TRENDS, DRAFTS_DIR, FRONTIER_REPORT, DATA_DIR,
-    MY_USER_IDS,
+    MY_USER_IDS, RequestQuota,
 )
+from user_cache import UserCache
 
 
 def extract_topics_from_frontier() -> list[dict]:
@@ -206,6 +238,147 @@ def search_x_for_topic(client, query: str, max_results: int = 3) -> dict:
     }
 
 
+def _slope(values: list[int]) -> float:
+    """等間隔の値列の最小二乗の傾き（1区間あたりの増減）"""
+    n = len(values)
+    if n < 2:
+        return 0.0
+    mean_x = (n - 1) / 2
+    mean_y = sum(values) / n
+    cov = sum((x - mean_x) * (y - mean_y) for x, y in enumerate(values))
+    var = sum((x - mean_x) ** 2 for x in range(n))
+    return cov / var
+
+
+def count_topic_volume(client, query: str) -> dict:
+    """
+    件数エンドポイントでトピックの投稿数を計測する（ツイート本文は取得しない）。
+    返り値は search_x_for_topic と同じキー + volume / velocity / hourly_counts / sampled。
+    heat_score はこの時点では直近 HEAT_RECENT_HOURS 時間の投稿数（エンゲージメント未反映）。
+    sampled=False のままのトピックは heat の尺度が違うのでホット判定に使わない。
+    """
+    search_query = f"{query} lang:ja -is:retweet"
+    x_data = {
+        "tweet_count": 0, "heat_score": 0, "avg_likes": 0, "avg_retweets": 0,
+        "top_tweets": [], "authors": [],
+        "volume": 0, "velocity": 0.0, "hourly_counts": [], "sampled": False,
+    }
+    try:
+        resp = client.get_recent_tweets_count(
+            query=search_query,
+            granularity="hour",
+            start_time=datetime.now(timezone.utc) - timedelta(hours=COUNT_WINDOW_HOURS),
+        )
+    except Exception as e:
+        print(f"[WARN] 件数取得失敗 ({query}): {e}")
+        return x_data
+
+    # data は古い順の1時間ごとのバケット
+    hourly = [b.get("tweet_count", 0) for b in (resp.data or [])]
+    volume = sum(hourly[-HEAT_RECENT_HOURS:])
+    x_data.update({
+        "tweet_count": sum(hourly),
+        "heat_score": volume,
+        "volume": volume,
+        "velocity": round(_slope(hourly), 2),
+        "hourly_counts": hourly,
+    })
+    return x_data
+
+
+def _apply_sample(x_data: dict, sample: dict) -> dict:
+    """
+    件数ベースの計測結果にサンプル検索のエンゲージメント・上位ツイート・authorを反映する。
+    heat_score = 直近の投稿数 x (1 + 平均いいね x 0.5 + 平均RT x 1.0)（search モードと同じ係数）
+    """
+    heat = x_data["volume"] * (1 + sample["avg_likes"] * 0.5 + sample["avg_retweets"] * 1.0)
+    return {
+        **x_data,
+        "heat_score": round(heat, 1),
+        "avg_likes": sample["avg_likes"],
+        "avg_retweets": sample["avg_retweets"],
+        "top_tweets": sample["top_tweets"],
+        "authors": sample["authors"],
+        "sampled": True,
+    }
+
+
+def scan_topics(
+    client, topics: list[dict], concurrency: int = SEARCH_CONCURRENCY,
+    quota: RequestQuota | None = None,
+    measure_topic=None,
+) -> list[dict]:
+    """
+    各トピックの盛り上がりを並行に検索する。完了順に表示し、結果はトピックの順で返す。
+    各結果の latency にトピック単位の検索所要時間（秒）を記録する。
+    measure_topic(client, query) -> x_data を省略すると search_x_for_topic を使う。
+    """
+    quota = quota or RequestQuota(SEARCH_QUOTA_PER_WINDOW)
+    measure_topic = measure_topic or search_x_for_topic
+    results: list[dict | None] = [None] * len(topics)
+
+    def measure(topic: dict) -> tuple[dict, float]:
+        quota.acquire()
+        t0 = time.monotonic()
+        x_data = measure_topic(client, topic["query"])
+        return x_data, time.monotonic() - t0
+
+    t0 = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = {pool.submit(measure, topic): i for i, topic in enumerate(topics)}
+        for future in as_completed(futures):
+            i = futures[future]
+            x_data, latency = future.result()
+            velocity = f", velocity: {x_data['velocity']:+}/h" if "velocity" in x_data else ""
+            print(
+                f"検索完了: {topics[i]['query']} → {x_data['tweet_count']}件, "
+                f"heat: {x_data['heat_score']}{velocity} ({latency:.1f}s)"
+            )
+            results[i] = {"topic": topics[i], "x_data": x_data, "latency": round(latency, 2)}
+
+    elapsed = time.monotonic() - t0
+    serial = sum(r["latency"] for r in results)
+    slowest = max(results, key=lambda r: r["latency"], default=None)
+    if slowest:
+        print(
+            f"[OK] {len(topics)}トピック検索: {elapsed:.1f}s（直列換算 {serial:.1f}s / "
+            f"最遅 {slowest['topic']['query']} {slowest['latency']:.1f}s / 同時{concurrency}件）"
+        )
+    return results
+
+
+def scan_topics_by_counts(
+    client, topics: list[dict], concurrency: int = SEARCH_CONCURRENCY,
+    sample_top_n: int = SAMPLE_TOP_N,
+) -> list[dict]:
+    """
+    --heat-mode counts: 全トピックを件数エンドポイントで計測し、直近の投稿数（同数なら
+    velocity）上位 sample_top_n トピックだけツイートをサンプル取得してエンゲージメントを反映する。
+    """
+    results = scan_topics(
+        client, topics, concurrency,
+        quota=RequestQuota(COUNTS_QUOTA_PER_WINDOW), measure_topic=count_topic_volume,
+    )
+
+    ranked = sorted(
+        (r for r in results if r["x_data"]["volume"] > 0),
+        key=lambda r: (r["x_data"]["volume"], r["x_data"]["velocity"]),
+        reverse=True,
+    )[:sample_top_n]
+    if not ranked:
+        return results
+
+    print(f"\nサンプル取得: 上位{len(ranked)}トピック（{SAMPLE_MAX_RESULTS}件ずつ）")
+    samples = scan_topics(
+        client, [r["topic"] for r in ranked], concurrency,
+        measure_topic=lambda c, q: search_x_for_topic(c, q, max_results=SAMPLE_MAX_RESULTS),
+    )
+    for r, sample in zip(ranked, samples):
+        r["x_data"] = _apply_sample(r["x_data"], sample["x_data"])
+        r["latency"] = round(r["latency"] + sample["latency"], 2)
+    return results
+
+
 def _format_top_tweets(top_tweets: list[dict]) -> str:
     """上位ツイートをMarkdownリストに変換"""
     lines = []
@@ -273,16 +446,22 @@ def generate_trend_report(results: list[dict], top_persons: list[dict] | None =
     date = today_str()
 
     hot = [r for r in results if r["x_data"]["heat_score"] > 0]
-    hot_sorted = sorted(hot, key=lambda r: r["x_data"]["heat_score"], reverse=True)
+    # counts モードのサンプル未取得トピックは heat が投稿数のままなので、取得済みの後ろに並べる
+    hot_sorted = sorted(
+        hot,
+        key=lambda r: (r["x_data"].get("sampled", True), r["x_data"]["heat_score"]),
+        reverse=True,
+    )
 
     rows = []
     for i, r in enumerate(hot_sorted, 1):
         rows.append(
             f"| {i} | {r['topic']['raw'][:40]} | {r['topic']['query']} | "
             f"{r['x_data']['tweet_count']} | {r['x_data']['avg_likes']} | "
-            f"{r['x_data']['heat_score']} |"
+            f"{r['x_data']['heat_score'] if r['x_data'].get('sampled', True) else '-'} | "
+            f"{r.get('latency', '-')} |"
         )
-    table = "\n".join(rows) if rows else "| - | データなし | - | - | - | - |"
+    table = "\n".join(rows) if rows else "| - | データなし | - | - | - | - | - |"
 
     report = f"""# X トレンドレポート - {date}
 
@@ -291,8 +470,8 @@ def generate_trend_report(results: list[dict], top_persons: list[dict] | None =
 
 ## トレンドランキング
 
-| 順位 | トピック | 検索クエリ | 言及数 | 平均like | heat |
-|------|---------|-----------|--------|---------|------|
+| 順位 | トピック | 検索クエリ | 言及数 | 平均like | heat | 検索秒 |
+|------|---------|-----------|--------|---------|------|--------|
 {table}
 
 ## 検出サマリー
@@ -307,7 +486,13 @@ def generate_trend_report(results: list[dict], top_persons: list[dict] | None =
         x = r["x_data"]
         report += f"\n### {t['raw']}\n"
         report += f"- クエリ: `{t['query']}`\n"
-        report += f"- heat: {x['heat_score']} | 言及: {x['tweet_count']}件 | avg like: {x['avg_likes']}\n"
+        heat = x["heat_score"] if x.get("sampled", True) else "-"
+        report += f"- heat: {heat} | 言及: {x['tweet_count']}件 | avg like: {x['avg_likes']}\n"
+        if "velocity" in x:
+            report += (
+                f"- 直近{HEAT_RECENT_HOURS}h: {x['volume']}件 | velocity: {x['velocity']:+}/h"
+                f"{'' if x.get('sampled') else '（サンプル未取得）'}\n"
+            )
         report += f"- 要約: {t['summary']}\n"
         if x["top_tweets"]:
             report += "- 上位ツイート:\n"
@@ -391,13 +576,23 @@ def _gc_key_persons(kp: dict):
         print(f"[GC] {len(to_delete)}件の低エンゲージメントエントリを削除")
 
 
-def update_key_persons(results: list[dict]):
+def update_key_persons(results: list[dict], users: UserCache | None = None):
     """
     検索結果からauthor情報を蓄積。
     各author_idについて、どのトピックで何回登場したか・合計エンゲージメントを記録。
+    users を渡すと、検索結果で username が取れなかったauthorをキャッシュから補う（APIは呼ばない）。
     """
     kp = load_key_persons()
 
+    cached = {}
+    if users is not None:
+        unknown = {
+            a["author_id"]
+            for r in results for a in r["x_data"].get("authors", [])
+            if not a.get("username")
+        }
+        cached = users.get_many(unknown)
+
     for r in results:
         topic_query = r["topic"]["query"]
         for author in r["x_data"].get("authors", []):
@@ -407,6 +602,9 @@ def update_key_persons(results: list[dict]):
             if aid in MY_USER_IDS:
                 continue
 
+            if not author.get("username") and aid in cached:
+                author = {**author, "username": cached[aid]["username"], "name": cached[aid]["name"]}
+
             if aid not in kp["persons"]:
                 kp["persons"][aid] = {
                     "username": author.get("username", ""),
@@ -462,30 +660,34 @@ def get_top_key_persons(kp: dict, limit: int = 5) -> list[dict]:
     return ranked[:limit]
 
 
-def resolve_unknown_usernames(client, kp: dict, persons: list[dict]) -> list[dict]:
+def resolve_unknown_usernames(
+    client, kp: dict, persons: list[dict], users: UserCache,
+) -> list[dict]:
     """
-    TOP Nのキーパーソンでusername未解決のものをAPI経由で解決する。
+    TOP Nのキーパーソンでusername未解決のものを解決する。
+    ユーザーキャッシュにあればそれを使い、残りは get_users で100件ずつまとめて取得する。
     解決したらkey_persons.jsonにも反映して永続化する。
-    コスト: 1件あたり $0.005
+    コスト: 100件あたり1リクエスト（キャッシュヒット分は0）
     """
+    unknown = [p["author_id"] for p in persons if not p.get("username")]
+    if not unknown:
+        return persons
+
+    resolved = users.resolve(client, unknown)
     resolved_count = 0
     for p in persons:
-        if p.get("username"):
-            continue
         aid = p["author_id"]
-        try:
-            user = client.get_user(id=int(aid), user_fields=["username", "name"])
-            if user.data:
-                p["username"] = user.data.username
-                p["name"] = user.data.name
-                # 永続データにも反映
-                if aid in kp["persons"]:
-                    kp["persons"][aid]["username"] = user.data.username
-                    kp["persons"][aid]["name"] = user.data.name
-                resolved_count += 1
-                print(f"  [RESOLVE] {aid} → @{user.data.username}")
-        except Exception as e:
-            print(f"  [WARN] username解決失敗 ({aid}): {e}")
+        if p.get("username") or aid not in resolved:
+            continue
+        info = resolved[aid]
+        p["username"] = info["username"]
+        p["name"] = info["name"]
+        # 永続データにも反映
+        if aid in kp["persons"]:
+            kp["persons"][aid]["username"] = info["username"]
+            kp["persons"][aid]["name"] = info["name"]
+        resolved_count += 1
+        print(f"  [RESOLVE] {aid} → @{info['username']}")
 
     if resolved_count > 0:
         save_key_persons(kp)
@@ -494,14 +696,13 @@ def resolve_unknown_usernames(client, kp: dict, persons: list[dict]) -> list[dic
     return persons
 
 
-def main():
-    parser = argparse.ArgumentParser(description="X トレンド検出 + 下書き生成")
-    parser.add_argument("--threshold", type=float, default=50, help="ホットトレンド判定のヒートスコア閾値（デフォルト: 50）")
-    parser.add_argument("--dry-run", action="store_true", help="API呼び出しなしでキーワード抽出のみ")
-    args = parser.parse_args()
-
+def run(
+    threshold: float = 50, dry_run: bool = False, concurrency: int = SEARCH_CONCURRENCY,
+    heat_mode: str = "search",
+) -> dict | None:
+    """トレンド検出を実行し、更新後のキーパーソンデータを返す（dry-runではNone）"""
     print(f"=== X トレンド検出 ===")
-    print(f"閾値: heat_score > {args.threshold}")
+    print(f"閾値: heat_score > {threshold}")
     print()
 
     # 1. frontier intelligenceからトピック抽出
@@ -514,25 +715,33 @@ def main():
     for t in topics:
         print(f"  - {t['raw'][:50]} → query: \"{t['query']}\"")
 
-    if args.dry_run:
+    if dry_run:
         print("\n[DRY-RUN] API呼び出しスキップ")
-        return
+        return None
 
     # 2. 各トピックのX上での盛り上がりを検索
-    print(f"\n推定コスト: ${len(topics) * 0.005 * 10:.3f}")
+    if heat_mode == "counts":
+        print(
+            f"\n計測: 件数エンドポイント{len(topics)}回 + "
+            f"サンプル検索 上位{min(SAMPLE_TOP_N, len(topics))}トピック x {SAMPLE_MAX_RESULTS}件"
+        )
+    else:
+        print(f"\n推定コスト: ${len(topics) * 0.005 * 10:.3f}")
     print()
 
     client = get_x_client()
-    results = []
-
-    for topic in topics:
-        print(f"検索中: {topic['query']}...", end=" ")
-        x_data = search_x_for_topic(client, topic["query"])
-        print(f"→ {x_data['tweet_count']}件, heat: {x_data['heat_score']}")
-        results.append({"topic": topic, "x_data": x_data})
+    if heat_mode == "counts":
+        results = scan_topics_by_counts(client, topics, concurrency)
+    else:
+        results = scan_topics(client, topics, concurrency)
 
     # 3. ホットトレンド判定
-    hot_topics = [r for r in results if r["x_data"]["heat_score"] >= args.threshold]
+    # counts モードでサンプル未取得のトピックは heat_score が生の投稿数で、
+    # エンゲージメント込みの閾値とは尺度が違うため対象外（本文もないので下書きも作れない）
+    hot_topics = [
+        r for r in results
+        if r["x_data"].get("sampled", True) and r["x_data"]["heat_score"] >= threshold
+    ]
     hot_topics.sort(key=lambda r: r["x_data"]["heat_score"], reverse=True)
 
     print(f"\n=== ホットトレンド: {len(hot_topics)}件 ===")
@@ -551,11 +760,18 @@ def main():
         print(f"  下書き生成: {draft_path.name}")
 
     # 5. キーパーソンデータ蓄積（Feature 3: 副産物方式）
-    kp = update_key_persons(results)
-    top_persons = get_top_key_persons(kp)
+    with UserCache() as users:
+        # 検索の includes で取れたユーザー情報はキャッシュに保存（追加コストなし）
+        users.remember(
+            {"id": a["author_id"], **a}
+            for r in results for a in r["x_data"].get("authors", [])
+        )
+        kp = update_key_persons(results, users)
+        top_persons = get_top_key_persons(kp)
 
-    # 5.1. username未解決のキーパーソンをAPI経由で解決
-    top_persons = resolve_unknown_usernames(client, kp, top_persons)
+        # 5.1. username未解決のキーパーソンをキャッシュ / API一括取得で解決
+        top_persons = resolve_unknown_usernames(client, kp, top_persons, users)
+        print(f"[OK] {users.summary()}")
 
     # 6. Obsidianにトレンドレポート保存
     report = generate_trend_report(results, top_persons)
@@ -574,7 +790,7 @@ def main():
         discord_lines.append(f"\n下書き保存先: x-auto/drafts/")
     else:
         discord_lines.append(
-            f"{len(results)}トピック分析完了。ホットトレンドなし（閾値: {args.threshold}）"
+            f"{len(results)}トピック分析完了。ホットトレンドなし（閾値: {threshold}）"
         )
 
     # キーパーソンTOP3をDiscordにも表示（表示名+関連トピック+特徴タグ付き）
@@ -595,6 +811,17 @@ def main():
     notify_discord("\n".join(discord_lines))
 
     print(f"\n=== 完了 ===")
+    return kp
+
+
+def main():
+    parser = argparse.ArgumentParser(description="X トレンド検出 + 下書き生成")
+    parser.add_argument("--threshold", type=float, default=50, help="ホットトレンド判定のヒートスコア閾値（デフォルト: 50）")
+    parser.add_argument("--dry-run", action="store_true", help="API呼び出しなしでキーワード抽出のみ")
+    parser.add_argument("--concurrency", type=int, default=SEARCH_CONCURRENCY, help=f"トピック検索の同時実行数（デフォルト: {SEARCH_CONCURRENCY}）")
+    parser.add_argument("--heat-mode", choices=HEAT_MODES, default="search", help="ヒートの計測方法（counts: 件数エンドポイント + 上位のみサンプル取得）")
+    args = parser.parse_args()
+    run(args.threshold, args.dry_run, args.concurrency, args.heat_mode)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,386 @@
+"""
+tweet_corpus.py - 収集済みツイートのローカル全文検索インデックス（直近数日分のローリング）
+
+saturation_quantifier は計測のたびにtwscrapeで新規検索していたが、
+buzz_tweet_extractor / themed_buzz_extractor / ai-buzz-extractor の ai_buzz.db が
+直近の日本語AIツイートを既に数千件集めている。
+
+このモジュールはそれらを1つのSQLite（WALモード）に集約し、FTS5（trigramトークナイザ。
+分かち書き不要で日本語の部分一致に使える）で検索できるようにする。
+  - 各コレクタが検索結果を add_search_results() / add_tweets() で追加する（id単位でupsert）
+  - ai_buzz.db は sync_from_buzz_db() で前回の取り込み以降の行だけを取り込む
+  - CORPUS_RETENTION_DAYS より古いツイートは prune() で削除する
+  - 検索語は NFKC + casefold で正規化したテキストに対して照合する。
+    空白区切りの各語を AND で結合（X検索と同じ）。3文字未満の語は trigram で
+    引けないので、tweets.normalized_text に instr() で照合する
+    （FTS5 trigram テーブルへの LIKE は SQLite 3.40 では2文字の日本語がヒットしない）
+
+search() の結果は search_cache.CachedTweet（twscrape.Tweet と同じ属性名）で返すので、
+twscrapeの検索結果と同じ処理に流せる。
+
+使い方:
+    with TweetCorpus() as corpus:
+        corpus.add_tweets(search_result.tweets, source="buzz")
+        tweets = corpus.search("Claude Code Klaus", since=cutoff_dt)
+    python -X utf8 tweet_corpus.py --stats
+    python -X utf8 tweet_corpus.py --self-check   # 検索の照合（2文字の日本語を含む）を確認
+"""
+
+import argparse
+import logging
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+import unicodedata
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Iterable, Optional
+
+from paths import DATA_DIR
+from search_cache import CachedTweet, CachedUser
+
+logger = logging.getLogger(__name__)
+
+# --- 定数 ---
+
+CORPUS_PATH = DATA_DIR / "tweet_corpus.db"
+AI_BUZZ_DB = Path(r"C:\Users\Tenormusica\ai-buzz-extractor\ai_buzz.db")
+
+# コーパスに保持する日数（saturation_quantifier の遡及72hより長く）
+CORPUS_RETENTION_DAYS = 8
+# 最後の追加からこの時間を過ぎたコーパスは古いとみなす（covers() が False）
+CORPUS_FRESH_HOURS = 12
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_TRIGRAM_MIN_CHARS = 3
+
+
+def normalize(text: str) -> str:
+    """検索用の正規化（NFKC + casefold + 空白圧縮）"""
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFKC", text or "")).strip().casefold()
+
+
+def _to_utc_iso(value) -> Optional[str]:
+    """datetime / ISO文字列をUTCのISO文字列にそろえる（タイムゾーンなしはUTC扱い）"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).isoformat()
+
+
+class TweetCorpus:
+    """収集済みツイートのFTS5インデックス"""
+
+    def __init__(self, path: Path = CORPUS_PATH):
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), timeout=30.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS tweets (
+                id INTEGER PRIMARY KEY,
+                created_at TEXT NOT NULL,
+                username TEXT NOT NULL DEFAULT '',
+                text TEXT NOT NULL DEFAULT '',
+                likes INTEGER NOT NULL DEFAULT 0,
+                source TEXT NOT NULL DEFAULT '',
+                added_at REAL NOT NULL,
+                normalized_text TEXT NOT NULL DEFAULT ''
+            );
+            CREATE INDEX IF NOT EXISTS idx_tweets_created ON tweets(created_at);
+            CREATE VIRTUAL TABLE IF NOT EXISTS tweets_fts USING fts5(
+                body, tokenize = 'trigram'
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            """
+        )
+        self._migrate_normalized_text()
+        self._conn.commit()
+
+    def _migrate_normalized_text(self) -> None:
+        """normalized_text 列がない旧DBに列を追加し、既存行の値を埋める"""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(tweets)")}
+        if "normalized_text" in columns:
+            return
+        self._conn.create_function("normalize_text", 1, normalize, deterministic=True)
+        with self._conn:
+            self._conn.execute(
+                "ALTER TABLE tweets ADD COLUMN normalized_text TEXT NOT NULL DEFAULT ''"
+            )
+            self._conn.execute("UPDATE tweets SET normalized_text = normalize_text(text)")
+
+    # --- 追加 ---
+
+    def _upsert(self, rows: list[tuple]) -> int:
+        """rows: (id, created_at_utc, username, text, likes, source)"""
+        if not rows:
+            return 0
+        now = time.time()
+        with self._conn:
+            self._conn.executemany(
+                """
+                INSERT INTO tweets
+                    (id, created_at, username, text, likes, source, added_at, normalized_text)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET likes = MAX(likes, excluded.likes)
+                """,
+                [(*r, now, normalize(r[3])) for r in rows],
+            )
+            # FTS側は id を rowid にして張り替える（本文は変わらないので新規分だけでよいが、
+            # 既存判定を挟むより DELETE + INSERT の方が単純）
+            self._conn.executemany(
+                "DELETE FROM tweets_fts WHERE rowid = ?", [(r[0],) for r in rows]
+            )
+            self._conn.executemany(
+                "INSERT INTO tweets_fts (rowid, body) VALUES (?, ?)",
+                [(r[0], normalize(r[3])) for r in rows],
+            )
+            self._conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('fed_at', ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (str(now),),
+            )
+        return len(rows)
+
+    def add_tweets(self, tweets: Iterable, source: str) -> int:
+        """twscrapeのTweet（または同じ属性を持つオブジェクト）を追加し、件数を返す"""
+        rows = []
+        for t in tweets:
+            created = _to_utc_iso(getattr(t, "date", None))
+            if created is None:
+                continue
+            user = getattr(t, "user", None)
+            rows.append((
+                int(t.id),
+                created,
+                (user.username if user else "") or "",
+                getattr(t, "rawContent", "") or "",
+                getattr(t, "likeCount", 0) or 0,
+                source,
+            ))
+        return self._upsert(rows)
+
+    def sync_from_buzz_db(self, source: Path = AI_BUZZ_DB) -> int:
+        """ai_buzz.db から前回以降の日本語ツイートを取り込み、件数を返す（読み取り専用でATTACH）"""
+        if not source.exists():
+            return 0
+        watermark = self.get_meta("buzz_db_watermark") or ""
+        cutoff = (
+            datetime.now(timezone.utc) - timedelta(days=CORPUS_RETENTION_DAYS)
+        ).strftime("%Y-%m-%d")
+        since = max(watermark, cutoff)
+
+        try:
+            self._conn.execute(
+                "ATTACH DATABASE ? AS src", (f"{source.resolve().as_uri()}?mode=ro",)
+            )
+            try:
+                src_rows = self._conn.execute(
+                    """
+                    SELECT id, created_at, username, text, likes FROM src.tweets
+                    WHERE created_at > ? AND lang = 'ja'
+                    """,
+                    (since,),
+                ).fetchall()
+            finally:
+                self._conn.execute("DETACH DATABASE src")
+        except sqlite3.Error as e:
+            logger.warning(f"ai_buzz.db の取り込みに失敗: {e}")
+            return 0
+
+        rows = []
+        newest = watermark
+        for tid, created_at, username, text, likes in src_rows:
+            newest = max(newest, created_at or "")
+            created = _to_utc_iso(created_at)
+            try:
+                tid = int(tid)
+            except (TypeError, ValueError):
+                continue
+            if created is None:
+                continue
+            rows.append((tid, created, (username or "").lstrip("@"), text or "", likes or 0, "ai_buzz_db"))
+        count = self._upsert(rows)
+        if newest != watermark:
+            self.set_meta("buzz_db_watermark", newest)
+        return count
+
+    def prune(self, retention_days: int = CORPUS_RETENTION_DAYS) -> int:
+        """保持期間より古いツイートを削除し、件数を返す"""
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=retention_days)).isoformat()
+        with self._conn:
+            self._conn.execute(
+                "DELETE FROM tweets_fts WHERE rowid IN "
+                "(SELECT id FROM tweets WHERE created_at < ?)",
+                (cutoff,),
+            )
+            cur = self._conn.execute("DELETE FROM tweets WHERE created_at < ?", (cutoff,))
+        return cur.rowcount
+
+    # --- 検索 ---
+
+    def search(self, query: str, since: datetime, limit: Optional[int] = None) -> list[CachedTweet]:
+        """query の全語を含むツイートを since 以降から新しい順に返す"""
+        terms = [t.strip('"') for t in normalize(query).split(" ") if t.strip('"')]
+        if not terms:
+            return []
+        long_terms = [t for t in terms if len(t) >= _TRIGRAM_MIN_CHARS]
+        short_terms = [t for t in terms if len(t) < _TRIGRAM_MIN_CHARS]
+
+        where = ["t.created_at >= ?"]
+        params: list = [_to_utc_iso(since)]
+        if long_terms:
+            where.append("t.id IN (SELECT rowid FROM tweets_fts WHERE tweets_fts MATCH ?)")
+            params.append(" AND ".join('"' + t.replace('"', '""') + '"' for t in long_terms))
+        for t in short_terms:
+            where.append("instr(t.normalized_text, ?) > 0")
+            params.append(t)
+
+        sql = (
+            "SELECT t.id, t.created_at, t.username, t.text, t.likes FROM tweets t "
+            f"WHERE {' AND '.join(where)} ORDER BY t.created_at DESC"
+        )
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [
+            CachedTweet(
+                id=tid,
+                date=datetime.fromisoformat(created_at),
+                user=CachedUser(username),
+                rawContent=text,
+                likeCount=likes,
+            )
+            for tid, created_at, username, text, likes in self._conn.execute(sql, params)
+        ]
+
+    def coverage(self) -> tuple[Optional[datetime], Optional[float]]:
+        """(保持している最古のツイート時刻, 最後に追加した時刻 epoch秒)"""
+        oldest = self._conn.execute("SELECT MIN(created_at) FROM tweets").fetchone()[0]
+        fed_at = self.get_meta("fed_at")
+        return (
+            datetime.fromisoformat(oldest) if oldest else None,
+            float(fed_at) if fed_at else None,
+        )
+
+    def covers(self, since: datetime, fresh_hours: float = CORPUS_FRESH_HOURS) -> bool:
+        """since 以降を検索するのに十分か（since より前から保持していて、最近も追加がある）"""
+        oldest, fed_at = self.coverage()
+        if oldest is None or fed_at is None:
+            return False
+        if time.time() - fed_at > fresh_hours * 3600:
+            return False
+        return oldest <= since
+
+    # --- メタデータ ---
+
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        with self._conn:
+            self._conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, value),
+            )
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def __enter__(self) -> "TweetCorpus":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+def add_search_results(results: Iterable, source: str, path: Path = CORPUS_PATH) -> int:
+    """コレクタ用: SearchResult の一覧をコーパスに追加する（失敗しても収集処理は止めない）"""
+    try:
+        with TweetCorpus(path) as corpus:
+            return sum(corpus.add_tweets(r.tweets, source) for r in results)
+    except sqlite3.Error as e:
+        logger.warning(f"ローカルコーパスへの追加に失敗: {e}")
+        return 0
+
+
+# --- 動作確認 ---
+
+# (クエリ, ヒットすべきか)。日本語2文字（trigram で引けない語）を必ず含める
+_SELF_CHECK_CASES = [
+    ("gpt5 発表", True),
+    ("すご", True),
+    ("ＧＰＴ５ 速さ", True),
+    ("発表 claude", False),
+    ("遅い", False),
+]
+
+
+def self_check() -> bool:
+    """一時DBにサンプルを入れて search() の照合を確認する（3文字未満の日本語を含む）"""
+    now = datetime.now(timezone.utc)
+    sample = CachedTweet(
+        id=1, date=now, user=CachedUser("sample"), rawContent="GPT5を発表、すごい速さ"
+    )
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        with TweetCorpus(Path(tmp) / "corpus.db") as corpus:
+            corpus.add_tweets([sample], source="self_check")
+            for query, expected in _SELF_CHECK_CASES:
+                hit = bool(corpus.search(query, now - timedelta(hours=1)))
+                status = "OK" if hit == expected else "NG"
+                ok = ok and hit == expected
+                print(f"[{status}] {query!r}: hit={hit}（期待値 {expected}）")
+    return ok
+
+
+# --- CLI ---
+
+def main():
+    parser = argparse.ArgumentParser(description="収集済みツイートの全文検索インデックス")
+    parser.add_argument("--sync", action="store_true", help="ai_buzz.db から差分を取り込む")
+    parser.add_argument("--search", metavar="QUERY", help="直近72hを検索して件数を表示")
+    parser.add_argument("--stats", action="store_true", help="件数・範囲を表示")
+    parser.add_argument("--self-check", action="store_true",
+                        help="一時DBで検索の照合（2文字の日本語を含む）を確認")
+    args = parser.parse_args()
+
+    if args.self_check:
+        sys.exit(0 if self_check() else 1)
+
+    with TweetCorpus() as corpus:
+        if args.sync:
+            print(f"[OK] ai_buzz.db から {corpus.sync_from_buzz_db()}件取り込み")
+            print(f"[OK] 期限切れ {corpus.prune()}件削除")
+        if args.search:
+            since = datetime.now(timezone.utc) - timedelta(hours=72)
+            hits = corpus.search(args.search, since)
+            print(f"[INFO] {args.search!r}: {len(hits)}件（直近72h, covers={corpus.covers(since)}）")
+            for t in hits[:10]:
+                print(f"  {t.date:%m-%d %H:%M} @{t.user.username}: {t.rawContent[:60]!r}")
+        if args.stats or not (args.sync or args.search):
+            count = corpus._conn.execute("SELECT COUNT(*) FROM tweets").fetchone()[0]
+            oldest, fed_at = corpus.coverage()
+            print(f"ツイート: {count}件 / 最古: {oldest} / 最終追加: "
+                  f"{datetime.fromtimestamp(fed_at) if fed_at else '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+"""
+twscrape_search.py - 複数アカウント並列のtwscrape検索エグゼキュータ
+
+buzz_tweet_extractor / themed_buzz_extractor / saturation_quantifier は、
+1つの API オブジェクトで検索クエリを直列に実行し、クエリ間に QUERY_DELAY の固定sleepを
+入れていた。レート制限チェックも accounts.db の先頭1アカウント（LIMIT 1）しか見ていなかった。
+
+このモジュールは accounts.db の全アカウントを読み、SearchTimeline ロックが空いている
+アカウント数だけ検索を同時実行する。
+  - twscrape は1検索（ページング全体）につき空きアカウントを1つ確保して使うため、
+    同時実行数 = 空きアカウント数 にすると各検索が別アカウントに割り当たる
+  - 同時実行の各スロットは前の検索完了から pace_seconds 空けて次の検索を開始する
+    （アカウント単位のペース配分。スロットの状態は run() をまたいで保持）
+  - 1アカウントがレート制限に当たったらそのスロットだけ停止し、残りのクエリは
+    他のスロットで続行する（全スロット停止時のみ残りをスキップ）
+
+cache（search_cache.SearchCache）を渡すと、キャッシュ済みの検索はtwscrapeに投げずに返し、
+同じ実行内の同一検索（正規化後のキーが同じ）は1回だけ実行して結果を共有する。
+stop_at_id 付きの差分検索はキャッシュしない。
+
+結果はクエリの投入順で返すので、呼び出し側の重複排除（同一IDはエンゲージメントが
+高い方を保持）は直列実行時と同じ結果になる。
+
+使い方:
+    executor = SearchExecutor(ACCOUNTS_DB)
+    results = await executor.run([SearchJob("AI全般", "AI min_faves:500 lang:ja", 50)])
+    for r in results:
+        for tweet in r.tweets:
+            ...
+"""
+
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from contextlib import aclosing
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Optional
+
+import httpx
+from twscrape import API
+
+from search_cache import SearchCache, query_key
+
+logger = logging.getLogger(__name__)
+
+# --- 定数 ---
+
+JST = timezone(timedelta(hours=9))
+
+# 同一スロット（≒同一アカウント）で連続検索する際の最小間隔（秒）
+ACCOUNT_PACE_SECONDS = 2.0
+
+# ツイートIDの同時並列lookup数（TweetDetailキュー。SearchTimelineとは別枠）
+LOOKUP_CONCURRENCY = 4
+
+# Snowflake ID のエポック（2010-11-04T01:42:54.657Z, ミリ秒）
+_SNOWFLAKE_EPOCH_MS = 1288834974657
+
+# accounts.db の locks は "YYYY-MM-DD HH:MM:SS"（UTC）で保存されている
+_LOCK_FORMAT = "%Y-%m-%d %H:%M:%S"
+SEARCH_QUEUE = "SearchTimeline"
+
+
+@dataclass
+class SearchJob:
+    """1検索クエリ分の投入単位
+
+    stop_at_id を指定すると、そのID以下（＝それより古い）ツイートに到達した時点で
+    ページングを打ち切る（twscrapeの検索は新しい順）。
+    """
+    label: str
+    query: str
+    limit: int
+    stop_at_id: Optional[int] = None
+
+
+@dataclass
+class SearchResult:
+    """1検索クエリ分の結果（tweetsはtwscrapeのTweetオブジェクト）"""
+    label: str
+    query: str
+    tweets: list = field(default_factory=list)
+    error: Optional[str] = None
+    rate_limited: bool = False
+    skipped: bool = False
+    # stop_at_id に到達してページングを打ち切ったか
+    reached_stop: bool = False
+    elapsed: float = 0.0
+
+
+def snowflake_from_datetime(dt: datetime) -> int:
+    """指定時刻に投稿されたツイートの最小IDを返す（since_id / 打ち切り判定用）"""
+    ms = int(dt.timestamp() * 1000)
+    return max(0, ms - _SNOWFLAKE_EPOCH_MS) << 22
+
+
+# --- accounts.db のロック状態 ---
+
+def _parse_lock(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, _LOCK_FORMAT).replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+
+def read_search_locks(accounts_db: Path) -> dict[str, Optional[datetime]]:
+    """有効な全アカウントの SearchTimeline ロック解除時刻（UTC、ロックなしはNone）を返す"""
+    conn = sqlite3.connect(str(accounts_db))
+    try:
+        try:
+            rows = conn.execute("SELECT username, locks FROM accounts WHERE active = 1").fetchall()
+        except sqlite3.OperationalError:
+            # active列のない古いスキーマ
+            rows = conn.execute("SELECT username, locks FROM accounts").fetchall()
+    finally:
+        conn.close()
+
+    locks = {}
+    for username, raw in rows:
+        try:
+            queue_locks = json.loads(raw) if raw else {}
+        except json.JSONDecodeError:
+            queue_locks = {}
+        locks[username] = _parse_lock(queue_locks.get(SEARCH_QUEUE))
+    return locks
+
+
+def free_search_accounts(accounts_db: Path) -> tuple[list[str], Optional[datetime]]:
+    """(SearchTimelineが空いているアカウント, 全ロック中なら最も早い解除時刻JST) を返す"""
+    now = datetime.now(timezone.utc)
+    locks = read_search_locks(accounts_db)
+    free = [u for u, until in locks.items() if until is None or until <= now]
+    if free or not locks:
+        return free, None
+    return free, min(until for until in locks.values() if until).astimezone(JST)
+
+
+def check_rate_limit(accounts_db: Path) -> tuple[bool, Optional[str]]:
+    """accounts.db の全アカウントを見て検索可能かを事前確認する。
+
+    Returns:
+        (1アカウント以上空いているか, 全ロック中なら最も早い解除時刻 "HH:MM:SS")
+        accounts.db が読めない場合は (True, None)（続行を試みる）
+    """
+    try:
+        free, next_unlock = free_search_accounts(accounts_db)
+    except Exception as e:
+        logger.warning(f"accounts.db読み込みエラー: {e}")
+        return True, None
+    if free or next_unlock is None:
+        return True, None
+    return False, next_unlock.strftime("%H:%M:%S")
+
+
+def is_rate_limit_error(e: Exception) -> bool:
+    """twscrape検索の例外がレート制限由来かを判定する。
+
+    twscrape内部のレート制限はHTTPStatusError以外の独自例外で送出されることがあり、
+    具体的な例外クラスがpublic APIで公開されていないため文字列マッチで補完する。
+    """
+    if isinstance(e, httpx.HTTPStatusError):
+        return e.response.status_code == 429
+    err_str = str(e).lower()
+    return "429" in err_str or "rate" in err_str
+
+
+# --- エグゼキュータ ---
+
+class SearchExecutor:
+    """空きアカウント数だけtwscrape検索を並列実行する"""
+
+    def __init__(
+        self,
+        accounts_db: Path,
+        pace_seconds: float = ACCOUNT_PACE_SECONDS,
+        api: Optional[API] = None,
+        cache: Optional[SearchCache] = None,
+    ):
+        self.accounts_db = accounts_db
+        self.pace_seconds = pace_seconds
+        self.api = api or API(str(accounts_db))
+        self.cache = cache
+        # スロットごとの前回検索完了時刻（monotonic秒）
+        self._slot_last_done: list[float] = []
+
+    def _slot_count(self, n_jobs: int) -> int:
+        try:
+            free, _ = free_search_accounts(self.accounts_db)
+            n_free = len(free)
+        except Exception as e:
+            # accounts.db が読めない場合は従来どおり1本で続行を試みる
+            logger.warning(f"accounts.db読み込みエラー: {e}")
+            n_free = 1
+        return min(n_free, n_jobs)
+
+    async def run(
+        self,
+        jobs: list[SearchJob],
+        on_result: Optional[Callable[[int, SearchResult], None]] = None,
+    ) -> list[SearchResult]:
+        """全ジョブを実行し、投入順に結果を返す。
+
+        on_result を指定すると、各ジョブの完了（スキップ含む）ごとに
+        (ジョブのインデックス, 結果) で呼び出す（完了順。全体の終了を待たずに書き戻す用途）。
+        空きアカウントが0の場合は全ジョブを skipped=True で返す。
+        """
+        results = [SearchResult(label=j.label, query=j.query) for j in jobs]
+        if not jobs:
+            return results
+
+        def done(idx: int) -> None:
+            if on_result is None:
+                return
+            try:
+                on_result(idx, results[idx])
+            except Exception as e:
+                # コールバックの失敗で他の検索を止めない
+                logger.error(f"on_result失敗（{jobs[idx].label}）: {e}")
+
+        # キャッシュ済みの検索はその場で返し、同一キーの検索は先頭の1件だけ実行する
+        to_run: list[int] = []
+        followers: dict[int, list[int]] = {}
+        leader_by_key: dict[tuple, int] = {}
+        for i, job in enumerate(jobs):
+            if self.cache is None or job.stop_at_id is not None:
+                to_run.append(i)
+                continue
+            key = (query_key(job.query), job.limit)
+            if key in leader_by_key:
+                # 同じ実行内で同じ検索が先に投入済み: その結果を共有する
+                followers.setdefault(leader_by_key[key], []).append(i)
+                self.cache.hits += 1
+                continue
+            cached = self.cache.get(job.query, job.limit)
+            if cached is not None:
+                results[i].tweets = cached
+                done(i)
+                continue
+            leader_by_key[key] = i
+            to_run.append(i)
+        leaders = set(leader_by_key.values())
+
+        def finish(idx: int) -> None:
+            result = results[idx]
+            if (
+                idx in leaders and not result.error and not result.skipped
+            ):
+                self.cache.put(jobs[idx].query, jobs[idx].limit, result.tweets)
+            done(idx)
+            for f in followers.get(idx, []):
+                r = results[f]
+                r.tweets = list(result.tweets)
+                r.error, r.rate_limited, r.skipped = result.error, result.rate_limited, result.skipped
+                done(f)
+
+        if not to_run:
+            return results
+
+        n_slots = self._slot_count(len(to_run))
+        if n_slots == 0:
+            for i in to_run:
+                results[i].skipped = True
+                results[i].error = "no_free_account"
+                finish(i)
+            return results
+
+        while len(self._slot_last_done) < n_slots:
+            self._slot_last_done.append(0.0)
+
+        queue: asyncio.Queue[int] = asyncio.Queue()
+        for i in to_run:
+            queue.put_nowait(i)
+
+        async def worker(slot: int) -> None:
+            while True:
+                try:
+                    idx = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+
+                wait = self._slot_last_done[slot] + self.pace_seconds - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+
+                job, result = jobs[idx], results[idx]
+                started = time.monotonic()
+                try:
+                    async with aclosing(self.api.search(job.query, limit=job.limit)) as tweets:
+                        async for tweet in tweets:
+                            if job.stop_at_id is not None and tweet.id <= job.stop_at_id:
+                                result.reached_stop = True
+                                break
+                            result.tweets.append(tweet)
+                except Exception as e:
+                    result.error = str(e)
+                    result.rate_limited = is_rate_limit_error(e)
+                finally:
+                    result.elapsed = time.monotonic() - started
+                    self._slot_last_done[slot] = time.monotonic()
+                finish(idx)
+
+                if result.rate_limited:
+                    # このスロットのアカウントは使い切った: 残りは他スロットに任せる
+                    logger.warning(f"レート制限検出（{job.label}）- スロット{slot}を停止")
+                    return
+
+        await asyncio.gather(*(worker(s) for s in range(n_slots)))
+
+        # 全スロットがレート制限で停止して残ったジョブ（未実行だが原因はレート制限）
+        while not queue.empty():
+            idx = queue.get_nowait()
+            results[idx].skipped = True
+            results[idx].rate_limited = True
+            results[idx].error = "rate_limited"
+            finish(idx)
+
+        return results
+
+    async def lookup_tweets(
+        self, tweet_ids: list[int], concurrency: int = LOOKUP_CONCURRENCY
+    ) -> dict[int, object]:
+        """ツイートIDから最新のTweetを取得する（エンゲージメント再取得用）。
+
+        TweetDetail キューを使うので SearchTimeline の検索枠は消費しない。
+        取得できなかったID（削除・非公開・エラー）は結果に含まれない。
+        """
+        sem = asyncio.Semaphore(concurrency)
+        found: dict[int, object] = {}
+
+        async def fetch(tid: int) -> None:
+            async with sem:
+                try:
+                    tweet = await self.api.tweet_details(tid)
+                except Exception as e:
+                    logger.warning(f"tweet_details失敗（{tid}）: {e}")
+                    return
+                if tweet is not None:
+                    found[tid] = tweet
+
+        await asyncio.gather(*(fetch(tid) for tid in tweet_ids))
+        return found
@@ -0,0 +1,209 @@
+"""
+user_cache.py - X API ユーザー情報（id → username / name）の永続キャッシュ + 一括解決
+
+trend_detector.resolve_unknown_usernames は未解決の author_id ごとに client.get_user を
+1回ずつ呼んでいた（1件 = 1リクエスト）。X API v2 の GET /2/users は1回で最大100件の
+id を受け付ける。
+
+このモジュールは
+  - ユーザー情報をSQLite（WALモード）に id 単位で保存する
+  - 検索の includes / liking_users / followers など、別の用途で取れたユーザー情報も
+    remember() で保存する（追加のAPI呼び出しなし）
+  - resolve() は取得から USER_CACHE_MAX_AGE_DAYS 日以内のキャッシュを使い、残りだけを
+    get_users で100件ずつまとめて取得する（100人の解決 = 1リクエスト）
+username は変更されうるので、古いエントリは resolve() のたびに取り直す。
+
+使い方:
+    with UserCache() as users:
+        users.remember(liking_users)
+        info = users.resolve(client, author_ids)   # {id: {"username", "name", ...}}
+    python -X utf8 user_cache.py --stats
+"""
+
+import argparse
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable
+
+from paths import DATA_DIR
+
+# --- 定数 ---
+
+USER_CACHE_PATH = DATA_DIR / "user_cache.db"
+USER_CACHE_MAX_AGE_DAYS = 7
+
+# GET /2/users の ids 上限
+USERS_LOOKUP_MAX = 100
+USER_FIELDS = ["username", "name", "protected", "public_metrics"]
+
+
+def _user_to_dict(user) -> dict:
+    """tweepy.User（または同じキーを持つdict）を保存用のdictにする"""
+    if isinstance(user, dict):
+        return {
+            "id": str(user["id"]),
+            "username": user.get("username", "") or "",
+            "name": user.get("name", "") or "",
+            "protected": bool(user.get("protected", False)),
+            "followers": user.get("followers"),
+        }
+    pm = getattr(user, "public_metrics", None) or {}
+    return {
+        "id": str(user.id),
+        "username": getattr(user, "username", "") or "",
+        "name": getattr(user, "name", "") or "",
+        "protected": bool(getattr(user, "protected", False)),
+        "followers": pm.get("followers_count"),
+    }
+
+
+class UserCache:
+    """id → ユーザー情報のSQLiteキャッシュ。プロセス間で共有される（WALモード）"""
+
+    def __init__(self, path: Path = USER_CACHE_PATH, max_age_days: float = USER_CACHE_MAX_AGE_DAYS):
+        self.path = path
+        self.max_age_seconds = max_age_days * 86400
+        self.hits = 0
+        self.fetched = 0
+        self.api_calls = 0
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), timeout=30.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS users (
+                id TEXT PRIMARY KEY,
+                username TEXT NOT NULL DEFAULT '',
+                name TEXT NOT NULL DEFAULT '',
+                protected INTEGER NOT NULL DEFAULT 0,
+                followers INTEGER,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def remember(self, users: Iterable) -> int:
+        """別の用途で取得済みのユーザー情報を保存し、件数を返す（username のないものは無視）"""
+        rows = [u for u in map(_user_to_dict, users) if u["username"]]
+        if not rows:
+            return 0
+        now = time.time()
+        with self._conn:
+            self._conn.executemany(
+                """
+                INSERT INTO users (id, username, name, protected, followers, updated_at)
+                VALUES (:id, :username, :name, :protected, :followers, :updated_at)
+                ON CONFLICT(id) DO UPDATE SET
+                    username = excluded.username,
+                    name = excluded.name,
+                    protected = excluded.protected,
+                    followers = COALESCE(excluded.followers, users.followers),
+                    updated_at = excluded.updated_at
+                """,
+                [{**u, "updated_at": now} for u in rows],
+            )
+        return len(rows)
+
+    def get_many(self, ids: Iterable[str], fresh_only: bool = True) -> dict[str, dict]:
+        """キャッシュ済みのユーザー情報を返す（APIは呼ばない）"""
+        ids = list(dict.fromkeys(str(i) for i in ids))
+        cutoff = time.time() - self.max_age_seconds if fresh_only else 0
+        found: dict[str, dict] = {}
+        # SQLiteの変数上限を避けるため USERS_LOOKUP_MAX 件ずつ
+        for start in range(0, len(ids), USERS_LOOKUP_MAX):
+            chunk = ids[start:start + USERS_LOOKUP_MAX]
+            placeholders = ",".join("?" * len(chunk))
+            for uid, username, name, protected, followers in self._conn.execute(
+                f"SELECT id, username, name, protected, followers FROM users "
+                f"WHERE id IN ({placeholders}) AND updated_at >= ?",
+                (*chunk, cutoff),
+            ):
+                found[uid] = {
+                    "id": uid,
+                    "username": username,
+                    "name": name,
+                    "protected": bool(protected),
+                    "followers": followers,
+                }
+        return found
+
+    def resolve(self, client, ids: Iterable[str]) -> dict[str, dict]:
+        """ids のユーザー情報を返す。キャッシュにない/古いものは get_users で100件ずつ取得。
+
+        取得できなかった id（削除・凍結アカウントやAPIエラー）は戻り値に含まれない。
+        """
+        ids = list(dict.fromkeys(str(i) for i in ids))
+        found = self.get_many(ids)
+        self.hits += len(found)
+        missing = [uid for uid in ids if uid not in found]
+
+        for start in range(0, len(missing), USERS_LOOKUP_MAX):
+            chunk = missing[start:start + USERS_LOOKUP_MAX]
+            self.api_calls += 1
+            try:
+                resp = client.get_users(ids=[int(uid) for uid in chunk], user_fields=USER_FIELDS)
+            except Exception as e:
+                print(f"  [WARN] ユーザー一括取得失敗 ({len(chunk)}件): {e}")
+                continue
+            users = list(resp.data or [])
+            self.remember(users)
+            for user in users:
+                found[str(user.id)] = _user_to_dict(user)
+            self.fetched += len(users)
+            if len(users) < len(chunk):
+                print(f"  [WARN] {len(chunk) - len(users)}件のユーザーを取得できず（削除・凍結の可能性）")
+
+        return found
+
+    def summary(self) -> str:
+        return (
+            f"ユーザーキャッシュ ヒット{self.hits}件 / API取得{self.fetched}件"
+            f"（get_users {self.api_calls}回）"
+        )
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def __enter__(self) -> "UserCache":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+# --- CLI ---
+
+def main():
+    parser = argparse.ArgumentParser(description="X API ユーザー情報キャッシュ")
+    parser.add_argument("--stats", action="store_true", help="件数を表示")
+    parser.add_argument("--lookup", nargs="+", metavar="USER_ID", help="キャッシュ済みの情報を表示（APIは呼ばない）")
+    args = parser.parse_args()
+
+    with UserCache() as cache:
+        if args.lookup:
+            found = cache.get_many(args.lookup, fresh_only=False)
+            for uid in args.lookup:
+                u = found.get(uid)
+                print(f"  {uid}: @{u['username']} ({u['name']})" if u else f"  {uid}: (未キャッシュ)")
+        if args.stats or not args.lookup:
+            count, oldest = cache._conn.execute(
+                "SELECT COUNT(*), MIN(updated_at) FROM users"
+            ).fetchone()
+            stale = cache._conn.execute(
+                "SELECT COUNT(*) FROM users WHERE updated_at < ?",
+                (time.time() - cache.max_age_seconds,),
+            ).fetchone()[0]
+            print(f"ユーザー: {count}件（うち期限切れ {stale}件）")
+            if oldest:
+                print(f"最古の更新: {datetime.fromtimestamp(oldest):%Y-%m-%d %H:%M}")
+
+
+if __name__ == "__main__":
+    main()
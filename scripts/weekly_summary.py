@@ -8,7 +8,7 @@ LLM APIコールなし、既存データの集約のみ。追加コスト$0。
   - metrics_history.json (日次集計)
   - tweet_details.json (個別ツイート詳細)
   - follower_history.json (フォロワー推移)
-  - content_evaluations.json (LLM 7軸分類)
+  - evaluations.db の content_evaluations (LLM 7軸分類、eval_store.py)
 
 出力:
   - Obsidian: weekly/weekly-summary-YYYY-MM-DD.md
@@ -33,6 +33,7 @@ from x_client import (
     notify_discord, save_to_obsidian, today_str, now_str,
     OBSIDIAN_WEEKLY, DATA_DIR,
 )
+from eval_store import EvaluationStore
 
 logging.basicConfig(
     level=logging.INFO,
@@ -93,13 +94,17 @@ def load_week_data(start: str, end: str) -> dict:
     metrics_raw = _load_json("metrics_history.json")
     tweets_raw = _load_json("tweet_details.json")
     followers_raw = _load_json("follower_history.json")
-    evals_raw = _load_json("content_evaluations.json")
+    tweets = _filter_by_date(tweets_raw.get("tweets", []), start, end)
+
+    # 評価は対象週のツイート分だけ評価ストアから取得
+    with EvaluationStore("content") as store:
+        evaluations = store.get_many(t["id"] for t in tweets if t.get("id"))
 
     return {
         "metrics": _filter_by_date(metrics_raw.get("history", []), start, end),
-        "tweets": _filter_by_date(tweets_raw.get("tweets", []), start, end),
+        "tweets": tweets,
         "followers": _filter_by_date(followers_raw.get("history", []), start, end),
-        "evaluations": evals_raw.get("evaluations", {}),
+        "evaluations": evaluations,
     }
 
 
@@ -1,10 +1,13 @@
 """
 x_client.py - X API + Discord通知の共通モジュール
 
-daily_metrics.py / trend_detector.py から共有で使用する。
+daily_metrics.py / trend_detector.py / collect_likers.py から共有で使用する。
 """
 
 import os
+import threading
+import time
+from collections import deque
 from pathlib import Path
 from datetime import datetime
 
@@ -12,6 +15,8 @@ import tweepy
 import requests
 from dotenv import load_dotenv
 
+from paths import DATA_DIR
+
 # --- 自分のアカウント情報 ---
 # PRIMARY_USER_ID: API操作の主体（collect_likers.py等から参照）
 # MY_USER_IDS: キーパーソン蓄積から除外するためのset
@@ -25,9 +30,11 @@ OBSIDIAN_DAILY = OBSIDIAN_BASE / "daily"
 OBSIDIAN_TRENDS = OBSIDIAN_BASE / "trends"
 OBSIDIAN_WEEKLY = OBSIDIAN_BASE / "weekly"
 DRAFTS_DIR = Path(r"C:\Users\Tenormusica\x-auto\drafts")
-DATA_DIR = Path(r"C:\Users\Tenormusica\x-auto\scripts\data")
 FRONTIER_REPORT = Path(r"D:\antigravity_projects\VaultD\Projects\Monetization\Intelligence\AI_Frontier_Capabilities_Master.md")
 
+# X API のレート制限枠（15分）
+RATE_LIMIT_WINDOW_SECONDS = 15 * 60
+
 # .envを読み込み
 load_dotenv(ENV_PATH)
 
@@ -65,6 +72,30 @@ def get_my_profile(client: tweepy.Client) -> dict:
     }
 
 
+class RequestQuota:
+    """エンドポイントごとの15分枠の呼び出し回数を数え、上限に達したら枠が空くまで待たせる。
+    スレッドプールから並行に呼ぶ場合に使う（スレッドセーフ）"""
+
+    def __init__(self, limit: int, window: float = RATE_LIMIT_WINDOW_SECONDS):
+        self.limit = limit
+        self.window = window
+        self._calls: deque[float] = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._calls and now - self._calls[0] >= self.window:
+                    self._calls.popleft()
+                if len(self._calls) < self.limit:
+                    self._calls.append(now)
+                    return
+                wait = self.window - (now - self._calls[0])
+            print(f"[WARN] レート枠の上限（{self.limit}回/{self.window / 60:.0f}分）: {wait:.0f}秒待機")
+            time.sleep(wait)
+
+
 def notify_discord(message: str) -> bool:
     """Discord Webhookにメッセージ送信。成功でTrue"""
     webhook_url = os.getenv("DISCORD_WEBHOOK_URL")
@@ -8,11 +8,12 @@ ai-buzz-extractor が収集したツイートデータを分析し、
 
 依存:
 - ai-buzz-extractor の ai_buzz.db（SQLite直接クエリ）
-- Groq API (llama-3.3-70b-versatile) - classifier.pyと同じパターン
+- Groq API (llama-3.3-70b-versatile) - groq_client.py の共有クライアント経由
 - x_client.py の共有インフラ（Discord通知・Obsidian保存・パス定数）
 """
 
 import asyncio
+import heapq
 import json
 import logging
 import math
@@ -36,6 +37,12 @@ from x_client import (
     today_str,
     now_str,
 )
+from groq_client import GroqClient
+from eval_store import EvaluationStore
+from buzz_db import BuzzDB
+from json_stream import iter_array_items
+from topk import merge_top_k
+from near_dup import near_duplicate_groups
 
 load_dotenv(Path(r"C:\Users\Tenormusica\x-auto-posting\.env"))
 # GROQ_API_KEYはai-buzz-extractor-devの.envに格納
@@ -52,13 +59,9 @@ logger = logging.getLogger(__name__)
 AI_BUZZ_DB = Path(r"C:\Users\Tenormusica\ai-buzz-extractor\ai_buzz.db")
 AI_BUZZ_JSON = Path(r"C:\Users\Tenormusica\Documents\ai-buzz-extractor\data.json")
 BUZZ_TWEETS_JSON = DATA_DIR / "buzz-tweets-latest.json"  # buzz_tweet_extractor.pyの出力
-BUZZ_EVALS_JSON = DATA_DIR / "buzz_content_evaluations.json"  # buzz_content_analyzer.pyの蓄積
 SNAPSHOT_PATH = DATA_DIR / "zeitgeist-snapshot.json"
 OBSIDIAN_ZEITGEIST = OBSIDIAN_BASE / "zeitgeist"
 
-GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
-GROQ_MODEL = "llama-3.3-70b-versatile"
-
 # ムードカテゴリ定義
 MOOD_CATEGORIES = [
     "excitement",   # 新技術・新リリースへの興奮・期待
@@ -164,17 +167,50 @@ MOOD_ANALYSIS_PROMPT = """あなたはX(Twitter)の日本語AI界隈のムード
 {{"mood": "カテゴリ名", "intensity": 0.0から1.0, "topic_hint": "何についての話か20字以内"}}"""
 
 
-class MoodClassifier:
-    """Groq APIを使ったツイートムード分類器（classifier.pyのパターン横展開）"""
+# --- バッチ版センチメント分析プロンプト（N件を1リクエストで分類） ---
+MOOD_BATCH_PROMPT = """あなたはX(Twitter)の日本語AI界隈のムード分析の専門家です。
+以下の各ツイートを読み、発信者とそれに反応しているコミュニティの感情・スタンスを分類してください。
+
+ムードカテゴリ:
+- excitement: 新技術・新リリースへの興奮・期待・ワクワク感
+- anxiety: AIの進化に対する不安・仕事を奪われる恐怖・将来への懸念
+- fatigue: AI疲れ・情報過多・「もうついていけない」感
+- pragmatic: 実用的な活用報告・淡々とした技術共有・Tips系
+- skepticism: AI過大評価への疑問・「本当に使えるの?」感
+- controversy: 意見が割れてる論争・賛否両論・倫理議論
+- humor: ネタ・ジョーク・AI面白体験
+
+## ツイート一覧
+
+{tweets_block}
+
+## 出力形式
+全ツイート分のJSON配列のみを返してください（説明不要）。各要素に tweet_index（0始まり）を含めてください。
+
+```json
+[
+  {{"tweet_index": 0, "mood": "カテゴリ名", "intensity": 0.0から1.0, "topic_hint": "何についての話か20字以内"}}
+]
+```"""
+
+# 各プロンプトを変更したら上げる（llm_cache のキーに含まれ、旧結果が無効になる）
+MOOD_PROMPT_VERSION = "mood-v1"
+MOOD_BATCH_PROMPT_VERSION = "mood-batch-v1"
 
-    # 429リトライ時の段階的バックオフ（秒）。Retry-Afterヘッダーがない場合に使用
-    BACKOFF_SCHEDULE = [5, 15, 30, 60]
+# 1リクエストあたりのツイート数と、1ツイートあたりの出力トークン見積もり
+MOOD_BATCH_SIZE = 10
+MOOD_TOKENS_PER_TWEET = 60
+# バッチ内で欠落・不正だったツイートを再バッチする回数（超えたら1件ずつ分類）
+MOOD_BATCH_RETRY_ROUNDS = 1
+# バッチ版での1ツイートあたりの最大文字数（プロンプトサイズ管理）
+MOOD_BATCH_TEXT_MAX_CHARS = 500
+
+
+class MoodClassifier:
+    """Groq APIを使ったツイートムード分類器（レート制御は groq_client.GroqClient に委譲）"""
 
     def __init__(self, api_key: Optional[str] = None):
-        self.api_key = api_key or os.getenv("GROQ_API_KEY")
-        if not self.api_key:
-            raise ValueError("GROQ_API_KEY is not set")
-        self.client = httpx.AsyncClient(timeout=30.0)
+        self.groq = GroqClient(api_key, timeout=30.0, max_attempts=5)
         self._closed = False
         self.error_count = 0
         self.total_requests = 0
@@ -183,7 +219,7 @@ class MoodClassifier:
         if self._closed:
             return
         self._closed = True
-        await self.client.aclose()
+        await self.groq.close()
 
     async def __aenter__(self) -> "MoodClassifier":
         return self
@@ -198,7 +234,13 @@ class MoodClassifier:
         Returns:
             {"mood": str, "intensity": float, "topic_hint": str}
         """
+        # 同じ本文の分類結果がキャッシュにあればAPIを呼ばない
+        cached = self.groq.cache_get(MOOD_PROMPT_VERSION, tweet_text)
+        if cached is not None:
+            return dict(cached)
+
         self.total_requests += 1
+        cache_text = tweet_text
 
         # 長すぎるツイートは切り詰め
         if len(tweet_text) > 2000:
@@ -206,76 +248,41 @@ class MoodClassifier:
 
         prompt = MOOD_ANALYSIS_PROMPT.format(tweet_text=tweet_text)
 
-        max_retries = 5
-        for attempt in range(max_retries):
-            try:
-                response = await self.client.post(
-                    GROQ_API_URL,
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json",
-                    },
-                    json={
-                        "model": GROQ_MODEL,
-                        "messages": [{"role": "user", "content": prompt}],
-                        "temperature": 0.1,
-                        "max_tokens": 100,
-                    },
-                )
-                response.raise_for_status()
-
-                result = response.json()
-                content = result["choices"][0]["message"]["content"].strip()
-
-                # JSON部分を抽出（```json ... ``` で囲まれている場合も対応）
-                if "```json" in content:
-                    content = content.split("```json")[1].split("```")[0].strip()
-                elif "```" in content:
-                    content = content.split("```")[1].split("```")[0].strip()
-
-                parsed = json.loads(content)
-                mood = parsed.get("mood", "pragmatic")
-                intensity = float(parsed.get("intensity", 0.5))
-                topic_hint = parsed.get("topic_hint", "")
-
-                # ムード名の正規化
-                if mood.lower() not in MOOD_CATEGORIES:
-                    logger.warning(f"Unknown mood '{mood}', defaulting to 'pragmatic'")
-                    mood = "pragmatic"
-                    intensity = 0.3
-
-                return {"mood": mood.lower(), "intensity": intensity, "topic_hint": topic_hint}
-
-            except httpx.HTTPStatusError as e:
-                if e.response.status_code == 429:
-                    if attempt < max_retries - 1:
-                        # Retry-Afterヘッダー優先、なければ段階的バックオフ
-                        retry_after = e.response.headers.get("retry-after")
-                        if retry_after:
-                            try:
-                                wait_time = float(retry_after) + 1  # 数値秒 + 1秒マージン
-                            except ValueError:
-                                # HTTP-date形式（RFC 7231）の場合はバックオフにフォールバック
-                                logger.warning(f"Non-numeric Retry-After '{retry_after}', using backoff schedule")
-                                wait_time = self.BACKOFF_SCHEDULE[min(attempt, len(self.BACKOFF_SCHEDULE) - 1)]
-                        else:
-                            wait_time = self.BACKOFF_SCHEDULE[min(attempt, len(self.BACKOFF_SCHEDULE) - 1)]
-                        logger.warning(f"Rate limited (429), retrying in {wait_time}s (attempt {attempt + 1}/{max_retries})")
-                        await asyncio.sleep(wait_time)
-                        continue
-                    else:
-                        # 全リトライ消費: 通常エラーと区別するために専用ログ
-                        self.error_count += 1
-                        logger.error(f"Rate limit (429) persists after {max_retries} retries - giving up on this tweet")
-                        break
-                self.error_count += 1
+        try:
+            # 429リトライ（Retry-After優先 + 段階的バックオフ）はGroqClient内で処理
+            content = await self.groq.complete(prompt, max_tokens=100)
+
+            # JSON部分を抽出（```json ... ``` で囲まれている場合も対応）
+            if "```json" in content:
+                content = content.split("```json")[1].split("```")[0].strip()
+            elif "```" in content:
+                content = content.split("```")[1].split("```")[0].strip()
+
+            parsed = json.loads(content)
+            mood = parsed.get("mood", "pragmatic")
+            intensity = float(parsed.get("intensity", 0.5))
+            topic_hint = parsed.get("topic_hint", "")
+
+            # ムード名の正規化（未知カテゴリの代替値はキャッシュしない）
+            if mood.lower() not in MOOD_CATEGORIES:
+                logger.warning(f"Unknown mood '{mood}', defaulting to 'pragmatic'")
+                return {"mood": "pragmatic", "intensity": 0.3, "topic_hint": topic_hint}
+
+            result = {"mood": mood.lower(), "intensity": intensity, "topic_hint": topic_hint}
+            self.groq.cache_put(MOOD_PROMPT_VERSION, cache_text, result)
+            return result
+
+        except httpx.HTTPStatusError as e:
+            self.error_count += 1
+            if e.response.status_code == 429:
+                # 全リトライ消費: 通常エラーと区別するために専用ログ
+                logger.error("Rate limit (429) persists after retries - giving up on this tweet")
+            else:
                 logger.error(f"Mood classification HTTP error ({e.response.status_code}): {e}")
-                break
 
-            except (json.JSONDecodeError, Exception) as e:
-                self.error_count += 1
-                logger.error(f"Mood classification error: {e}")
-                break
+        except (json.JSONDecodeError, Exception) as e:
+            self.error_count += 1
+            logger.error(f"Mood classification error: {e}")
 
         error_rate = self.error_count / self.total_requests if self.total_requests > 0 else 0
         if error_rate > 0.8 and self.total_requests >= 20:
@@ -287,57 +294,194 @@ class MoodClassifier:
         return {"mood": "pragmatic", "intensity": 0.3, "topic_hint": ""}
 
     async def classify_batch(
-        self,
-        tweets: list[dict],
-        batch_size: int = 1,
-        delay: float = 2.5,
+        self, tweets: list[dict], batch_size: int = MOOD_BATCH_SIZE
     ) -> list[dict]:
         """
-        複数ツイートを一括ムード分類（Groq free tier RPM 30対策: シリアル実行 + 2.5秒待機 + 429リトライ）
+        複数ツイートを一括ムード分類
+
+        batch_size件ずつ1プロンプトにまとめて分類する（tweet_index付きJSON配列で受け取る）。
+        返ってこなかった・不正だったツイートだけを再バッチし、それでも残ったものは1件ずつ分類する。
+        RPM/TPMと同時実行数は GroqClient の共有レートリミッタが制御する。
 
-        batch_size=1, delay=2.5 → 24 RPM（Groq無料枠RPM 30以内）。
-        batch_size=3だと実効60 RPMになり429連発するため、シリアル化して確実にRPM内に収める。
+        ほぼ同一のツイート（コピペニュース等）は near_dup.py でグループ化し、代表（入力順で先、
+        つまりエンゲージメント上位）だけを分類して同じ結果を他のツイートに複製する。
 
         Args:
             tweets: [{"text": str, "likes": int, "retweets": int, ...}, ...]
-            batch_size: バッチサイズ（並列実行数、free tierは1推奨）
-            delay: バッチ間の待機時間（秒）
+            batch_size: 1リクエストあたりのツイート数（1以下なら従来どおり1件ずつ）
 
         Returns:
             [{"mood": str, "intensity": float, "topic_hint": str, "tweet": dict}, ...]
+            （入力と同じ順序。aggregate_moods にそのまま渡せる）
         """
-        results = []
+        reps = near_duplicate_groups([self._batch_text(t) for t in tweets])
+        unique = [i for i, r in enumerate(reps) if r == i]
+        if len(unique) < len(tweets):
+            logger.info(
+                f"Near-duplicates: {len(tweets) - len(unique)} tweets share a representative "
+                f"({len(unique)} unique)"
+            )
+        unique_results = await self._classify_unique([tweets[i] for i in unique], batch_size)
+        by_rep = dict(zip(unique, unique_results))
+        return [
+            by_rep[i] if r == i else {**by_rep[r], "tweet": tweets[i]}
+            for i, r in enumerate(reps)
+        ]
+
+    async def _classify_unique(self, tweets: list[dict], batch_size: int) -> list[dict]:
+        """classify_batch の本体（重複除去後のツイートを分類）"""
+        if batch_size <= 1:
+            return await self._classify_individually(tweets)
+
+        results: list[Optional[dict]] = [None] * len(tweets)
+
+        # 同じ本文の分類結果がキャッシュにあればAPIに送らない
+        pending = []
+        for i, tweet in enumerate(tweets):
+            cached = self.groq.cache_get(MOOD_BATCH_PROMPT_VERSION, self._batch_text(tweet))
+            if cached is not None:
+                results[i] = dict(cached)
+            else:
+                pending.append(i)
 
-        for i in range(0, len(tweets), batch_size):
-            batch = tweets[i : i + batch_size]
-            batch_results = await asyncio.gather(
-                *[self.classify_mood(t["text"]) for t in batch],
+        for round_no in range(1 + MOOD_BATCH_RETRY_ROUNDS):
+            if not pending:
+                break
+            chunks = [pending[i : i + batch_size] for i in range(0, len(pending), batch_size)]
+            chunk_results = await asyncio.gather(
+                *[self._classify_mood_chunk([tweets[i] for i in chunk]) for chunk in chunks],
                 return_exceptions=True,
             )
+            for chunk, got in zip(chunks, chunk_results):
+                if isinstance(got, Exception):
+                    logger.error(f"Batch mood error: {got}")
+                    continue
+                for local_idx, result in got.items():
+                    results[chunk[local_idx]] = result
+
+            missing = [i for i in pending if results[i] is None]
+            logger.info(
+                f"Batch round {round_no + 1}: {len(pending) - len(missing)}/{len(pending)} "
+                f"tweets classified in {len(chunks)} requests"
+            )
+            pending = missing
+
+        # 再バッチでも埋まらなかったツイートは1件ずつ分類
+        if pending:
+            logger.warning(f"{len(pending)} tweets missing from batch output, classifying individually")
+            singles = await self._classify_individually([tweets[i] for i in pending])
+            for i, result in zip(pending, singles):
+                results[i] = result
+
+        for tweet, result in zip(tweets, results):
+            result["tweet"] = tweet
+        return results
+
+    @staticmethod
+    def _batch_text(tweet: dict) -> str:
+        return tweet["text"][:MOOD_BATCH_TEXT_MAX_CHARS]
+
+    async def _classify_mood_chunk(self, tweets: list[dict]) -> dict[int, dict]:
+        """
+        1プロンプトで複数ツイートを分類
+
+        Returns:
+            {チャンク内index: {"mood", "intensity", "topic_hint"}}
+            indexが範囲外・重複・ムード不明・intensity不正の要素は含めない（呼び出し元で再キュー）
+        """
+        self.total_requests += 1
+
+        tweets_block = "".join(
+            f"### ツイート {i}\n{self._batch_text(t)}\n\n" for i, t in enumerate(tweets)
+        )
+        prompt = MOOD_BATCH_PROMPT.format(tweets_block=tweets_block)
+
+        content = ""
+        try:
+            content = await self.groq.complete(
+                prompt, max_tokens=MOOD_TOKENS_PER_TWEET * len(tweets) + 50
+            )
+
+            # JSON部分を抽出（```json ... ``` で囲まれている場合も対応）
+            if "```json" in content:
+                content = content.split("```json")[1].split("```")[0].strip()
+            elif "```" in content:
+                content = content.split("```")[1].split("```")[0].strip()
+
+            parsed = json.loads(content)
+            if not isinstance(parsed, list):
+                raise ValueError(f"expected JSON array, got {type(parsed).__name__}")
+
+        except httpx.HTTPStatusError as e:
+            self.error_count += 1
+            logger.error(f"Batch mood HTTP error ({e.response.status_code}): {e}")
+            return {}
+
+        except (json.JSONDecodeError, ValueError) as e:
+            self.error_count += 1
+            logger.error(f"Batch mood parse error: {e} / raw: {content[:200]}")
+            return {}
+
+        got: dict[int, dict] = {}
+        for item in parsed:
+            if not isinstance(item, dict):
+                continue
+            idx = item.get("tweet_index")
+            if isinstance(idx, str) and idx.isdigit():
+                idx = int(idx)
+            mood = str(item.get("mood", "")).lower()
+            if not isinstance(idx, int) or not 0 <= idx < len(tweets) or idx in got:
+                continue
+            if mood not in MOOD_CATEGORIES:
+                continue
+            try:
+                intensity = min(1.0, max(0.0, float(item.get("intensity", 0.5))))
+            except (TypeError, ValueError):
+                continue
 
-            for tweet, result in zip(batch, batch_results):
-                if isinstance(result, Exception):
-                    logger.error(f"Batch mood error: {result}")
-                    results.append({
-                        "mood": "pragmatic",
-                        "intensity": 0.3,
-                        "topic_hint": "",
-                        "tweet": tweet,
-                    })
-                else:
-                    result["tweet"] = tweet
-                    results.append(result)
-
-            # バッチ間待機（最後のバッチ以外）
-            if i + batch_size < len(tweets):
-                await asyncio.sleep(delay)
-
-            logger.info(f"Progress: {min(i + batch_size, len(tweets))}/{len(tweets)} tweets analyzed")
+            result = {"mood": mood, "intensity": intensity, "topic_hint": item.get("topic_hint", "")}
+            self.groq.cache_put(MOOD_BATCH_PROMPT_VERSION, self._batch_text(tweets[idx]), result)
+            got[idx] = dict(result)
+
+        return got
+
+    async def _classify_individually(self, tweets: list[dict]) -> list[dict]:
+        """1ツイート1リクエストで分類（バッチで埋まらなかった分のフォールバック）"""
+        done = 0
+
+        async def run_one(tweet: dict) -> dict:
+            nonlocal done
+            result = await self.classify_mood(tweet["text"])
+            done += 1
+            if done % 10 == 0 or done == len(tweets):
+                logger.info(f"Progress: {done}/{len(tweets)} tweets analyzed")
+            return result
+
+        batch_results = await asyncio.gather(
+            *[run_one(t) for t in tweets],
+            return_exceptions=True,
+        )
+
+        results = []
+        for tweet, result in zip(tweets, batch_results):
+            if isinstance(result, Exception):
+                logger.error(f"Batch mood error: {result}")
+                results.append({
+                    "mood": "pragmatic",
+                    "intensity": 0.3,
+                    "topic_hint": "",
+                    "tweet": tweet,
+                })
+            else:
+                result["tweet"] = tweet
+                results.append(result)
 
         return results
 
 
-def fetch_recent_tweets(hours: int = 24, limit: int = 50) -> list[dict]:
+def fetch_recent_tweets(
+    hours: int = 24, limit: int = 50, buzz_data: Optional[dict] = None
+) -> list[dict]:
     """
     ツイートデータを取得（SQLite優先、なければJSON fallback）+ buzz-tweetsマージ
 
@@ -348,6 +492,7 @@ def fetch_recent_tweets(hours: int = 24, limit: int = 50) -> list[dict]:
 
     buzz-tweetsは1,2のメインソースにマージし、重複排除してエンゲージメント順でソート。
     ai-buzz-extractorが拾えない悲観論・規制系ツイートを補完する。
+    buzz_data を渡した場合（daily_pipeline.py）は3をファイルから読み直さずに使う。
     """
     # メインソースからツイート取得
     main_tweets = []
@@ -359,7 +504,7 @@ def fetch_recent_tweets(hours: int = 24, limit: int = 50) -> list[dict]:
         logger.warning(f"No main data source: {AI_BUZZ_DB} / {AI_BUZZ_JSON}")
 
     # buzz-tweetsをマージ（存在すれば）
-    buzz_tweets = _fetch_from_buzz_json()
+    buzz_tweets = _fetch_from_buzz_json(buzz_data)
     if buzz_tweets:
         main_tweets = _merge_tweets(main_tweets, buzz_tweets, limit)
 
@@ -370,34 +515,54 @@ def fetch_recent_tweets(hours: int = 24, limit: int = 50) -> list[dict]:
 
 
 def _fetch_from_sqlite(hours: int, limit: int) -> list[dict]:
-    """SQLiteからツイート取得"""
-    conn = None
+    """SQLiteからツイート取得（buzz_db のシャドウDB経由。engagement列のインデックスを使う）"""
     try:
-        conn = sqlite3.connect(str(AI_BUZZ_DB), timeout=5)
-        conn.row_factory = sqlite3.Row
-
         since = datetime.now(timezone.utc) - timedelta(hours=hours)
-        since_str = since.isoformat()
-
-        query = """
-            SELECT id, created_at, username, text, likes, retweets, quotes, replies, url, lang, category
-            FROM tweets
-            WHERE created_at >= ?
-              AND lang = 'ja'
-            ORDER BY (likes + retweets * 2 + quotes * 3) DESC
-            LIMIT ?
-        """
-
-        rows = conn.execute(query, (since_str, limit)).fetchall()
-        tweets = [dict(row) for row in rows]
+        with BuzzDB(AI_BUZZ_DB) as db:
+            tweets = db.top_engagement(since.isoformat(), "ja", limit)
         logger.info(f"Fetched {len(tweets)} tweets from SQLite (last {hours}h, ja only)")
         return tweets
     except Exception as e:
         logger.error(f"DB query error: {e}")
         return []
-    finally:
-        if conn:
-            conn.close()
+
+
+# data.json のフィールド名（正規化後のキー → 英語版 / 日本語版）
+_JSON_FIELDS = {
+    "created_at": ("created_at", "投稿日時"),
+    "username": ("username", "ユーザー名"),
+    "text": ("text", "本文"),
+    "likes": ("likes", "いいね"),
+    "retweets": ("retweets", "RT"),
+    "quotes": ("quotes", "引用"),
+    "replies": ("replies", "返信"),
+    "url": ("url", "URL"),
+}
+_JSON_COUNT_FIELDS = {"likes", "retweets", "quotes", "replies"}
+# タイムゾーンなしの形式（日本時間）。文字列全体が一致したときだけ採用し、
+# 秒以下やタイムゾーン付きの値は ISO 8601 として解釈する
+_JSON_DATE_FORMATS = ["%Y-%m-%d %H:%M", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M:%S"]
+_JST = timezone(timedelta(hours=9))
+
+
+def _parse_json_date(dt_str: str, cache: list) -> datetime:
+    """data.json の日時をパース（日本時間として扱う）。
+
+    cache[0] に前回成功したフォーマット（None はISO 8601）を覚えておき、次の行はそれから試す。
+    """
+    candidates = list(dict.fromkeys(cache + _JSON_DATE_FORMATS + [None]))
+    for fmt in candidates:
+        try:
+            if fmt is None:
+                # ISO 8601形式（タイムゾーン付き。なければ日本時間）
+                dt = datetime.fromisoformat(dt_str.replace("Z", "+00:00"))
+            else:
+                dt = datetime.strptime(dt_str, fmt)
+        except (ValueError, TypeError):
+            continue
+        cache[:] = [fmt]
+        return dt if dt.tzinfo else dt.replace(tzinfo=_JST)
+    raise ValueError(f"unknown date format: {dt_str!r}")
 
 
 def _fetch_from_json(hours: int, limit: int) -> list[dict]:
@@ -406,99 +571,86 @@ def _fetch_from_json(hours: int, limit: int) -> list[dict]:
 
     英語フィールド版: created_at, username, text, likes, retweets, quotes, replies, url, category
     日本語フィールド版: 投稿日時, ユーザー名, 本文, いいね, RT, 引用, 返信, URL, category
+
+    ファイル全体は読み込まず、ツイートを1件ずつパースしながら時間フィルタをかけ、
+    エンゲージメント上位 limit 件だけをヒープに保持する（メモリはファイルサイズに依存しない）。
     """
-    try:
-        raw = json.loads(AI_BUZZ_JSON.read_text(encoding="utf-8"))
-    except Exception as e:
-        logger.error(f"JSON parse error: {e}")
+    if limit <= 0:
         return []
 
-    raw_tweets = raw.get("tweets", [])
-    logger.info(f"Loaded {len(raw_tweets)} tweets from data.json")
+    since = datetime.now(timezone.utc) - timedelta(hours=hours)
+    fields = None  # 先頭ツイートで判定したフィールド名（正規化キー → 元キー）
+    date_fmt_cache: list = []
+    heap: list[tuple[int, int, dict]] = []  # (engagement, -読み込み順, 正規化済みツイート)
+    scanned = 0
 
-    # フィールド名の自動検出（先頭ツイートで判定）
-    is_english = False
-    if raw_tweets and "text" in raw_tweets[0]:
-        is_english = True
-        logger.info("Detected English field names in data.json")
-    else:
-        logger.info("Detected Japanese field names in data.json")
+    try:
+        for seq, t in enumerate(iter_array_items(AI_BUZZ_JSON, "tweets")):
+            scanned += 1
+            # フィールド名の自動検出（先頭ツイートで判定）
+            if fields is None:
+                is_english = "text" in t
+                logger.info(
+                    f"Detected {'English' if is_english else 'Japanese'} field names in data.json"
+                )
+                fields = {k: names[0 if is_english else 1] for k, names in _JSON_FIELDS.items()}
 
-    since = datetime.now(timezone.utc) - timedelta(hours=hours)
-    filtered = []
-    for t in raw_tweets:
-        # 日時パース（日本時間として扱う）
-        try:
-            dt_str = t.get("created_at" if is_english else "投稿日時", "")
-            # 複数の日時フォーマットに対応
-            dt = None
-            for fmt in ["%Y-%m-%d %H:%M", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M:%S"]:
+            # 日時フィルタ（hours=0 なら無効 / パース失敗は含める: データ損失防止）
+            if hours > 0:
                 try:
-                    dt = datetime.strptime(dt_str[:len(fmt.replace("%", "x"))], fmt)
-                    break
+                    if _parse_json_date(t.get(fields["created_at"], ""), date_fmt_cache) < since:
+                        continue
                 except ValueError:
-                    continue
-            if dt is None:
-                # ISO 8601形式（タイムゾーン付き）
-                dt = datetime.fromisoformat(dt_str.replace("Z", "+00:00"))
-            else:
-                dt = dt.replace(tzinfo=timezone(timedelta(hours=9)))
+                    pass
 
-            # hours=0 なら時間フィルタ無効（全件）
-            if hours > 0 and dt < since:
+            # _calc_engagement と同じ式。上位に入らないツイートは正規化しない
+            eng = (
+                (t.get(fields["likes"], 0) or 0)
+                + (t.get(fields["retweets"], 0) or 0) * 2
+                + (t.get(fields["quotes"], 0) or 0) * 3
+            )
+            key = (eng, -seq)
+            if len(heap) >= limit and key <= heap[0][:2]:
                 continue
-        except (ValueError, TypeError):
-            pass  # パース失敗は含める（データ損失防止）
 
-        # フィールド名を正規化（英語版はそのまま、日本語版は変換）
-        if is_english:
-            normalized = {
-                "created_at": t.get("created_at", ""),
-                "username": t.get("username", ""),
-                "text": t.get("text", ""),
-                "likes": t.get("likes", 0),
-                "retweets": t.get("retweets", 0),
-                "quotes": t.get("quotes", 0),
-                "replies": t.get("replies", 0),
-                "url": t.get("url", ""),
-                "category": t.get("category", "未分類"),
-            }
-        else:
+            # フィールド名を正規化
             normalized = {
-                "created_at": t.get("投稿日時", ""),
-                "username": t.get("ユーザー名", ""),
-                "text": t.get("本文", ""),
-                "likes": t.get("いいね", 0),
-                "retweets": t.get("RT", 0),
-                "quotes": t.get("引用", 0),
-                "replies": t.get("返信", 0),
-                "url": t.get("URL", ""),
-                "category": t.get("category", "未分類"),
+                k: t.get(src, 0 if k in _JSON_COUNT_FIELDS else "")
+                for k, src in fields.items()
             }
-        filtered.append(normalized)
+            normalized["category"] = t.get("category", "未分類")
+            if len(heap) < limit:
+                heapq.heappush(heap, (eng, -seq, normalized))
+            else:
+                heapq.heapreplace(heap, (eng, -seq, normalized))
+    except Exception as e:
+        logger.error(f"JSON parse error: {e}")
+        return []
 
-    # エンゲージメント順でソート（_calc_engagementと同じ式）
-    filtered.sort(key=_calc_engagement, reverse=True)
+    logger.info(f"Scanned {scanned} tweets from data.json")
 
-    result = filtered[:limit]
+    # エンゲージメント順（同点は data.json の並び順）
+    result = [t for _, _, t in sorted(heap, reverse=True)]
     logger.info(f"Fetched {len(result)} tweets from JSON (hours={hours}, limit={limit})")
     return result
 
 
-def _fetch_from_buzz_json() -> list[dict]:
+def _fetch_from_buzz_json(raw: Optional[dict] = None) -> list[dict]:
     """
     buzz-tweets-latest.json からツイート取得
     buzz_tweet_extractor.pyが06:30に生成するmin_faves:500の高品質ツイート。
     24時間以内のファイルのみ有効（古いデータは無視）。
+    raw に抽出結果（ファイルと同じ形式のdict）を渡した場合はファイルを読まない。
     """
-    if not BUZZ_TWEETS_JSON.exists():
-        return []
+    if raw is None:
+        if not BUZZ_TWEETS_JSON.exists():
+            return []
 
-    try:
-        raw = json.loads(BUZZ_TWEETS_JSON.read_text(encoding="utf-8"))
-    except Exception as e:
-        logger.warning(f"buzz-tweets JSON parse error: {e}")
-        return []
+        try:
+            raw = json.loads(BUZZ_TWEETS_JSON.read_text(encoding="utf-8"))
+        except Exception as e:
+            logger.warning(f"buzz-tweets JSON parse error: {e}")
+            return []
 
     # ファイルの鮮度チェック（24時間以内のみ有効）
     generated_at = raw.get("generated_at", "")
@@ -547,40 +699,14 @@ def _calc_engagement(t: dict) -> int:
 
 def _merge_tweets(main: list[dict], buzz: list[dict], limit: int) -> list[dict]:
     """
-    メインソースとbuzz-tweetsをマージ（重複排除 + エンゲージメント順ソート）
-    URLベースで重複判定し、エンゲージメントスコアが高い方を残す。
-    URLなしツイートもすべて保持する。
+    メインソースとbuzz-tweetsをマージ（重複排除 + エンゲージメント上位 limit 件）
+    URLベースで重複判定し、エンゲージメントスコアが高い方を残す（同点はメインソース優先）。
+    URLなしツイートもすべて候補に残す。
     """
-    # URL → tweet のマップ（メインソース優先）
-    seen_urls: dict[str, dict] = {}
-    # URLなしツイートのリスト
-    no_url_tweets: list[dict] = []
-
-    for t in main:
-        url = t.get("url", "")
-        if url:
-            seen_urls[url] = t
-        else:
-            no_url_tweets.append(t)
-
-    # buzz-tweetsをマージ（重複は高エンゲージメント側を採用）
-    for t in buzz:
-        url = t.get("url", "")
-        if not url:
-            no_url_tweets.append(t)
-            continue
-        if url in seen_urls:
-            existing = seen_urls[url]
-            if _calc_engagement(t) > _calc_engagement(existing):
-                seen_urls[url] = t
-        else:
-            seen_urls[url] = t
-
-    merged = list(seen_urls.values()) + no_url_tweets
-    merged.sort(key=_calc_engagement, reverse=True)
-
-    result = merged[:limit]
-    logger.info(f"Merged: {len(main)} main + {len(buzz)} buzz -> {len(merged)} unique -> {len(result)} (limit {limit})")
+    result, stats = merge_top_k(
+        [main, buzz], limit, score=_calc_engagement, key=lambda t: t.get("url", "")
+    )
+    logger.info(f"Merged: {len(main)} main + {len(buzz)} buzz: {stats} (limit {limit})")
     return result
 
 
@@ -644,46 +770,43 @@ def aggregate_moods(classified: list[dict]) -> dict:
     }
 
 
-def load_buzz_content_analysis(days: int = 7) -> dict:
+def load_buzz_content_analysis(days: int = 7, store: Optional[EvaluationStore] = None) -> dict:
     """
-    buzz_content_evaluations.jsonからcontent_type・virality_factorの分布を集計する。
+    評価ストア（buzz_content_analyzer.pyの蓄積）からcontent_type・virality_factorの分布を集計する。
     zeitgeistスナップショットに「今バズってるコンテンツの傾向」を補完情報として追加する。
 
     Args:
         days: 集計対象の日数（デフォルト7日。直近トレンドを重視）
+        store: 開いている評価ストア（省略時はここで開いて閉じる）
 
     Returns:
         content_type分布・virality_factor分布・トップバズツイート等を含むdict。
         データなしの場合は空dictを返す。
     """
-    if not BUZZ_EVALS_JSON.exists():
-        logger.info("buzz_content_evaluations.json not found, skipping buzz content analysis")
-        return {}
+    # 直近N日のデータのみ集計
+    cutoff = (datetime.now(timezone(timedelta(hours=9))) - timedelta(days=days)).strftime("%Y-%m-%d")
 
     try:
-        raw = json.loads(BUZZ_EVALS_JSON.read_text(encoding="utf-8"))
-    except Exception as e:
-        logger.warning(f"buzz_content_evaluations.json parse error: {e}")
+        if store is not None:
+            evaluations = store.query(since=cutoff)
+        else:
+            with EvaluationStore("buzz") as store:
+                evaluations = store.query(since=cutoff)
+    except sqlite3.Error as e:
+        logger.warning(f"Evaluation store read error: {e}")
         return {}
 
-    evaluations = raw.get("evaluations", {})
     if not evaluations:
+        logger.info("No buzz evaluations in store, skipping buzz content analysis")
         return {}
 
-    # 直近N日のデータのみ集計
-    cutoff = (datetime.now(timezone(timedelta(hours=9))) - timedelta(days=days)).strftime("%Y-%m-%d")
-
     # content_type別: 件数とエンゲージメント合計
     ct_stats: dict[str, dict] = {}
     # virality_factor別: 件数とエンゲージメント合計
     vf_stats: dict[str, dict] = {}
     total_count = 0
 
-    for eval_data in evaluations.values():
-        eval_date = eval_data.get("evaluated_date", "")
-        if eval_date < cutoff:
-            continue
-
+    for eval_data in evaluations:
         total_count += 1
         eng = eval_data.get("tweet_data", {}).get("engagement_score", 0)
 
@@ -947,15 +1070,24 @@ def detect_mood_shift(snapshot: dict) -> Optional[str]:
     )
 
 
-async def run(hours: int = 24, limit: int = 50, dry_run: bool = False) -> dict:
-    """メイン実行フロー"""
+async def run(
+    hours: int = 24,
+    limit: int = 50,
+    dry_run: bool = False,
+    buzz_data: Optional[dict] = None,
+    buzz_store: Optional[EvaluationStore] = None,
+) -> dict:
+    """メイン実行フロー
+
+    buzz_data / buzz_store は daily_pipeline.py から前段の結果をメモリ上で受け取るための引数。
+    """
     logger.info(f"=== Zeitgeist Detector Start (last {hours}h, limit {limit}) ===")
 
     # 0. バズコンテンツ分析データを読み込み（buzz_content_analyzer.pyの蓄積データ）
-    buzz_content = load_buzz_content_analysis(days=7)
+    buzz_content = load_buzz_content_analysis(days=7, store=buzz_store)
 
     # 1. データ取得
-    tweets = fetch_recent_tweets(hours=hours, limit=limit)
+    tweets = fetch_recent_tweets(hours=hours, limit=limit, buzz_data=buzz_data)
     if not tweets:
         logger.warning("No tweets found. Generating default snapshot.")
         snapshot = generate_snapshot(
@@ -967,12 +1099,12 @@ async def run(hours: int = 24, limit: int = 50, dry_run: bool = False) -> dict:
             save_snapshot(snapshot)
         return snapshot
 
-    # 2. ムード分析（Groq free tier RPM 30: シリアル実行 + 2.5秒待機）
+    # 2. ムード分析（RPM/TPMはGroqClientの共有レートリミッタで制御）
     async with MoodClassifier() as classifier:
-        classified = await classifier.classify_batch(tweets, batch_size=1, delay=2.5)
+        classified = await classifier.classify_batch(tweets)
         logger.info(
-            f"Classification complete: {classifier.total_requests} requests, "
-            f"{classifier.error_count} errors"
+            f"Classification complete: {len(tweets)} tweets in {classifier.total_requests} requests, "
+            f"{classifier.error_count} errors ({classifier.groq.summary()})"
         )
 
     # 3. 集約
@@ -14,9 +14,11 @@ X API経由で自分の最新ツイートにいいねした人を収集し、
 """
 
 import json
+import sqlite3
 import sys
 import time
 import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass, field
 import tweepy
 from pathlib import Path
@@ -24,14 +26,18 @@ from datetime import datetime, timedelta, timezone
 
 # x_client.py を参照するためにパスを追加
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent / "scripts"))
-from x_client import get_x_client, PRIMARY_USER_ID, MY_USER_IDS
+from x_client import get_x_client, PRIMARY_USER_ID, MY_USER_IDS, RequestQuota
+from user_cache import UserCache
+from history_store import HistoryStore
 
 # --- 定数 ---
 JST = timezone(timedelta(hours=9))
 SKILL_DIR = Path(__file__).resolve().parent
-HISTORY_FILE = SKILL_DIR / "like_history.json"
 CONFIG_FILE = SKILL_DIR / "config.json"
-SNAPSHOT_FILE = SKILL_DIR / "follower_snapshot.json"
+SNAPSHOT_DB = SKILL_DIR / "follower_snapshot.db"
+# 旧形式（id→usernameの全件JSON）。存在すれば初回にSNAPSHOT_DBへ取り込む
+LEGACY_SNAPSHOT_FILE = SKILL_DIR / "follower_snapshot.json"
+LIKER_CACHE_DB = SKILL_DIR / "liker_cache.db"
 MY_USER_ID = PRIMARY_USER_ID  # x_client.pyの定数を参照（@SundererD27468）
 
 
@@ -52,58 +58,114 @@ def load_config() -> dict[str, int | bool]:
     }
 
 
-def load_history() -> dict:
-    """like_history.jsonを読み込む。破損時は空の初期状態にフォールバック。"""
-    if HISTORY_FILE.exists():
-        try:
-            return json.loads(HISTORY_FILE.read_text(encoding="utf-8"))
-        except (json.JSONDecodeError, ValueError):
-            print("  [WARN] like_history.json が破損。空の初期状態にフォールバックします")
-    # remaining_users: CiC側が予算超過ユーザーを記録する領域（collect_likers.pyは参照しない）
-    return {"last_run": None, "processed": {}, "daily_stats": {}, "remaining_users": {}}
-
+# --- フォロワースナップショット管理 ---
 
-def save_history(history: dict) -> None:
-    """like_history.jsonを保存。手動メンテナンス時に使用。
-    いいね実行後の個別エントリ追記はCiC（PROMPT.md）側が担当。"""
-    try:
-        HISTORY_FILE.write_text(
-            json.dumps(history, ensure_ascii=False, indent=2),
-            encoding="utf-8",
+# 差分同期: 既知のフォロワーがこの人数連続したら、それ以降は前回までに取得済みとみなす
+KNOWN_RUN_STOP = 20
+# 差分同期ではフォロー解除を検出できないため、この日数ごとに全件取得して突き合わせる
+FULL_SYNC_DAYS = 7
+
+
+class FollowerSnapshot:
+    """既知フォロワーIDのSQLiteストア。
+
+    X API はフォロワーを新しい順に返すので、通常は先頭ページだけ見て
+    既知IDが続いたところで打ち切れる（fetch_new_followers）。
+    全件取得（初回・FULL_SYNC_DAYS ごと）の結果は replace_all で丸ごと入れ替える。"""
+
+    def __init__(self, path: Path = SNAPSHOT_DB):
+        self._conn = sqlite3.connect(str(path), timeout=30.0)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS followers (
+                id TEXT PRIMARY KEY,
+                username TEXT NOT NULL DEFAULT '',
+                first_seen TEXT NOT NULL
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            """
         )
-    except OSError as e:
-        print(f"  [ERROR] like_history.json の保存に失敗: {e}")
-        raise
-
+        self._conn.commit()
+        if self.count() == 0 and LEGACY_SNAPSHOT_FILE.exists():
+            self._import_legacy()
 
-# --- フォロワースナップショット管理 ---
+    def _import_legacy(self) -> None:
+        """follower_snapshot.json（旧形式）を取り込む。全件取得時刻として旧タイムスタンプを使う"""
+        try:
+            legacy = json.loads(LEGACY_SNAPSHOT_FILE.read_text(encoding="utf-8"))
+        except (json.JSONDecodeError, ValueError):
+            print("  [WARN] follower_snapshot.json が破損。初回扱いにします")
+            return
+        timestamp = legacy.get("timestamp") or datetime.now(JST).isoformat()
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO followers (id, username, first_seen) VALUES (?, ?, ?)",
+                [(uid, name or "", timestamp) for uid, name in legacy.get("follower_ids", {}).items()],
+            )
+            self._set_meta("last_full_sync", timestamp)
+        print(f"  [INFO] follower_snapshot.json から{self.count()}人を取り込みました")
+
+    def _set_meta(self, key: str, value: str) -> None:
+        self._conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value),
+        )
 
-def load_follower_snapshot() -> dict | None:
-    """follower_snapshot.jsonを読み込む。存在しなければNone。"""
-    if not SNAPSHOT_FILE.exists():
-        return None
-    try:
-        return json.loads(SNAPSHOT_FILE.read_text(encoding="utf-8"))
-    except (json.JSONDecodeError, ValueError):
-        print("  [WARN] follower_snapshot.json が破損。初回扱いにします")
-        return None
+    def count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM followers").fetchone()[0]
+
+    def known(self, ids: list[str]) -> set[str]:
+        """ids のうちスナップショットにあるもの"""
+        found = set()
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            found.update(
+                row[0] for row in self._conn.execute(
+                    f"SELECT id FROM followers WHERE id IN ({placeholders})", chunk
+                )
+            )
+        return found
+
+    def needs_full_sync(self) -> bool:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'last_full_sync'").fetchone()
+        if row is None:
+            return True
+        last = datetime.fromisoformat(row[0])
+        return datetime.now(JST) - last >= timedelta(days=FULL_SYNC_DAYS)
+
+    def add(self, followers: list[dict]) -> None:
+        """差分同期で見つかった新規フォロワーを追加"""
+        now = datetime.now(JST).isoformat()
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO followers (id, username, first_seen) VALUES (?, ?, "
+                "COALESCE((SELECT first_seen FROM followers WHERE id = ?), ?))",
+                [(u["id"], u["username"], u["id"], now) for u in followers],
+            )
 
+    def replace_all(self, followers: list[dict]) -> None:
+        """全件取得の結果でスナップショットを入れ替える（フォロー解除したユーザーは消える）"""
+        now = datetime.now(JST).isoformat()
+        ids = [u["id"] for u in followers]
+        with self._conn:
+            self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS current_ids (id TEXT PRIMARY KEY)")
+            self._conn.execute("DELETE FROM current_ids")
+            self._conn.executemany("INSERT OR IGNORE INTO current_ids VALUES (?)", [(i,) for i in ids])
+            self._conn.execute("DELETE FROM followers WHERE id NOT IN (SELECT id FROM current_ids)")
+            self._conn.executemany(
+                "INSERT INTO followers (id, username, first_seen) VALUES (?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET username = excluded.username",
+                [(u["id"], u["username"], now) for u in followers],
+            )
+            self._set_meta("last_full_sync", now)
 
-def save_follower_snapshot(followers: list[dict]) -> None:
-    """現在のフォロワーリストをスナップショットとして保存"""
-    # user_id -> username のdictで保存（O(1)ルックアップ用）
-    snapshot = {
-        "timestamp": datetime.now(JST).isoformat(),
-        "follower_ids": {u["id"]: u["username"] for u in followers},
-    }
-    try:
-        SNAPSHOT_FILE.write_text(
-            json.dumps(snapshot, ensure_ascii=False, indent=2),
-            encoding="utf-8",
-        )
-    except OSError as e:
-        print(f"  [ERROR] follower_snapshot.json の保存に失敗: {e}")
-        raise
+    def close(self) -> None:
+        self._conn.close()
 
 
 # --- API呼び出し ---
@@ -172,44 +234,179 @@ def get_recent_tweets(client, user_id: str, count: int = 5) -> list[dict]:
     return tweets
 
 
-def get_liking_users(client, tweet_id: str) -> list[dict]:
-    """ツイートにいいねしたユーザー一覧を取得（OAuth 1.0a User Context必須）"""
-    resp = api_call_with_retry(
-        client.get_liking_users,
-        id=tweet_id,
-        user_fields=["username", "name", "protected", "public_metrics"],
-        user_auth=True,
-    )
-    if not resp or not resp.data:
-        return []
+LIKERS_PAGE_SIZE = 100  # GET /2/tweets/:id/liking_users の max_results 上限
+MAX_LIKER_PAGES = 10  # 1ツイートあたりのページ上限（1,000人まで）
+LIKERS_CONCURRENCY = 5
+LIKERS_QUOTA_PER_WINDOW = 75  # liking_users の15分あたり上限（ユーザーコンテキスト）
 
+
+def get_liking_users(
+    client, tweet_id: str, quota: RequestQuota | None = None,
+) -> tuple[list[dict], int, bool]:
+    """ツイートにいいねしたユーザー一覧を全ページ取得（OAuth 1.0a User Context必須）。
+    戻り値: (ユーザーリスト, API呼び出しページ数, 全ページ取得できたか)"""
     users = []
-    for user in resp.data:
-        if str(user.id) in MY_USER_IDS:
+    pagination_token = None
+    page_count = 0
+    while page_count < MAX_LIKER_PAGES:
+        kwargs = {
+            "id": tweet_id,
+            "max_results": LIKERS_PAGE_SIZE,
+            "user_fields": ["username", "name", "protected", "public_metrics"],
+            "user_auth": True,
+        }
+        if pagination_token:
+            kwargs["pagination_token"] = pagination_token
+        if quota is not None:
+            quota.acquire()
+        resp = api_call_with_retry(client.get_liking_users, **kwargs)
+        page_count += 1
+        if resp is None:
+            return users, page_count, False
+        if not resp.data:
+            return users, page_count, True
+
+        for user in resp.data:
+            if str(user.id) in MY_USER_IDS:
+                continue
+            if user.protected:
+                continue
+            pm = user.public_metrics or {}
+            users.append({
+                "id": str(user.id),
+                "username": user.username,
+                "name": user.name,
+                "followers": pm.get("followers_count", 0),
+            })
+
+        if resp.meta and resp.meta.get("next_token"):
+            pagination_token = resp.meta["next_token"]
+        else:
+            return users, page_count, True
+    print(f"  [WARN] {tweet_id}: いいねユーザーが{MAX_LIKER_PAGES}ページを超えたため打ち切り")
+    return users, page_count, False
+
+
+class LikerCache:
+    """ツイートごとのいいねユーザーIDと、取得時のいいね数を記録するSQLiteストア。
+    いいね数が前回取得時から変わっていないツイートは liking_users を呼ばずに済ませる。
+    ユーザー情報（username等）は共有のユーザーキャッシュ（scripts/user_cache.py）から引く。"""
+
+    def __init__(self, path: Path = LIKER_CACHE_DB):
+        self._conn = sqlite3.connect(str(path), timeout=30.0)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS tweets (
+                tweet_id TEXT PRIMARY KEY,
+                like_count INTEGER NOT NULL,
+                fetched_at TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS tweet_likers (
+                tweet_id TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                PRIMARY KEY (tweet_id, user_id)
+            ) WITHOUT ROWID;
+            """
+        )
+        self._conn.commit()
+
+    def last_count(self, tweet_id: str) -> int | None:
+        row = self._conn.execute(
+            "SELECT like_count FROM tweets WHERE tweet_id = ?", (tweet_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def likers(self, tweet_id: str) -> list[str]:
+        return [
+            row[0] for row in self._conn.execute(
+                "SELECT user_id FROM tweet_likers WHERE tweet_id = ?", (tweet_id,)
+            )
+        ]
+
+    def put(self, tweet_id: str, like_count: int, user_ids: list[str]) -> None:
+        with self._conn:
+            self._conn.execute("DELETE FROM tweet_likers WHERE tweet_id = ?", (tweet_id,))
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO tweet_likers (tweet_id, user_id) VALUES (?, ?)",
+                [(tweet_id, uid) for uid in user_ids],
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO tweets (tweet_id, like_count, fetched_at) VALUES (?, ?, ?)",
+                (tweet_id, like_count, datetime.now(JST).isoformat()),
+            )
+
+    def prune(self, keep_tweet_ids: list[str]) -> None:
+        """チェック対象から外れた古いツイートのエントリを削除"""
+        placeholders = ",".join("?" * len(keep_tweet_ids)) or "''"
+        with self._conn:
+            self._conn.execute(
+                f"DELETE FROM tweet_likers WHERE tweet_id NOT IN ({placeholders})", keep_tweet_ids
+            )
+            self._conn.execute(
+                f"DELETE FROM tweets WHERE tweet_id NOT IN ({placeholders})", keep_tweet_ids
+            )
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def collect_liking_users(
+    client, tweets: list[dict], liker_cache: LikerCache, users_cache: UserCache,
+) -> tuple[dict[str, list[dict]], int, int]:
+    """各ツイートのいいねユーザーを集める。
+    いいね数が前回と同じツイートはキャッシュから復元し、それ以外を並行取得する
+    （LIKERS_CONCURRENCY 件同時、15分あたり LIKERS_QUOTA_PER_WINDOW 回まで）。
+    戻り値: ({tweet_id: ユーザーリスト}, liking_users のAPI呼び出し回数, キャッシュ利用ツイート数)"""
+    likers_by_tweet: dict[str, list[dict]] = {}
+    to_fetch = []
+    for tweet in tweets:
+        if liker_cache.last_count(tweet["id"]) != tweet["like_count"]:
+            to_fetch.append(tweet)
             continue
-        if user.protected:
+        ids = liker_cache.likers(tweet["id"])
+        infos = users_cache.get_many(ids, fresh_only=False)
+        if len(infos) < len(ids):
+            # ユーザー情報が欠けている場合は取り直す
+            to_fetch.append(tweet)
             continue
-        pm = user.public_metrics or {}
-        users.append({
-            "id": str(user.id),
-            "username": user.username,
-            "name": user.name,
-            "followers": pm.get("followers_count", 0),
-        })
-    return users
+        likers_by_tweet[tweet["id"]] = [
+            {
+                "id": uid,
+                "username": infos[uid]["username"],
+                "name": infos[uid]["name"],
+                "followers": infos[uid]["followers"] or 0,
+            }
+            for uid in ids
+        ]
+    cached_count = len(likers_by_tweet)
+
+    api_calls = 0
+    quota = RequestQuota(LIKERS_QUOTA_PER_WINDOW)
+    with ThreadPoolExecutor(max_workers=LIKERS_CONCURRENCY) as pool:
+        futures = {
+            pool.submit(get_liking_users, client, tweet["id"], quota): tweet for tweet in to_fetch
+        }
+        for future in as_completed(futures):
+            tweet = futures[future]
+            users, pages, complete = future.result()
+            api_calls += pages
+            likers_by_tweet[tweet["id"]] = users
+            # 途中で失敗したツイートは次回取り直すためキャッシュしない
+            if complete:
+                liker_cache.put(tweet["id"], tweet["like_count"], [u["id"] for u in users])
+            print(f"  - {tweet['id']}: {len(users)}人 (API {pages}回{'' if complete else '、一部取得失敗'})")
+
+    return likers_by_tweet, api_calls, cached_count
 
 
 MAX_FOLLOWER_PAGES = 50  # ページネーション上限（50,000人まで対応）
 
 
-def get_current_followers(client, user_id: str) -> tuple[list[dict], int]:
-    """自分のフォロワー一覧を取得（ページネーション対応、最大50ページ）。
-    戻り値: (フォロワーリスト, 実際のAPI呼び出しページ数)"""
-    all_followers = []
+def _follower_pages(client, user_id: str):
+    """フォロワー一覧を新しい順に1ページずつ返す（最大MAX_FOLLOWER_PAGES）。
+    API失敗時はNoneを返して終了する。"""
     pagination_token = None
-    page_count = 0
-
-    while page_count < MAX_FOLLOWER_PAGES:
+    for _ in range(MAX_FOLLOWER_PAGES):
         kwargs = {
             "id": user_id,
             # X API v2 GET /2/users/:id/followers の max_results 上限値
@@ -221,48 +418,94 @@ def get_current_followers(client, user_id: str) -> tuple[list[dict], int]:
             kwargs["pagination_token"] = pagination_token
 
         resp = api_call_with_retry(client.get_users_followers, **kwargs)
-        page_count += 1
+        yield resp
         if not resp or not resp.data:
-            break
-
-        for user in resp.data:
-            if user.protected:
-                continue
-            pm = user.public_metrics or {}
-            all_followers.append({
-                "id": str(user.id),
-                "username": user.username,
-                "name": user.name,
-                "followers": pm.get("followers_count", 0),
-            })
+            return
 
         # ページネーション: next_tokenがあれば次のページへ
         if resp.meta and resp.meta.get("next_token"):
             pagination_token = resp.meta["next_token"]
         else:
-            break
+            return
 
+
+def _follower_dict(user) -> dict:
+    pm = user.public_metrics or {}
+    return {
+        "id": str(user.id),
+        "username": user.username,
+        "name": user.name,
+        "followers": pm.get("followers_count", 0),
+        "protected": bool(user.protected),
+    }
+
+
+def get_current_followers(client, user_id: str) -> tuple[list[dict], int]:
+    """自分のフォロワー一覧を全件取得（ページネーション対応、最大50ページ）。
+    非公開アカウントも含む（protected フラグ付き。いいね対象からは呼び出し側で除外）。
+    戻り値: (フォロワーリスト, 実際のAPI呼び出しページ数)"""
+    all_followers = []
+    page_count = 0
+    for resp in _follower_pages(client, user_id):
+        page_count += 1
+        if not resp or not resp.data:
+            break
+        all_followers.extend(_follower_dict(user) for user in resp.data)
     return all_followers, page_count
 
 
-def detect_new_followers(current_followers: list[dict], snapshot: dict) -> list[dict]:
-    """前回スナップショットとの差分で新規フォロワーを検出"""
-    prev_ids = set(snapshot.get("follower_ids", {}).keys())
-    new_followers = [u for u in current_followers if u["id"] not in prev_ids]
-    return new_followers
+def fetch_new_followers(
+    client, user_id: str, snapshot: FollowerSnapshot,
+) -> tuple[list[dict] | None, int]:
+    """スナップショットにない新規フォロワーだけを取得する（差分同期）。
+    フォロワーは新しい順に返るので、既知IDが KNOWN_RUN_STOP 人連続した時点でページングを打ち切る
+    （通常は1ページで終わる）。先頭ページの取得に失敗した場合は None。
+    戻り値: (新規フォロワーリスト, 実際のAPI呼び出しページ数)"""
+    new_followers = []
+    page_count = 0
+    known_run = 0
+    for resp in _follower_pages(client, user_id):
+        page_count += 1
+        if resp is None:
+            return (None if page_count == 1 else new_followers), page_count
+        if not resp.data:
+            break
+        known = snapshot.known([str(user.id) for user in resp.data])
+        for user in resp.data:
+            if str(user.id) in known:
+                known_run += 1
+                if known_run >= KNOWN_RUN_STOP:
+                    return new_followers, page_count
+                continue
+            known_run = 0
+            new_followers.append(_follower_dict(user))
+    return new_followers, page_count
+
+
+def detect_new_followers(current_followers: list[dict], snapshot: FollowerSnapshot) -> list[dict]:
+    """全件取得したフォロワーとスナップショットの差分で新規フォロワーを検出"""
+    prev_ids = snapshot.known([u["id"] for u in current_followers])
+    return [u for u in current_followers if u["id"] not in prev_ids]
 
 
 # --- 履歴フィルタ ---
 
-def filter_by_history(users: list[dict], history: dict) -> tuple[list[dict], list[dict]]:
+def filter_by_history(
+    users: list[dict], history: HistoryStore, previous_usernames: dict[str, str] | None = None,
+) -> tuple[list[dict], list[dict]]:
     """履歴と照合して未処理/処理済みに分ける。処理済みユーザーは永続的にスキップ。
-    like_history.jsonのキーはusernameで管理（CiC側のPROMPT.mdと統一）。"""
+    履歴のキーはusernameで管理（CiC側のPROMPT.mdと統一）。
+    previous_usernames（user_id -> ユーザーキャッシュ上の以前のusername）を渡すと、
+    処理後にusernameを変更したユーザーも処理済みとして扱う。"""
     new_users = []
     skipped_users = []
-    processed = history.get("processed", {})
+    previous_usernames = previous_usernames or {}
+    processed = history.processed_among(
+        [u["username"] for u in users] + list(previous_usernames.values())
+    )
 
     for user in users:
-        if user["username"] in processed:
+        if user["username"] in processed or previous_usernames.get(user["id"]) in processed:
             skipped_users.append(user)
         else:
             new_users.append(user)
@@ -280,6 +523,7 @@ class CollectionResult:
     new_follower_targets: list[dict] = field(default_factory=list)
     all_likers: dict[str, dict] = field(default_factory=dict)
     tweets: list[dict] = field(default_factory=list)
+    liker_api_calls: int = 0
     follower_api_calls: int = 0
     daily_limit: int = 20
     dry_run: bool = False
@@ -349,8 +593,9 @@ def output_and_save(cr: CollectionResult) -> None:
 
     # APIコスト計算（X API Pay-Per-Use: 読取系$0.005/件、プロフィール系$0.010/件）
     # ツイート取得1回($0.005) + liking_users N回($0.005/回) + フォロワー取得M回($0.010/回)
-    api_cost = 0.005 * (1 + len(cr.tweets)) + 0.010 * cr.follower_api_calls
-    cost_parts = [f"ツイート取得1回 + liking_users{len(cr.tweets)}回"]
+    # liking_users はいいね数が変わったツイートのみ（ページ数分）
+    api_cost = 0.005 * (1 + cr.liker_api_calls) + 0.010 * cr.follower_api_calls
+    cost_parts = [f"ツイート取得1回 + liking_users{cr.liker_api_calls}回"]
     if cr.follower_api_calls > 0:
         cost_parts.append(f"followers{cr.follower_api_calls}回")
     print(f"\nAPIコスト: ${api_cost:.3f} ({' + '.join(cost_parts)})")
@@ -364,9 +609,15 @@ def main() -> None:
     args = parser.parse_args()
 
     config = load_config()
-    history = load_history()
+    # 旧形式の like_history.json が編集されていれば差分を取り込む（変更がなければ読まない）
+    history = HistoryStore()
+    imported = history.sync_from_json()
+    if imported:
+        print(f"  [INFO] like_history.json から{imported}件の処理履歴を取り込み")
 
     client = get_x_client()
+    # id -> username/name の共有キャッシュ（trend_detector等と共用）
+    users_cache = UserCache()
 
     daily_limit = config.get("daily_like_limit", 20)
     # CLIの--countが未指定ならconfigのtweet_check_countを使う
@@ -385,6 +636,8 @@ def main() -> None:
         print("[!] いいねが付いたツイートが見つかりません")
         # ツイートがなくてもフォロワー検出は続行
         if not do_followers:
+            users_cache.close()
+            history.close()
             return
 
     for t in tweets:
@@ -392,10 +645,20 @@ def main() -> None:
 
     # --- ステップ2: 各ツイートのいいねユーザー収集 ---
     print(f"\n[2/{total_steps}] いいねユーザー収集中...")
+    liker_cache = LikerCache()
+    try:
+        likers_by_tweet, liker_api_calls, liker_cached = collect_liking_users(
+            client, tweets, liker_cache, users_cache
+        )
+        liker_cache.prune([t["id"] for t in tweets])
+    finally:
+        liker_cache.close()
+    if liker_cached:
+        print(f"  いいね数に変化なし（キャッシュ利用）: {liker_cached}ツイート")
+
     all_likers = {}  # user_id -> user info + source_tweets
     for tweet in tweets:
-        likers = get_liking_users(client, tweet["id"])
-        for user in likers:
+        for user in likers_by_tweet.get(tweet["id"], []):
             uid = user["id"]
             if uid not in all_likers:
                 all_likers[uid] = {**user, "source_tweets": []}
@@ -403,6 +666,13 @@ def main() -> None:
 
     print(f"  ユニークユーザー: {len(all_likers)}人")
 
+    # username変更の検出用に以前のusernameを引いてから、最新の情報でキャッシュを更新
+    previous_usernames = {
+        uid: u["username"]
+        for uid, u in users_cache.get_many(all_likers, fresh_only=False).items()
+    }
+    users_cache.remember(all_likers.values())
+
     # リピーター検出（複数ツイートにいいねした人）
     repeaters = {uid: info for uid, info in all_likers.items() if len(info["source_tweets"]) > 1}
     if repeaters:
@@ -411,7 +681,7 @@ def main() -> None:
 
     # 履歴差分でいいね返し対象を抽出
     liker_list = list(all_likers.values())
-    new_likers, skipped_likers = filter_by_history(liker_list, history)
+    new_likers, skipped_likers = filter_by_history(liker_list, history, previous_usernames)
 
     print(f"  新規（未処理）: {len(new_likers)}人")
     print(f"  スキップ（処理済み）: {len(skipped_likers)}人")
@@ -427,53 +697,89 @@ def main() -> None:
 
     if do_followers:
         print(f"\n[3/{total_steps}] 新規フォロワー検出中...")
+        snapshot = FollowerSnapshot()
         try:
-            current_followers, follower_api_calls = get_current_followers(client, MY_USER_ID)
-            print(f"  現在のフォロワー: {len(current_followers)}人 (API {follower_api_calls}回)")
-
-            # 空リストの場合はAPIエラーの可能性が高い → スナップショット更新しない
-            if not current_followers:
-                print("  [WARN] フォロワーリストが空。API障害の可能性。スナップショット更新をスキップ")
-                print("  [INFO] いいね返しのみ実行します")
-            else:
-                snapshot = load_follower_snapshot()
-
-                if snapshot is None:
-                    # 初回実行: スナップショット保存のみ、いいねなし
-                    print("  [INFO] 初回実行: フォロワースナップショットを保存（いいねなし）")
+            # raw_new_followers: None = 検出なし（初回・API障害）
+            raw_new_followers = None
+            fetched_followers: list[dict] = []
+
+            if snapshot.count() == 0 or snapshot.needs_full_sync():
+                # 初回 / FULL_SYNC_DAYS ごと: 全件取得してスナップショットを入れ替える
+                first_run = snapshot.count() == 0
+                current_followers, follower_api_calls = get_current_followers(client, MY_USER_ID)
+                print(f"  全件同期: 現在のフォロワー {len(current_followers)}人 (API {follower_api_calls}回)")
+
+                # 空リストの場合はAPIエラーの可能性が高い → スナップショット更新しない
+                if not current_followers:
+                    print("  [WARN] フォロワーリストが空。API障害の可能性。スナップショット更新をスキップ")
+                    print("  [INFO] いいね返しのみ実行します")
+                else:
+                    if first_run:
+                        # 初回実行: スナップショット保存のみ、いいねなし
+                        print("  [INFO] 初回実行: フォロワースナップショットを保存（いいねなし）")
+                    else:
+                        raw_new_followers = detect_new_followers(current_followers, snapshot)
                     if not args.dry_run:
-                        save_follower_snapshot(current_followers)
+                        snapshot.replace_all(current_followers)
+                    fetched_followers = current_followers
+            else:
+                # 通常: 新しい順に取得し、既知のフォロワーが続いたところで打ち切る
+                raw_new_followers, follower_api_calls = fetch_new_followers(
+                    client, MY_USER_ID, snapshot
+                )
+                if raw_new_followers is None:
+                    print("  [WARN] フォロワー取得に失敗。API障害の可能性。スナップショット更新をスキップ")
+                    print("  [INFO] いいね返しのみ実行します")
                 else:
-                    raw_new_followers = detect_new_followers(current_followers, snapshot)
-                    print(f"  新規フォロワー（前回差分）: {len(raw_new_followers)}人")
-
-                    if raw_new_followers:
-                        # 履歴フィルタで二重いいね防止
-                        new_followers, skipped_followers = filter_by_history(
-                            raw_new_followers, history
-                        )
-                        if skipped_followers:
-                            print(f"  スキップ（履歴重複）: {len(skipped_followers)}人")
-
-                        # sourceマーカーといいね数を付与
-                        for user in new_followers:
-                            user["source"] = "new_follower"
-                            user["likes_count"] = new_follower_likes
-                            user["source_tweets"] = []
-
-                        new_follower_targets = new_followers
-                        for u in new_follower_targets:
-                            print(f"    + @{u['username']} ({u['followers']:,}フォロワー) [NEW FOLLOWER]")
-
-                    # スナップショットを最新状態に更新
+                    print(
+                        f"  差分同期: 既知{snapshot.count()}人 + 新規{len(raw_new_followers)}人 "
+                        f"(API {follower_api_calls}回)"
+                    )
                     if not args.dry_run:
-                        save_follower_snapshot(current_followers)
+                        snapshot.add(raw_new_followers)
+                    fetched_followers = raw_new_followers
+
+            if raw_new_followers is not None:
+                # 非公開アカウントはいいね対象外（スナップショットには記録する）
+                raw_new_followers = [u for u in raw_new_followers if not u["protected"]]
+                print(f"  新規フォロワー（前回差分）: {len(raw_new_followers)}人")
+
+                if raw_new_followers:
+                    # 履歴フィルタで二重いいね防止（username変更はキャッシュ上の以前の名前で判定）
+                    new_followers, skipped_followers = filter_by_history(
+                        raw_new_followers, history,
+                        {
+                            uid: u["username"]
+                            for uid, u in users_cache.get_many(
+                                (f["id"] for f in raw_new_followers), fresh_only=False,
+                            ).items()
+                        },
+                    )
+                    if skipped_followers:
+                        print(f"  スキップ（履歴重複）: {len(skipped_followers)}人")
+
+                    # sourceマーカーといいね数を付与
+                    for user in new_followers:
+                        user["source"] = "new_follower"
+                        user["likes_count"] = new_follower_likes
+                        user["source_tweets"] = []
+
+                    new_follower_targets = new_followers
+                    for u in new_follower_targets:
+                        print(f"    + @{u['username']} ({u['followers']:,}フォロワー) [NEW FOLLOWER]")
+
+            users_cache.remember(fetched_followers)
 
         except Exception as e:
             # フォロワー検出失敗時もいいね返しは続行
             print(f"  [WARN] 新規フォロワー検出でエラー: {e}")
             print("  [INFO] いいね返しのみ実行します")
             new_follower_targets = []
+        finally:
+            snapshot.close()
+
+    users_cache.close()
+    history.close()
 
     # --- ステップ3(or4): 予算配分 ---
     step_num = total_steps
@@ -501,6 +807,7 @@ def main() -> None:
         new_follower_targets=new_follower_targets,
         all_likers=all_likers,
         tweets=tweets,
+        liker_api_calls=liker_api_calls,
         follower_api_calls=follower_api_calls,
         daily_limit=daily_limit,
         dry_run=args.dry_run,
@@ -0,0 +1,339 @@
+r"""
+history_store.py - いいね返し処理履歴のSQLiteストア（like_history.json の置き換え）
+
+like_history.json は processed（username → 処理内容）が際限なく増え、collect_likers.py と
+CiC（PROMPT.md）がそのたびに全体を読み込み・書き直していた。
+
+このモジュールは履歴をSQLite（WALモード）に持つ。
+  - processed: username（大文字小文字を区別しない）が主キー、user_id にもインデックス
+  - daily_stats: 日付ごとの集計（mark_processed で加算）
+  - is_processed / processed_among / mark_processed / daily_totals は件数によらず一定時間
+
+CiC（PROMPT.md）は1ユーザーごとに --check / --mark でこのストアを直接参照・更新する
+（JSON全体の Read → Write はしない）。like_history.json は互換用として
+  - sync_from_json(): 手で編集された場合などに、JSONが前回の取り込み以降に更新されていれば
+    last_liked_at が取り込み済みの最新時刻以降のエントリだけを取り込む
+    （ファイルの更新時刻とサイズが同じなら読まない）
+  - export_json(): ストアの内容を like_history.json と同じ形式で書き出す
+を残している（CLIの --import / --export も同じ）。
+
+使い方:
+  python history_store.py --stats                 # 件数と直近の日次集計
+  python history_store.py --import                # like_history.json を取り込む
+  python history_store.py --export                # like_history.json に書き出す
+  python history_store.py --check <username> ...  # 処理済みか確認（複数指定可）
+  python history_store.py --mark <username> --liked-count 2 --source like_back --tweets <id> <id>
+"""
+
+import argparse
+import json
+import sqlite3
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+# --- 定数 ---
+JST = timezone(timedelta(hours=9))
+SKILL_DIR = Path(__file__).resolve().parent
+HISTORY_DB = SKILL_DIR / "like_history.db"
+HISTORY_FILE = SKILL_DIR / "like_history.json"
+
+_DAILY_FIELDS = ("total_likes_given", "users_processed", "users_skipped", "source_tweets_checked")
+
+
+class HistoryStore:
+    """いいね返し処理履歴。processed のキーは username（CiC側のPROMPT.mdと統一）"""
+
+    def __init__(self, path: Path = HISTORY_DB):
+        self._conn = sqlite3.connect(str(path), timeout=30.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS processed (
+                username TEXT PRIMARY KEY COLLATE NOCASE,
+                user_id TEXT,
+                last_liked_at TEXT NOT NULL,
+                liked_count INTEGER NOT NULL DEFAULT 0,
+                source TEXT NOT NULL DEFAULT 'like_back',
+                source_tweets TEXT NOT NULL DEFAULT '[]',
+                skipped_reason TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_processed_user_id ON processed(user_id);
+            CREATE TABLE IF NOT EXISTS daily_stats (
+                date TEXT PRIMARY KEY,
+                total_likes_given INTEGER NOT NULL DEFAULT 0,
+                users_processed INTEGER NOT NULL DEFAULT 0,
+                users_skipped INTEGER NOT NULL DEFAULT 0,
+                source_tweets_checked INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            """
+        )
+        self._conn.commit()
+
+    # --- 参照 ---
+
+    def is_processed(self, username: str, user_id: str | None = None) -> bool:
+        row = self._conn.execute(
+            "SELECT 1 FROM processed WHERE username = ? OR (? IS NOT NULL AND user_id = ?) LIMIT 1",
+            (username, user_id, user_id),
+        ).fetchone()
+        return row is not None
+
+    def processed_among(self, usernames: list[str]) -> set[str]:
+        """usernames のうち処理済みのもの（入力の表記のまま返す）"""
+        found = set()
+        for start in range(0, len(usernames), 500):
+            chunk = usernames[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            found.update(
+                row[0].casefold() for row in self._conn.execute(
+                    f"SELECT username FROM processed WHERE username IN ({placeholders})", chunk
+                )
+            )
+        return {u for u in usernames if u.casefold() in found}
+
+    def daily_totals(self, date: str | None = None) -> dict:
+        """指定日（省略時は今日）の集計。記録がなければ全項目0"""
+        date = date or datetime.now(JST).strftime("%Y-%m-%d")
+        row = self._conn.execute(
+            f"SELECT {', '.join(_DAILY_FIELDS)} FROM daily_stats WHERE date = ?", (date,)
+        ).fetchone()
+        return dict(zip(_DAILY_FIELDS, row or (0,) * len(_DAILY_FIELDS)))
+
+    def count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM processed").fetchone()[0]
+
+    # --- 更新 ---
+
+    def mark_processed(
+        self,
+        username: str,
+        liked_count: int,
+        source: str = "like_back",
+        source_tweets: list[str] | None = None,
+        user_id: str | None = None,
+        skipped_reason: str | None = None,
+        liked_at: str | None = None,
+    ) -> None:
+        """1ユーザーの処理結果を記録し、その日の集計に加算する"""
+        liked_at = liked_at or datetime.now(JST).isoformat(timespec="seconds")
+        with self._conn:
+            self._upsert([(username, {
+                "user_id": user_id,
+                "last_liked_at": liked_at,
+                "liked_count": liked_count,
+                "source": source,
+                "source_tweets": source_tweets or [],
+                "skipped_reason": skipped_reason,
+            })])
+            self._conn.execute(
+                """
+                INSERT INTO daily_stats (date, total_likes_given, users_processed, users_skipped)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(date) DO UPDATE SET
+                    total_likes_given = total_likes_given + excluded.total_likes_given,
+                    users_processed = users_processed + excluded.users_processed,
+                    users_skipped = users_skipped + excluded.users_skipped
+                """,
+                (liked_at[:10], liked_count, 0 if skipped_reason else 1, 1 if skipped_reason else 0),
+            )
+            self._set_meta("last_run", liked_at)
+
+    def _upsert(self, entries: list[tuple[str, dict]], newer_only: bool = False) -> int:
+        """(username, エントリ) を書き込み、追加・更新した件数を返す。
+
+        newer_only なら既存より last_liked_at が新しいエントリだけで上書きする。
+        """
+        cur = self._conn.executemany(
+            f"""
+            INSERT INTO processed
+                (username, user_id, last_liked_at, liked_count, source, source_tweets, skipped_reason)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(username) DO UPDATE SET
+                user_id = COALESCE(excluded.user_id, processed.user_id),
+                last_liked_at = excluded.last_liked_at,
+                liked_count = excluded.liked_count,
+                source = excluded.source,
+                source_tweets = excluded.source_tweets,
+                skipped_reason = excluded.skipped_reason
+            {"WHERE excluded.last_liked_at > processed.last_liked_at" if newer_only else ""}
+            """,
+            [
+                (
+                    username,
+                    entry.get("user_id"),
+                    entry.get("last_liked_at") or "",
+                    entry.get("liked_count", 0),
+                    entry.get("source", "like_back"),
+                    json.dumps(entry.get("source_tweets", []), ensure_ascii=False),
+                    entry.get("skipped_reason"),
+                )
+                for username, entry in entries
+            ],
+        )
+        return cur.rowcount
+
+    def _get_meta(self, key: str) -> str | None:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str) -> None:
+        self._conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value),
+        )
+
+    # --- JSON互換（CiC側のPROMPT.mdフロー） ---
+
+    def sync_from_json(self, path: Path = HISTORY_FILE, force: bool = False) -> int:
+        """like_history.json の内容を取り込み、追加・更新した processed の件数を返す。
+
+        前回の取り込みからファイルが変わっていなければ読まない。processed は last_liked_at が
+        取り込み済みの最新時刻（json_watermark）以降のエントリだけを対象にし、既存より新しい方を
+        採用する（force ならファイルの変更有無・ウォーターマークによらず全エントリを照合する）。
+        daily_stats は項目ごとに大きい方を採用する（JSON側は日次集計を丸ごと書き直すので、
+        加算すると二重に数えてしまう）。
+        """
+        if not path.exists():
+            return 0
+        stat = path.stat()
+        signature = f"{stat.st_mtime_ns}:{stat.st_size}"
+        if not force and self._get_meta("json_signature") == signature:
+            return 0
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (json.JSONDecodeError, ValueError):
+            print(f"  [WARN] {path.name} が破損。取り込みをスキップします")
+            return 0
+
+        watermark = "" if force else (self._get_meta("json_watermark") or "")
+        entries = [
+            (username, entry)
+            for username, entry in data.get("processed", {}).items()
+            if (entry.get("last_liked_at") or "") >= watermark
+        ]
+        newest = max((e.get("last_liked_at") or "" for _, e in entries), default="")
+        with self._conn:
+            changed = self._upsert(entries, newer_only=True)
+            for date, stats in data.get("daily_stats", {}).items():
+                values = [stats.get(f, 0) for f in _DAILY_FIELDS]
+                self._conn.execute(
+                    f"""
+                    INSERT INTO daily_stats (date, {', '.join(_DAILY_FIELDS)}) VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(date) DO UPDATE SET
+                    {', '.join(f"{f} = MAX({f}, excluded.{f})" for f in _DAILY_FIELDS)}
+                    """,
+                    (date, *values),
+                )
+            if data.get("last_run"):
+                current = self._get_meta("last_run") or ""
+                self._set_meta("last_run", max(current, data["last_run"]))
+            self._set_meta("remaining_users", json.dumps(data.get("remaining_users", {}), ensure_ascii=False))
+            self._set_meta("json_signature", signature)
+            if newest > (self._get_meta("json_watermark") or ""):
+                self._set_meta("json_watermark", newest)
+        return changed
+
+    def export_json(self, path: Path = HISTORY_FILE) -> None:
+        """ストアの内容を like_history.json と同じ形式で書き出す"""
+        processed = {}
+        for username, user_id, liked_at, liked_count, source, tweets, reason in self._conn.execute(
+            "SELECT username, user_id, last_liked_at, liked_count, source, source_tweets, "
+            "skipped_reason FROM processed ORDER BY last_liked_at"
+        ):
+            entry = {
+                "last_liked_at": liked_at,
+                "liked_count": liked_count,
+                "source_tweets": json.loads(tweets),
+                "source": source,
+            }
+            if user_id:
+                entry["user_id"] = user_id
+            if reason:
+                entry["skipped_reason"] = reason
+            processed[username] = entry
+        daily_stats = {
+            date: dict(zip(_DAILY_FIELDS, values))
+            for date, *values in self._conn.execute(
+                f"SELECT date, {', '.join(_DAILY_FIELDS)} FROM daily_stats ORDER BY date"
+            )
+        }
+        data = {
+            "last_run": self._get_meta("last_run"),
+            "processed": processed,
+            "daily_stats": daily_stats,
+            "remaining_users": json.loads(self._get_meta("remaining_users") or "{}"),
+        }
+        path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+        # 自分で書いたファイルは次回取り込み不要（書き出した分はウォーターマークより前になる）
+        stat = path.stat()
+        newest = max((e["last_liked_at"] for e in processed.values()), default="")
+        with self._conn:
+            self._set_meta("json_signature", f"{stat.st_mtime_ns}:{stat.st_size}")
+            if newest > (self._get_meta("json_watermark") or ""):
+                self._set_meta("json_watermark", newest)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> "HistoryStore":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+# --- CLI ---
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="いいね返し処理履歴ストア")
+    parser.add_argument("--stats", action="store_true", help="件数と直近7日の集計を表示")
+    parser.add_argument("--import", dest="do_import", action="store_true", help="like_history.json を取り込む")
+    parser.add_argument("--export", action="store_true", help="like_history.json に書き出す")
+    parser.add_argument("--check", metavar="USERNAME", nargs="+", help="処理済みか確認（複数指定可）")
+    parser.add_argument("--mark", metavar="USERNAME", help="処理済みとして記録")
+    parser.add_argument("--liked-count", type=int, default=1, help="--mark: いいねした数")
+    parser.add_argument("--source", default="like_back", help="--mark: like_back / new_follower")
+    parser.add_argument("--tweets", nargs="*", default=[], help="--mark: いいね元のツイートID")
+    parser.add_argument("--user-id", help="--mark: ユーザーID")
+    parser.add_argument("--skipped-reason", help="--mark: スキップ理由（repost_only 等）")
+    args = parser.parse_args()
+
+    with HistoryStore() as store:
+        if args.do_import:
+            print(f"[OK] {store.sync_from_json(force=True)}件を取り込みました")
+        if args.mark:
+            store.mark_processed(
+                args.mark.lstrip("@"), args.liked_count, args.source, args.tweets,
+                user_id=args.user_id, skipped_reason=args.skipped_reason,
+            )
+            print(f"[OK] @{args.mark} を記録しました")
+        if args.check:
+            usernames = [u.lstrip("@") for u in args.check]
+            processed = store.processed_among(usernames)
+            for username in usernames:
+                print(f"@{username}: {'処理済み' if username in processed else '未処理'}")
+            if len(usernames) > 1:
+                print(f"[INFO] 未処理 {len(usernames) - len(processed)}人 / 処理済み {len(processed)}人")
+        if args.export:
+            store.export_json()
+            print(f"[OK] {HISTORY_FILE} に書き出しました")
+        if args.stats or not (args.do_import or args.mark or args.check or args.export):
+            print(f"処理済みユーザー: {store.count()}人")
+            today = datetime.now(JST)
+            for i in range(6, -1, -1):
+                date = (today - timedelta(days=i)).strftime("%Y-%m-%d")
+                totals = store.daily_totals(date)
+                if any(totals.values()):
+                    print(
+                        f"  {date}: いいね{totals['total_likes_given']}件 / "
+                        f"処理{totals['users_processed']}人 / スキップ{totals['users_skipped']}人"
+                    )
+
+
+if __name__ == "__main__":
+    main()